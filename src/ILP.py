@@ -3,7 +3,13 @@
 import timeit
 import pulp as plp
 import pandas as pd
+from bisect import bisect_left
 from pulp.constants import LpMaximize
+from utility.opportunityIndex import OpportunityIndex
+from utility.downloadAssignment import download_windows, assign_downloads
+from utility.instrumentation import instrumented, phase, Sections
+from utility.solverConfig import SolverConfig, print_report
+from utility.presolve import reduce_instance, print_presolve
 
 
 
@@ -17,15 +23,79 @@ from pulp.constants import LpMaximize
 #col: Set of all collection opportunities
 #com: Set of all communication opportunities
 #p: Horizon
-def ILP(H, S, A, B, mem, up, down, col, com, p):
+#sparse: if True, variables are created only for real opportunities (see utility/opportunityIndex.py)
+#cumulative: if True, memory and collected data are carried as state variables from one instant to the next instead of being summed from instant 0 in every row
+#aggregated: if True, only the number of data units Sj downloads at Bk in instant t is a variable; the areas are assigned to the downloads after the solve (see utility/downloadAssignment.py)
+#solver: optional SolverConfig (solver, threads, time limit, gaps, log; see utility/solverConfig.py), CBC without limits by default
+#presolve: if True, the areas, satellites, ground stations, opportunities and time instants that cannot take part in a schedule are removed first (see utility/presolve.py)
+@instrumented("ILP")
+def ILP(H, S, A, B, mem, up, down, col, com, p, sparse = False, cumulative = False, aggregated = False, solver = None, presolve = False):
+	if presolve:
+		with phase("presolve"):
+			reduced, removed = reduce_instance(H, S, A, B, col, com, p, None)
+		print_presolve(reduced, removed)
+		H, S, A, B, col, com = (reduced[name] for name in ("H", "S", "A", "B", "col", "com"))
+	prob, x, y, idx = build_ILP(H, S, A, B, mem, up, down, col, com, p, sparse, cumulative, aggregated)
+	H = idx.H
+	
+	
+	
+	
+	config = solver or SolverConfig()
+	with phase("solve"):
+		status = config.solve(prob)
+	tl = prob.solutionTime
+	print("ILP EXECUTION TIME: ", prob.solutionTime, "s")
+	print("STATUS: ", status)
+	if solver is not None:
+		print_report(config.report)
+	
+
+	steps = Sections()
+	steps.next("extract")
+	if status == 1:
+		print("COLLECTIONS DONE: ")
+		for (t,i,j) in sorted(idx.x, key = lambda key: (key[0], key[2], key[1])):
+			if round(x[t,i,j].value() or 0) == 1:
+				print(t, ": ", j, " - ", i)
+
+						
+		if aggregated:
+			counts = {key: round(y[key].value() or 0) for key in idx.w}
+			items = {key: deadline for key, deadline in download_windows(idx, col, False).items() if round(x[key].value() or 0) == 1}
+			downloads = assign_downloads(counts, items)
+		else:
+			downloads = [key for key in sorted(idx.y, key = lambda key: (key[0], key[3], key[2], key[1])) if round(y[key].value() or 0) == 1]
+		print("COMMUNICATIONS DONE: ")
+		for (t,i,j,k) in downloads:
+			print(t, ": ", j, " " , i, " -> ", k)
+	steps.close()
+
+
+#Builds the ILP model without solving it (in the aggregated model, y holds the download counts w[t,j,k])
+def build_ILP(H, S, A, B, mem, up, down, col, com, p, sparse = False, cumulative = False, aggregated = False):
 	prob = plp.LpProblem('LEO_K', plp.LpMaximize)
+	steps = Sections("build", prob)
+	steps.next("Opportunity index")
+	idx = OpportunityIndex(H, S, A, B, col, com, p, None, sparse, aggregated = aggregated)
+	H = idx.H
 	
 	
+	steps.next("Variables")
 	###################################### VARIABLES ###########################################
 	#Denotes that data from Ai is collected by satellite Sj at time instant t
-	x = plp.LpVariable.dicts("x", [(t,i,j) for t in H for i in A for j in S], cat = "Binary")
+	x = plp.LpVariable.dicts("x", idx.x, cat = "Binary")
 	#Denotes that data from Ai collected by Sj is downloaded at GS Bk at time instant t
-	y = plp.LpVariable.dicts("y", [(t,i,j,k) for t in H for i in A for j in S for k in B], cat = 'Binary')
+	y = plp.LpVariable.dicts("y", idx.y, cat = 'Binary')
+	#Number of data units Sj downloads at GS Bk at time instant t (aggregated model, instead of y)
+	w = plp.LpVariable.dicts("w", idx.w, lowBound = 0, cat = 'Integer')
+	steps.count(variables = len(x) + len(y) + len(w))
+
+	#Downloads of Sj, and downloads at Bk, in time instant t
+	def sent(t, j):
+		return [y[t,i,j,k] for (i,k) in idx.y_tj[t,j]] + [w[t,j,k] for k in idx.w_tj[t,j]]
+	def received(t, k):
+		return [y[t,i,j,k] for (i,j) in idx.y_tk[t,k]] + [w[t,j,k] for j in idx.w_tk[t,k]]
 
 
 
@@ -33,93 +103,156 @@ def ILP(H, S, A, B, mem, up, down, col, com, p):
 
 
 	###################################### CONSTRAINTS ###########################################
-	#Remove the invalid collection and communication opportunities
-	for t in H:
-		for i in A:
-			for j in S:
-				if (t,j,i) not in col:
-					prob += x[t,i,j] == 0
-				
-				for k in B:
-					if (t,j,k) not in com:
-						prob += y[t,i,j,k] == 0
+	steps.next("Invalid opportunities")
+	#Remove the invalid collection and communication opportunities (the sparse index never creates them)
+	if not sparse:
+		for t in H:
+			for i in A:
+				for j in S:
+					if (t,j,i) not in col:
+						prob += x[t,i,j] == 0
+					
+					for k in B:
+						if ((t,j,k) not in com or t == 0) and not aggregated:
+							prob += y[t,i,j,k] == 0		#Nothing is collected before time instant 0 to download in it
 				
+				for j in S:
+					for k in B:
+						if (t,j,k) not in com and aggregated:
+							prob += w[t,j,k] == 0
 
 	
 						
 	
+	steps.next("One collection per instant")
 	#Each satellite collects at most one area in an instant
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(x[t,i,j] for i in A) <= 1
+			if sparse and len(idx.x_tj[t,j]) < 2:
+				continue
+			prob += plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) <= 1
 	
 	
+	steps.next("Area collected once")
 	#Each area is collected at-most once
 	for i in A:
-		prob += plp.lpSum(x[t,i,j] for t in H for j in S) <= 1
+		if sparse and len(idx.x_i[i]) < 2:
+			continue
+		prob += plp.lpSum(x[t,i,j] for (t,j) in idx.x_i[i]) <= 1
 
 	
+	steps.next("Memory bound")
 	#Memory bound
-	for j in S:
-		for t in H:
-			prob += plp.lpSum(x[t1,i,j] for i in A for t1 in range(0,t+1)) - plp.lpSum(y[t1,i,j,k] for k in B for i in A for t1 in range(0,t+1)) <= mem[j]
+	#Occupancy only grows at a collection, so the sparse model only checks those instants
+	if cumulative:
+		#Number of data units in the memory of Sj at the end of time instant t
+		M = plp.LpVariable.dicts("M", [(t,j) for j in S for t in H])
+		steps.count(variables = len(M))
+		for j in S:
+			held = 0
+			for t in H:
+				prob += M[t,j] == held + plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) - plp.lpSum(sent(t, j))
+				held = M[t,j]
+				if sparse and not idx.x_tj[t,j]:
+					continue
+				prob += M[t,j] <= mem[j]
+	else:
+		for j in S:
+			collected, downloaded = [], []
+			for t in H:
+				collected += [x[t,i,j] for i in idx.x_tj[t,j]]
+				downloaded += sent(t, j)
+				if sparse and not idx.x_tj[t,j]:
+					continue
+				prob += plp.lpSum(collected) - plp.lpSum(downloaded) <= mem[j]
 			
 			
+	steps.next("Downlink capacity")
 	#Downlink capacity of ground stations
 	for t in H:
 		for k in B:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for j in S) <= down[k]
+			if sparse and not received(t, k):
+				continue
+			prob += plp.lpSum(received(t, k)) <= down[k]
 	
 	
+	steps.next("Uplink capacity")
 	#Uplink capacity of satellites
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for k in B) <= up[j]
+			if sparse and not sent(t, j):
+				continue
+			prob += plp.lpSum(sent(t, j)) <= up[j]
 	
 
+	steps.next("Transfer all collected data")
 	#Transfer all collected data
-	for i in A:
+	#Aggregated model: every data unit collected by Sj is downloaded, and by the download validation
+	#below after its collection, which is all the area identities need (see utility/downloadAssignment.py)
+	if aggregated:
 		for j in S:
-			prob += plp.lpSum(x[t,i,j] for t in H) - plp.lpSum(y[t,i,j,k] for t in H for k in B)  == 0
+			collected = [x[t,i,j] for t in H for i in idx.x_tj[t,j]]
+			if sparse and not collected:
+				continue
+			prob += plp.lpSum(collected) - plp.lpSum(w[t,j,k] for (t,k) in idx.w_j[j]) == 0
+	else:
+		for i in A:
+			for j in S:
+				if sparse and not idx.x_ij[i,j]:
+					continue
+				prob += plp.lpSum(x[t,i,j] for t in idx.x_ij[i,j]) - plp.lpSum(y[t,i,j,k] for (t,k) in idx.y_ij[i,j])  == 0
 
 	
-	#Download validation
-	for i in A:
-		for j in S:
-			for t in range(1,p):
-				prob += plp.lpSum(y[t,i,j,k] for k in B) <= plp.lpSum(x[t1,i,j] for t1 in range(0, t))
-	
+	steps.next("Collection count")
+	#Number of collections of Ai by Sj before time instant t
+	if cumulative:
+		#Running count kept only at the collection instants of each (Ai, Sj) pair
+		X = plp.LpVariable.dicts("X", [(t,i,j) for (i,j), times in idx.x_ij.items() for t in times])
+		steps.count(variables = len(X))
+		for (i,j), times in idx.x_ij.items():
+			for n, t in enumerate(times):
+				prob += X[t,i,j] == (X[times[n-1],i,j] if n > 0 else 0) + x[t,i,j]
 
-	
+	def collected_before(i, j, t):
+		times = idx.x_ij[i,j]
+		if cumulative:
+			n = bisect_left(times, t)
+			return X[times[n-1],i,j] if n > 0 else 0
+		return plp.lpSum(x[t1,i,j] for t1 in times if t1 < t)
 
-	#Objective function
-	prob.setObjective(plp.lpSum(x[t,i,j] for t in H for i in A for j in S))
-	
-	
 	
-	
-	status = prob.solve(plp.PULP_CBC_CMD(msg = False))
-	tl = prob.solutionTime
-	print("ILP EXECUTION TIME: ", prob.solutionTime, "s")
-	print("STATUS: ", status)
+	steps.next("Download validation")
+	#Download validation
+	for (i,j), downloads in idx.y_ij.items():
+		for t in sorted(set(t for (t,k) in downloads)):
+			if t < 1:
+				continue
+			prob += plp.lpSum(y[t,i,j,k] for (t1,k) in downloads if t1 == t) <= collected_before(i, j, t)
+	#Aggregated model: Sj downloads at most the data units in its memory at the end of the previous instant
+	for j in S:
+		if not idx.w_j[j]:
+			continue
+		collected, downloaded = [], []
+		n = 0
+		for t in sorted(set(t for (t,k) in idx.w_j[j])):
+			if cumulative:
+				n = bisect_left(H, t)
+				prob += plp.lpSum(w[t,j,k] for k in idx.w_tj[t,j]) <= (M[H[n-1],j] if n > 0 else 0)
+				continue
+			while n < len(H) and H[n] < t:
+				collected += [x[H[n],i,j] for i in idx.x_tj[H[n],j]]
+				n += 1
+			downloaded += [w[t,j,k] for k in idx.w_tj[t,j]]
+			prob += plp.lpSum(downloaded) <= plp.lpSum(collected)
 	
 
-	if status == 1:
-		print("COLLECTIONS DONE: ")
-		for t in H:
-			for j in S:
-				for i in A:
-					if x[t,i,j].value() == 1:
-						print(t, ": ", j, " - ", i)
+	
 
-						
-		print("COMMUNICATIONS DONE: ")
-		for t in H:
-			for k in B:
-				for j in S:
-					for i in A:
-						if y[t,i,j,k].value() == 1:
-							print(t, ": ", j, " " , i, " -> ", k)
-		
+	steps.next("Objective function")
+	#Objective function
+	prob.setObjective(plp.lpSum(x[t,i,j] for (t,i,j) in idx.x))
+	steps.close()
 
-	
+	if aggregated:
+		return prob, x, w, idx
+	return prob, x, y, idx
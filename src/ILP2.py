@@ -3,7 +3,13 @@
 import timeit
 import pulp as plp
 import pandas as pd
+from bisect import bisect_left
 from pulp.constants import LpMaximize
+from utility.opportunityIndex import OpportunityIndex
+from utility.downloadAssignment import download_windows, assign_downloads
+from utility.instrumentation import instrumented, phase, Sections
+from utility.solverConfig import SolverConfig, print_report
+from utility.presolve import reduce_instance, print_presolve
 
 
 
@@ -26,17 +32,88 @@ from pulp.constants import LpMaximize
 #f: discharge on communication unit/time
 #g: discharge on computation unit/time 
 #s: (t,j) if 1 then satellite is in shadow otherwise in light
-def ILP2(H, S, A, B, mem, up, down, col, com, p, pt):
+#sparse: if True, variables are created only for real opportunities (see utility/opportunityIndex.py)
+#cumulative: if True, memory and collected data are carried as state variables from one instant to the next instead of being summed from instant 0 in every row
+#starts: optional {Sj: instants} at which Sj may start processing in the sparse model (see utility/eventCompression.py)
+#aggregated: if True, only the number of data units Sj downloads at Bk in instant t is a variable; the areas are assigned to the downloads after the solve (see utility/downloadAssignment.py)
+#solver: optional SolverConfig (solver, threads, time limit, gaps, log; see utility/solverConfig.py), CBC without limits by default
+#presolve: if True, the areas, satellites, ground stations, opportunities and time instants that cannot take part in a schedule are removed first (see utility/presolve.py)
+@instrumented("ILP2")
+def ILP2(H, S, A, B, mem, up, down, col, com, p, pt, sparse = False, cumulative = False, starts = None, aggregated = False, solver = None, presolve = False):
+	if presolve:
+		with phase("presolve"):
+			reduced, removed = reduce_instance(H, S, A, B, col, com, p, pt)
+		print_presolve(reduced, removed)
+		H, S, A, B, col, com = (reduced[name] for name in ("H", "S", "A", "B", "col", "com"))
+	prob, x, z, y, idx = build_ILP2(H, S, A, B, mem, up, down, col, com, p, pt, sparse, cumulative, starts, aggregated)
+	windows = download_windows(idx, col) if aggregated else {}
+	H = idx.H
+	
+	
+	
+	
+	config = solver or SolverConfig()
+	with phase("solve"):
+		status = config.solve(prob)
+	print("STATUS: ", status)
+	if solver is not None:
+		print_report(config.report)
+	
+	steps = Sections()
+	steps.next("extract")
+	if status == 1:
+		print("COLLECTIONS DONE: ")
+		for (t,i,j) in sorted(idx.x, key = lambda key: (key[0], key[2], key[1])):
+			if round(x[t,i,j].value() or 0) == 1:
+				print(t, ": ", j, " - ", i)
+
+		print("ON SATELLITE PROCESSING DONE: ")
+		for (t,i,j) in sorted(idx.z, key = lambda key: (key[0], key[2], key[1])):
+			if round(z[t,i,j].value() or 0) == 1:
+				print(t, ": ", j, " - ", i)
+						
+		if aggregated:
+			processed = set((i,j) for (t,i,j) in idx.z if round(z[t,i,j].value() or 0) == 1)
+			counts = {key: round(y[key].value() or 0) for key in idx.w}
+			items = {key: deadline for key, deadline in windows.items() if round(x[key].value() or 0) == 1 and (key[1],key[2]) not in processed}
+			downloads = assign_downloads(counts, items)
+		else:
+			downloads = [key for key in sorted(idx.y, key = lambda key: (key[0], key[3], key[2], key[1])) if round(y[key].value() or 0) == 1]
+		print("COMMUNICATIONS DONE: ")
+		for (t,i,j,k) in downloads:
+			print(t, ": ", j, " " , i, " -> ", k)
+	steps.close()
+
+
+#Builds the ILP2 model without solving it (in the aggregated model, y holds the download counts w[t,j,k])
+def build_ILP2(H, S, A, B, mem, up, down, col, com, p, pt, sparse = False, cumulative = False, starts = None, aggregated = False):
 	prob = plp.LpProblem('LEO_K', plp.LpMaximize)
+	steps = Sections("build", prob)
+	steps.next("Opportunity index")
+	idx = OpportunityIndex(H, S, A, B, col, com, p, pt, sparse, starts, aggregated = aggregated)
+	H = idx.H
 	
 	
+	steps.next("Variables")
 	###################################### VARIABLES ###########################################
 	#Denotes that data from Ai is collected by satellite Sj at time instant t
-	x = plp.LpVariable.dicts("x", [(t,i,j) for t in H for i in A for j in S], cat = "Binary")
+	x = plp.LpVariable.dicts("x", idx.x, cat = "Binary")
 	#Denotes that at time instant t,  Sj starts processing data collected from sub-region Ai
-	z = plp.LpVariable.dicts("z", [(t,i,j) for t in H for i in A for j in S], cat = "Binary")
+	z = plp.LpVariable.dicts("z", idx.z, cat = "Binary")
 	#Denotes that data from Ai collected by Sj is downloaded at GS Bk at time instant t
-	y = plp.LpVariable.dicts("y", [(t,i,j,k) for t in H for i in A for j in S for k in B], cat = 'Binary')
+	y = plp.LpVariable.dicts("y", idx.y, cat = 'Binary')
+	#Number of data units Sj downloads at GS Bk at time instant t (aggregated model, instead of y)
+	w = plp.LpVariable.dicts("w", idx.w, lowBound = 0, cat = 'Integer')
+	#Denotes that the data unit of collection (t,Ai,Sj) is downloaded rather than processed (aggregated model)
+	windows = download_windows(idx, col) if aggregated else {}
+	v = plp.LpVariable.dicts("v", list(windows), lowBound = 0, upBound = 1)
+	steps.count(variables = len(x) + len(z) + len(y) + len(w) + len(v))
+
+	#Downloads of Sj, and downloads at Bk, in time instant t
+	def sent(t, j):
+		return [y[t,i,j,k] for (i,k) in idx.y_tj[t,j]] + [w[t,j,k] for k in idx.w_tj[t,j]]
+	def received(t, k):
+		return [y[t,i,j,k] for (i,j) in idx.y_tk[t,k]] + [w[t,j,k] for j in idx.w_tk[t,k]]
 
 
 
@@ -44,115 +121,213 @@ def ILP2(H, S, A, B, mem, up, down, col, com, p, pt):
 
 
 	###################################### CONSTRAINTS ###########################################
-	#Remove the invalid collection and communication opportunities
-	for t in H:
-		for i in A:
-			for j in S:
-				if (t,j,i) not in col:
-					prob += x[t,i,j] == 0		#To remove the variables that are not collection opportunities
-				else:
-					prob += z[t,i,j] == 0		#If there is a collection opportunity, it can be processed starting from at least next instant
-				
-				for k in B:
-					if (t,j,k) not in com:
-						prob += y[t,i,j,k] == 0 #Invalid communication opportunities
-				
-				if t == 0:						#Communication/Computation cannot occur at time instant 0
-					prob += z[t,i,j] == 0
-					prob += y[t,i,j,k] == 0
-
-				if t > (p-pt):
-					prob += z[t,i,j] == 0
+	steps.next("Invalid opportunities")
+	#Remove the invalid collection and communication opportunities (the sparse index never creates them)
+	if not sparse:
+		for t in H:
+			for i in A:
+				for j in S:
+					if (t,j,i) not in col:
+						prob += x[t,i,j] == 0		#To remove the variables that are not collection opportunities
+					else:
+						prob += z[t,i,j] == 0		#If there is a collection opportunity, it can be processed starting from at least next instant
+					
+					for k in B:
+						if (t,j,k) not in com and not aggregated:
+							prob += y[t,i,j,k] == 0 #Invalid communication opportunities
+					
+					if t == 0:						#Communication/Computation cannot occur at time instant 0
+						prob += z[t,i,j] == 0
+						for k in B:
+							if (t,j,k) in com and not aggregated:
+								prob += y[t,i,j,k] == 0
+
+					if t > (p-pt):
+						prob += z[t,i,j] == 0
+
+				for j in S:
+					for k in B:
+						if ((t,j,k) not in com or t == 0) and aggregated:
+							prob += w[t,j,k] == 0
 
 						
 	
+	steps.next("One collection per instant")
 	#Each satellite collects at most one area in an instant
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(x[t,i,j] for i in A) <= 1
+			if sparse and len(idx.x_tj[t,j]) < 2:
+				continue
+			prob += plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) <= 1
 	
 	
+	steps.next("Area collected once")
 	#Each area is collected at-most once
 	for i in A:
-		prob += plp.lpSum(x[t,i,j] for t in H for j in S) <= 1
+		if sparse and len(idx.x_i[i]) < 2:
+			continue
+		prob += plp.lpSum(x[t,i,j] for (t,j) in idx.x_i[i]) <= 1
 
 	
+	steps.next("Memory bound")
 	#Memory bound
-	for j in S:
-		for t in H:
-			downloaded = plp.lpSum(y[t1,i,j,k] for k in B for i in A for t1 in range(0,t+1)) 
-			processed = plp.lpSum(z[t1,i,j] for t1 in range(0,t-pt+1) for i in A)
-			prob += plp.lpSum(x[t1,i,j] for i in A for t1 in range(0,t+1)) - (downloaded + processed) <= mem[j]
+	#Occupancy only grows at a collection, so the sparse model only checks those instants
+	if cumulative:
+		#Number of data units in the memory of Sj at the end of time instant t
+		M = plp.LpVariable.dicts("M", [(t,j) for j in S for t in H])
+		steps.count(variables = len(M))
+		for j in S:
+			held = 0
+			started = []
+			done = 0
+			for t in H:
+				started += [(t,z[t,i,j]) for i in idx.z_tj[t,j]]
+				processed = []
+				while done < len(started) and started[done][0] <= t-pt:
+					processed.append(started[done][1])
+					done += 1
+				prob += M[t,j] == held + plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) - (plp.lpSum(sent(t, j)) + plp.lpSum(processed))
+				held = M[t,j]
+				if sparse and not idx.x_tj[t,j]:
+					continue
+				prob += M[t,j] <= mem[j]
+	else:
+		for j in S:
+			collected, downloaded, processed, started = [], [], [], []
+			for t in H:
+				collected += [x[t,i,j] for i in idx.x_tj[t,j]]
+				downloaded += sent(t, j)
+				started += [(t,z[t,i,j]) for i in idx.z_tj[t,j]]
+				while len(processed) < len(started) and started[len(processed)][0] <= t-pt:
+					processed.append(started[len(processed)][1])
+				if sparse and not idx.x_tj[t,j]:
+					continue
+				prob += plp.lpSum(collected) - (plp.lpSum(downloaded) + plp.lpSum(processed)) <= mem[j]
 			
 			
+	steps.next("Downlink capacity")
 	#Downlink capacity of ground stations
 	for t in H:
 		for k in B:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for j in S) <= down[k]
+			if sparse and not received(t, k):
+				continue
+			prob += plp.lpSum(received(t, k)) <= down[k]
 	
 	
+	steps.next("Uplink capacity")
 	#Uplink capacity of satellites
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for k in B) <= up[j]
+			if sparse and not sent(t, j):
+				continue
+			prob += plp.lpSum(sent(t, j)) <= up[j]
 	
 
+	steps.next("Process all collected data")
 	#Process all collected data
 	for (t,j,i) in col:
-		prob += x[t,i,j] - ( plp.lpSum(y[t1,i,j,k] for t1 in range(t+1,p) for k in B) + plp.lpSum(z[t1,i,j] for t1 in  range(t+1,p)) ) == 0
+		if (t,i,j) not in x:
+			continue
+		if aggregated:
+			downloaded = plp.lpSum(v[t1,i,j] for t1 in idx.x_ij[i,j] if t1 >= t and (t1,i,j) in v)		#Collections from t on, downloaded in their window
+		else:
+			downloaded = plp.lpSum(y[t1,i,j,k] for (t1,k) in idx.y_ij[i,j] if t1 > t)
+		prob += x[t,i,j] - ( downloaded + plp.lpSum(z[t1,i,j] for t1 in idx.z_ij[i,j] if t1 > t) ) == 0
 
 
+	steps.next("Sequential processing")
 	#Sequential processing
 	for j in S:
-		for t in range(1,p-pt+1):
-			prob += plp.lpSum(z[t1,i,j] for i in A for t1 in range(t, min(t+pt, p))) <= 1
+		for n, t in enumerate(H):
+			if t < 1 or t > (p-pt) or (sparse and not idx.z_tj[t,j]):
+				continue
+			window = []
+			for t1 in H[n:]:
+				if t1 >= min(t+pt, p):
+					break
+				window += [z[t1,i,j] for i in idx.z_tj[t1,j]]
+			prob += plp.lpSum(window) <= 1
 
 	
+	steps.next("Collection count")
+	#Number of collections of Ai by Sj before time instant t
+	if cumulative:
+		#Running count kept only at the collection instants of each (Ai, Sj) pair
+		X = plp.LpVariable.dicts("X", [(t,i,j) for (i,j), times in idx.x_ij.items() for t in times])
+		steps.count(variables = len(X))
+		for (i,j), times in idx.x_ij.items():
+			for n, t in enumerate(times):
+				prob += X[t,i,j] == (X[times[n-1],i,j] if n > 0 else 0) + x[t,i,j]
+
+	def collected_before(i, j, t):
+		times = idx.x_ij[i,j]
+		if cumulative:
+			n = bisect_left(times, t)
+			return X[times[n-1],i,j] if n > 0 else 0
+		return plp.lpSum(x[t1,i,j] for t1 in times if t1 < t)
+
+	
+	steps.next("Download validation")
 	#Download validation
-	for i in A:
+	for (i,j), downloads in idx.y_ij.items():
+		for t in sorted(set(t for (t,k) in downloads)):
+			if t < 1:
+				continue
+			prob += plp.lpSum(y[t,i,j,k] for (t1,k) in downloads if t1 == t) <= collected_before(i, j, t)
+	#Aggregated model: the data units marked in v are downloaded after their collection and, when the pair has
+	#a later collection opportunity, not after it. The rows below are Hall's condition on every interval between
+	#a collection and such a deadline, so the areas can be assigned to the downloads earliest deadline first
+	if aggregated:
+		if cumulative:
+			#Number of data units of Sj waiting for a download at the end of time instant t
+			P = plp.LpVariable.dicts("P", [(t,j) for (t,j) in sorted(set([(t,j) for (t,j,k) in idx.w] + [(t,j) for (t,i,j) in windows]))])
+			steps.count(variables = len(P))
 		for j in S:
-			for t in range(1,p):
-				prob += plp.lpSum(y[t,i,j,k] for k in B) <= plp.lpSum(x[t1,i,j] for t1 in range(0, t))
+			items = sorted((t,i,deadline) for (t,i,j1), deadline in windows.items() if j1 == j)
+			slots = sorted(set(t for (t,k) in idx.w_j[j]))
+			if not items and not slots:
+				continue
+			prob += plp.lpSum(v[t,i,j] for (t,i,deadline) in items) - plp.lpSum(w[t,j,k] for (t,k) in idx.w_j[j]) == 0
+
+			if cumulative:
+				arrivals = {}
+				for (t,i,deadline) in items:
+					arrivals.setdefault(t, []).append(v[t,i,j])
+				level = 0
+				for t in sorted(set(slots) | set(arrivals)):
+					prob += plp.lpSum(w[t,j,k] for k in idx.w_tj[t,j]) <= level
+					prob += P[t,j] == level + plp.lpSum(arrivals.get(t, [])) - plp.lpSum(w[t,j,k] for k in idx.w_tj[t,j])
+					level = P[t,j]
+			else:
+				released, downloaded = [], []
+				n = 0
+				for t in slots:
+					while n < len(items) and items[n][0] < t:
+						released.append(v[items[n][0],items[n][1],j])
+						n += 1
+					downloaded += [w[t,j,k] for k in idx.w_tj[t,j]]
+					prob += plp.lpSum(downloaded) <= plp.lpSum(released)
+
+			bounded = [(t,i,deadline) for (t,i,deadline) in items if deadline is not None]
+			for deadline in sorted(set(deadline for (t,i,deadline) in bounded)):
+				for release in sorted(set(t for (t,i,d1) in bounded if t < deadline)):
+					due = [v[t,i,j] for (t,i,d1) in bounded if t >= release and d1 <= deadline]
+					prob += plp.lpSum(w[t,j,k] for (t,k) in idx.w_j[j] if release < t <= deadline) >= plp.lpSum(due)
 
 	
+	steps.next("Processing validation")
 	#Processing validation
-	for i in A:
-		for j in S:
-			for t in range(1,p-pt):
-				prob += z[t,i,j] <= plp.lpSum(x[t1,i,j] for t1 in range(0, t))
+	for (t,i,j) in idx.z:
+		if t < 1 or t >= (p-pt):
+			continue
+		prob += z[t,i,j] <= collected_before(i, j, t)
 	
 
+	steps.next("Objective function")
 	#Objective function
-	prob.setObjective(plp.lpSum(x[t,i,j] for t in H for i in A for j in S))
-	
-	
-	
-	
-	status = prob.solve(plp.PULP_CBC_CMD(msg = False))
-	print("STATUS: ", status)
-	
-	if status == 1:
-		print("COLLECTIONS DONE: ")
-		for t in H:
-			for j in S:
-				for i in A:
-					if x[t,i,j].value() == 1:
-						print(t, ": ", j, " - ", i)
-
-		print("ON SATELLITE PROCESSING DONE: ")
-		for t in H:
-			for j in S:
-				for i in A:
-					if z[t,i,j].value() == 1:
-						print(t, ": ", j, " - ", i)
-						
-		print("COMMUNICATIONS DONE: ")
-		for t in H:
-			for k in B:
-				for j in S:
-					for i in A:
-						if y[t,i,j,k].value() == 1:
-							print(t, ": ", j, " " , i, " -> ", k)
-	
+	prob.setObjective(plp.lpSum(x[t,i,j] for (t,i,j) in idx.x))
+	steps.close()
 
-	
+	if aggregated:
+		return prob, x, z, w, idx
+	return prob, x, z, y, idx
@@ -3,7 +3,17 @@
 import timeit
 import pulp as plp
 import pandas as pd
+from bisect import bisect_left
 from pulp.constants import LpMaximize
+from utility.opportunityIndex import OpportunityIndex
+from utility.downloadAssignment import download_windows, assign_downloads
+from utility.instrumentation import instrumented, phase, count, Sections
+from utility.solverConfig import SolverConfig
+from utility.scheduleResult import ScheduleResult, print_result, print_schedule
+from utility.battery import battery_gaps, screen_battery
+from utility.presolve import reduce_instance
+from utility.incumbents import incumbent_sink
+from greedy import greedy_schedule
 
 
 
@@ -26,17 +36,208 @@ from pulp.constants import LpMaximize
 #f: discharge on communication unit/time
 #g: discharge on computation unit/time 
 #s: (t,j) if 1 then satellite is in shadow otherwise in light
-def ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s,beta):
+#sparse: if True, variables are created only for real opportunities (see utility/opportunityIndex.py)
+#cumulative: if True, memory, battery and collected data are carried as state variables from one instant to the next instead of being summed from instant 0 in every row
+#starts: optional {Sj: instants} at which Sj may start processing in the sparse model (see utility/eventCompression.py)
+#aggregated: if True, only the number of data units Sj downloads at Bk in instant t is a variable; the areas are assigned to the downloads after the solve (see utility/downloadAssignment.py)
+#init: optional state carried in from before H[0] in the sparse model (see rollingHorizon.py), C is then the battery level at H[0]
+#	{"held": {Sj: areas collected and still in memory}, "free": {Sj: instant at which the running processing ends},
+#	 "collected": areas already collected, "missed": (Ai, Sj) pairs that let an opportunity before H[0] pass}
+#	the opportunities of both are kept, as they still bound the downloads and processing, but cannot be used
+#solver: optional SolverConfig (solver, threads, time limit, gaps, log; see utility/solverConfig.py), CBC without limits by default
+#warm_start: if True, the schedule of the greedy scheduler (see greedy.py) is the starting solution of CBC, and
+#	the schedule printed and returned (status 1) when the solver stops without one, e.g. on a tight time limit
+#presolve: if True, the areas, satellites, ground stations, opportunities and time instants that cannot take part in a schedule are removed first (see utility/presolve.py)
+#lazy: if True, the model starts without the memory bound and battery underflow rows; after every solve the rows the schedule
+#	violates are added (see violated_rows) and the model is solved again, until the schedule violates none: same optimum
+#incumbents: anytime mode, every improving schedule is handed as soon as it is found to a function or appended to a JSON lines
+#	file (see utility/incumbents.py): the greedy one first with warm_start, then the solver ones (with HiGHS; CBC only
+#	gives its final schedule). With the lazy model, only the schedules that violate none of the left out rows are handed
+#budget: wall-clock seconds from the start of the call; every solve gets what is left of it as its time limit, and none
+#	is started once it is spent (after the build and greedy, or between the rounds of the lazy model): the best schedule
+#	found by then is returned, the greedy one with warm_start (status 0 without one). Only the solver time is cut short:
+#	the screening, presolve, build, greedy and the transfer of the model to the solver run to their end, so a call
+#	overruns the budget by as much as they take after it is spent
+def ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s,beta, sparse = False, cumulative = False, starts = None, init = None, aggregated = False, solver = None, warm_start = False, presolve = False, lazy = False, incumbents = None, budget = None):
+	result = solve_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse, cumulative, starts, init, aggregated, solver, warm_start, presolve, lazy, incumbents, budget)
+	print_result(result, solver is not None)
+	
+	#Memory and battery of the schedule at every tick, and the constraints it violates: see utility/scheduleValidator.py
+							
+	#return status, prob.objective, exc_ilp, mem_ilp
+	return result.status, result.objective, 0, 0
+
+
+#Same arguments as ILP_LAS; solves without printing and returns a ScheduleResult (see utility/scheduleResult.py)
+#The data-only battery rows are screened first (see utility/battery.py): when the eclipse data is incomplete
+#or already violates them, the model is not built and the issues are returned with status -1
+@instrumented("ILP_LAS")
+def solve_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse = False, cumulative = False, starts = None, init = None, aggregated = False, solver = None, warm_start = False, presolve = False, lazy = False, incumbents = None, budget = None):
+	timings = {}
+	began = start = timeit.default_timer()
+	with phase("screen"):
+		issues = screen_battery(H, S, C, theta, beta, p, c, d, s)
+	timings["screen"] = timeit.default_timer() - start
+	if issues:
+		return ScheduleResult(-1, None, timings = timings, screening = issues)
+
+	reduction = None
+	if presolve:
+		start = timeit.default_timer()
+		with phase("presolve"):
+			reduction = reduce_instance(H, S, A, B, col, com, p, pt, (init or {}).get("held"))
+		H, S, A, B, col, com = (reduction[0][name] for name in ("H", "S", "A", "B", "col", "com"))
+		timings["presolve"] = timeit.default_timer() - start
+
+	start = timeit.default_timer()
+	prob, x, z, y, idx = build_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse, cumulative, starts, init, aggregated, lazy)
+	H = idx.H
+	timings["build"] = timeit.default_timer() - start
+
+	greedy = None
+	if warm_start:
+		start = timeit.default_timer()
+		with phase("greedy"):
+			greedy_status, plan = greedy_schedule(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts, init)
+			greedy = (greedy_status, len(plan["x"]))
+			if greedy_status == 1:
+				set_initial_values(x, z, y, plan, aggregated)
+		timings["greedy"] = timeit.default_timer() - start
+
+	#Best schedule known: (objective, source, schedule). In the anytime mode, every better one is handed to the sink
+	sink = incumbent_sink(incumbents) if incumbents is not None else None
+	best = [None]
+	def hand(source, objective, bound, schedule):
+		if best[0] is None or objective > best[0][0]:
+			best[0] = (objective, source, schedule)
+			if sink is not None:
+				sink({"source": source, "seconds": timeit.default_timer() - began, "objective": objective, "bound": bound, "schedule": schedule})
+	if greedy is not None and greedy[0] == 1:
+		hand("greedy", len(plan["x"]), None, plan)
+	def improving(objective, bound, values, seconds):
+		for variable, value in values.items():
+			variable.varValue = value
+		if not lazy or not violated_rows(x, z, y, idx, S, C, mem, theta, p, pt, c, d, e, f, g, s, init):
+			hand("solver", objective, bound, schedule_of(x, z, y, idx, col))
+
+	config = solver or SolverConfig()
+	remaining = lambda: budget - (timeit.default_timer() - began)
+	def solve():
+		limited = config
+		if budget is not None:
+			left = remaining()
+			limited = SolverConfig(**dict(config.settings(), time_limit = min(left, config.time_limit or left)))
+		status = limited.solve(prob, warm_start = greedy is not None and greedy[0] == 1, incumbent = improving if sink is not None else None)
+		config.report = limited.report
+		return status
+
+	start = timeit.default_timer()
+	if budget is not None and remaining() <= 0:
+		#Spent before the solver could start: the model is not solved
+		status = plp.LpStatusNotSolved
+		config.report = dict(config.settings(), status = status, objective = None, bound = None, gap = None, time = 0)
+	else:
+		with phase("solve") as record:
+			status = solve()
+			count(record, status = status, objective = config.report["objective"])
+	timings["solve"] = timeit.default_timer() - start
+
+	#Lazy model: the greedy schedule satisfies every row, so it is set again as the start of every round (the
+	#variables hold the schedule of the round before, or the last incumbent, which PuLP would pass on instead).
+	#The rounds only get what is left of the budget: when it is spent, the schedule that still violates rows is dropped
+	rounds = None
+	if lazy:
+		rounds = [0, 0]
+		timings["separate"] = 0
+		while status == 1:
+			start = timeit.default_timer()
+			with phase("separate") as record:
+				cuts = violated_rows(x, z, y, idx, S, C, mem, theta, p, pt, c, d, e, f, g, s, init)
+				count(record, rows = len(cuts))
+			timings["separate"] += timeit.default_timer() - start
+			if not cuts:
+				break
+			if budget is not None and remaining() <= 0:
+				status = plp.LpStatusNotSolved
+				break
+			for (family, t, j, row) in cuts:
+				prob += row
+			rounds[0] += 1
+			rounds[1] += len(cuts)
+			if greedy is not None and greedy[0] == 1:
+				set_initial_values(x, z, y, plan, aggregated)
+			start = timeit.default_timer()
+			with phase("solve") as record:
+				status = solve()
+				count(record, status = status, objective = config.report["objective"])
+			timings["solve"] += timeit.default_timer() - start
+		rounds = tuple(rounds)
+
+	start = timeit.default_timer()
+	with phase("extract"):
+		schedule = schedule_of(x, z, y, idx, col) if status == 1 else None
+	timings["extract"] = timeit.default_timer() - start
+	#A model without any collection variable (nothing to collect, e.g. after the presolve) has no objective expression
+	if status == 1:
+		objective = plp.value(prob.objective) or 0
+		hand("solver", objective, config.report["bound"], schedule)
+	elif lazy or status == plp.LpStatusNotSolved:
+		objective = None		#The values of the lazy model may violate rows, the ones of a model not solved are not a schedule
+	else:
+		objective = plp.value(prob.objective)
+
+	#The last solve stopped without a schedule, or with a worse one than the greedy one or an incumbent handed before
+	if best[0] is not None and (status != 1 or best[0][0] > objective):
+		objective, source, schedule = best[0]
+		return ScheduleResult(1, objective, schedule, timings, config.report, "greedy" if source == "greedy" else "incumbent", greedy, presolve = reduction, lazy = rounds)
+	return ScheduleResult(status, objective, schedule, timings, config.report, greedy = greedy, presolve = reduction, lazy = rounds)
+
+
+#Builds the ILP_LAS model without solving it, for the solvers that drive it (rolling horizon, decomposition, ...)
+#Returns the problem, the variable dictionaries and the OpportunityIndex they are keyed by
+#(in the aggregated model, y holds the download counts w[t,j,k])
+#lazy: if True, the memory bound and battery underflow rows are left out (see violated_rows)
+def build_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse = False, cumulative = False, starts = None, init = None, aggregated = False, lazy = False):
 	prob = plp.LpProblem('LEO_K', plp.LpMaximize)
+	steps = Sections("build", prob)
+	steps.next("Opportunity index")
+	held = (init or {}).get("held", {})
+	free = (init or {}).get("free", {})
+	collected = (init or {}).get("collected", ())
+	missed = (init or {}).get("missed", ())
+	idx = OpportunityIndex(H, S, A, B, col, com, p, pt, sparse, starts, held, free, aggregated)
+	H = idx.H
+
+	#Data units in the memory of Sj at t that were there before H[0]
+	def occupied(j, t):
+		return len(held.get(j, ())) + (1 if t < free.get(j, 0) else 0)
 	
 	
+	steps.next("Variables")
 	###################################### VARIABLES ###########################################
 	#Denotes that data from Ai is collected by satellite Sj at time instant t
-	x = plp.LpVariable.dicts("x", [(t,i,j) for t in H for i in A for j in S], cat = "Binary")
+	x = plp.LpVariable.dicts("x", idx.x, cat = "Binary")
 	#Denotes that at time instant t,  Sj starts processing data collected from sub-region Ai
-	z = plp.LpVariable.dicts("z", [(t,i,j) for t in H for i in A for j in S], cat = "Binary")
+	z = plp.LpVariable.dicts("z", idx.z, cat = "Binary")
 	#Denotes that data from Ai collected by Sj is downloaded at GS Bk at time instant t
-	y = plp.LpVariable.dicts("y", [(t,i,j,k) for t in H for i in A for j in S for k in B], cat = 'Binary')
+	y = plp.LpVariable.dicts("y", idx.y, cat = 'Binary')
+	#Number of data units Sj downloads at GS Bk at time instant t (aggregated model, instead of y)
+	w = plp.LpVariable.dicts("w", idx.w, lowBound = 0, cat = 'Integer')
+	#Denotes that the data unit of collection (t,Ai,Sj) is downloaded rather than processed (aggregated model)
+	windows = download_windows(idx, col) if aggregated else {}
+	v = plp.LpVariable.dicts("v", list(windows), lowBound = 0, upBound = 1)
+	steps.count(variables = len(x) + len(z) + len(y) + len(w) + len(v))
+
+	#Downloads of Sj, and downloads at Bk, in time instant t
+	def sent(t, j):
+		return [y[t,i,j,k] for (i,k) in idx.y_tj[t,j]] + [w[t,j,k] for k in idx.w_tj[t,j]]
+	def received(t, k):
+		return [y[t,i,j,k] for (i,j) in idx.y_tk[t,k]] + [w[t,j,k] for j in idx.w_tk[t,k]]
+
+	#Largest battery drain of Sj by its decisions in time instant t: one collection, up[j] downloads and one processing start
+	#at most. Memory and battery rows that hold even at these bounds are always satisfied and left out of the model
+	def most_drained(t, j):
+		return (e if idx.x_tj[t,j] else 0) + f * min(up[j], len(idx.y_tj[t,j]) + up[j] * len(idx.w_tj[t,j])) + (pt * g if idx.z_tj[t,j] else 0)
 
 
 
@@ -44,176 +245,371 @@ def ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g,
 
 
 	###################################### CONSTRAINTS ###########################################
-	#Remove the invalid collection and communication opportunities
-	for t in H:
-		for i in A:
-			for j in S:
-				if (t,j,i) not in col:
-					prob += x[t,i,j] == 0		#To remove the variables that are not collection opportunities
-				else:
-					prob += z[t,i,j] == 0		#If there is a collection opportunity, it can be processed starting from at least next instant
-				
-				for k in B:
-					if (t,j,k) not in com:
-						prob += y[t,i,j,k] == 0 #Invalid communication opportunities
-				
-				if t == 0:						#Communication/Computation cannot occur at time instant 0
-					prob += z[t,i,j] == 0
-					prob += y[t,i,j,k] == 0
-
-				if t > (p-pt):
-					prob += z[t,i,j] == 0
+	steps.next("Invalid opportunities")
+	#Remove the invalid collection and communication opportunities (the sparse index never creates them)
+	if not sparse:
+		for t in H:
+			for i in A:
+				for j in S:
+					if (t,j,i) not in col:
+						prob += x[t,i,j] == 0		#To remove the variables that are not collection opportunities
+					else:
+						prob += z[t,i,j] == 0		#If there is a collection opportunity, it can be processed starting from at least next instant
+					
+					for k in B:
+						if (t,j,k) not in com and not aggregated:
+							prob += y[t,i,j,k] == 0 #Invalid communication opportunities
+					
+					if t == 0:						#Communication/Computation cannot occur at time instant 0
+						prob += z[t,i,j] == 0
+						for k in B:
+							if (t,j,k) in com and not aggregated:
+								prob += y[t,i,j,k] == 0
+
+					if t > (p-pt):
+						prob += z[t,i,j] == 0
+
+				for j in S:
+					for k in B:
+						if ((t,j,k) not in com or t == 0) and aggregated:
+							prob += w[t,j,k] == 0
 
 						
 	
+	steps.next("Collected before H[0]")
+	#Areas collected before H[0] are not collected again, and a pair that let an opportunity pass
+	#before H[0] could not download or process a later collection
+	for (t,i,j) in idx.x:
+		if i in collected or (i,j) in missed:
+			prob += x[t,i,j] == 0
+
+	
+	steps.next("One collection per instant")
 	#Each satellite collects at most one area in an instant
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(x[t,i,j] for i in A) <= 1
+			if sparse and len(idx.x_tj[t,j]) < 2:
+				continue
+			prob += plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) <= 1
 	
 	
+	steps.next("Area collected once")
 	#Each area is collected at-most once
 	for i in A:
-		prob += plp.lpSum(x[t,i,j] for t in H for j in S) <= 1
+		if sparse and len(idx.x_i[i]) < 2:
+			continue
+		prob += plp.lpSum(x[t,i,j] for (t,j) in idx.x_i[i]) <= 1
 
 	
+	steps.next("Memory bound")
 	#Memory bound
-	for j in S:
-		for t in H:
-			downloaded = plp.lpSum(y[t1,i,j,k] for k in B for i in A for t1 in range(0,t+1)) 
-			processed = plp.lpSum(z[t1,i,j] for t1 in range(0,t-pt+1) for i in A)
-			prob += plp.lpSum(x[t1,i,j] for i in A for t1 in range(0,t+1)) - (downloaded + processed) <= mem[j]
+	#Occupancy only grows at a collection, so the sparse model only checks those instants
+	if cumulative and not lazy:
+		#Number of data units in the memory of Sj at the end of time instant t
+		M = plp.LpVariable.dicts("M", [(t,j) for j in S for t in H])
+		steps.count(variables = len(M))
+		for j in S:
+			level = 0
+			before = 0
+			started = []
+			done = 0
+			most = 0
+			for t in H:
+				started += [(t,z[t,i,j]) for i in idx.z_tj[t,j]]
+				processed = []
+				while done < len(started) and started[done][0] <= t-pt:
+					processed.append(started[done][1])
+					done += 1
+				prob += M[t,j] == level + (occupied(j, t) - before) + plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j]) - (plp.lpSum(sent(t, j)) + plp.lpSum(processed))
+				level = M[t,j]
+				before = occupied(j, t)
+				most += 1 if idx.x_tj[t,j] else 0
+				if (sparse and not idx.x_tj[t,j]) or occupied(j, t) + most <= mem[j]:
+					continue
+				prob += M[t,j] <= mem[j]
+	elif not lazy:
+		for j in S:
+			collected, downloaded, processed, started = [], [], [], []
+			most = 0
+			for t in H:
+				collected += [x[t,i,j] for i in idx.x_tj[t,j]]
+				downloaded += sent(t, j)
+				started += [(t,z[t,i,j]) for i in idx.z_tj[t,j]]
+				while len(processed) < len(started) and started[len(processed)][0] <= t-pt:
+					processed.append(started[len(processed)][1])
+				most += 1 if idx.x_tj[t,j] else 0
+				if (sparse and not idx.x_tj[t,j]) or occupied(j, t) + most <= mem[j]:
+					continue
+				prob += plp.lpSum(collected) - (plp.lpSum(downloaded) + plp.lpSum(processed)) + occupied(j, t) <= mem[j]
 			
 			
+	steps.next("Downlink capacity")
 	#Downlink capacity of ground stations
 	for t in H:
 		for k in B:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for j in S) <= down[k]
+			if sparse and not received(t, k):
+				continue
+			prob += plp.lpSum(received(t, k)) <= down[k]
 	
 	
+	steps.next("Uplink capacity")
 	#Uplink capacity of satellites
 	for j in S:
 		for t in H:
-			prob += plp.lpSum(y[t,i,j,k] for i in A for k in B) <= up[j]
+			if sparse and not sent(t, j):
+				continue
+			prob += plp.lpSum(sent(t, j)) <= up[j]
 	
 
+	steps.next("Process all collected data")
 	#Process all collected data
 	for (t,j,i) in col:
-		prob += x[t,i,j] - ( plp.lpSum(y[t1,i,j,k] for t1 in range(t+1,p) for k in B) + plp.lpSum(z[t1,i,j] for t1 in  range(t+1,p)) ) == 0
+		if (t,i,j) not in x:
+			continue
+		if aggregated:
+			downloaded = plp.lpSum(v[t1,i,j] for t1 in idx.x_ij[i,j] if t1 >= t and (t1,i,j) in v)		#Collections from t on, downloaded in their window
+		else:
+			downloaded = plp.lpSum(y[t1,i,j,k] for (t1,k) in idx.y_ij[i,j] if t1 > t)
+		prob += x[t,i,j] - ( downloaded + plp.lpSum(z[t1,i,j] for t1 in idx.z_ij[i,j] if t1 > t) ) == 0
+	for j in held:
+		for i in held[j]:
+			downloaded = v[H[0]-1,i,j] if aggregated else plp.lpSum(y[t1,i,j,k] for (t1,k) in idx.y_ij[i,j])
+			prob += downloaded + plp.lpSum(z[t1,i,j] for t1 in idx.z_ij[i,j]) == 1
 
 
+	steps.next("Sequential processing")
 	#Sequential processing
 	for j in S:
-		for t in range(1,p-pt+1):
-			prob += plp.lpSum(z[t1,i,j] for i in A for t1 in range(t, min(t+pt, p))) <= 1
+		for n, t in enumerate(H):
+			if t < 1 or t > (p-pt) or (sparse and not idx.z_tj[t,j]):
+				continue
+			window = []
+			for t1 in H[n:]:
+				if t1 >= min(t+pt, p):
+					break
+				window += [z[t1,i,j] for i in idx.z_tj[t1,j]]
+			prob += plp.lpSum(window) <= 1
 
 	
+	steps.next("Collection count")
+	#Number of collections of Ai by Sj before time instant t
+	if cumulative:
+		#Running count kept only at the collection instants of each (Ai, Sj) pair
+		X = plp.LpVariable.dicts("X", [(t,i,j) for (i,j), times in idx.x_ij.items() for t in times])
+		steps.count(variables = len(X))
+		for (i,j), times in idx.x_ij.items():
+			for n, t in enumerate(times):
+				prob += X[t,i,j] == (X[times[n-1],i,j] if n > 0 else 0) + x[t,i,j]
+
+	def collected_before(i, j, t):
+		times = idx.x_ij[i,j]
+		carried = 1 if i in held.get(j, ()) else 0
+		if cumulative:
+			n = bisect_left(times, t)
+			return (X[times[n-1],i,j] if n > 0 else 0) + carried
+		return plp.lpSum(x[t1,i,j] for t1 in times if t1 < t) + carried
+
+	
+	steps.next("Download validation")
 	#Download validation
-	for i in A:
+	for (i,j), downloads in idx.y_ij.items():
+		for t in sorted(set(t for (t,k) in downloads)):
+			if t < 1:
+				continue
+			prob += plp.lpSum(y[t,i,j,k] for (t1,k) in downloads if t1 == t) <= collected_before(i, j, t)
+	#Aggregated model: the data units marked in v are downloaded after their collection and, when the pair has
+	#a later collection opportunity, not after it. The rows below are Hall's condition on every interval between
+	#a collection and such a deadline, so the areas can be assigned to the downloads earliest deadline first
+	if aggregated:
+		if cumulative:
+			#Number of data units of Sj waiting for a download at the end of time instant t
+			P = plp.LpVariable.dicts("P", [(t,j) for (t,j) in sorted(set([(t,j) for (t,j,k) in idx.w] + [(t,j) for (t,i,j) in windows]))])
+			steps.count(variables = len(P))
 		for j in S:
-			for t in range(1,p):
-				prob += plp.lpSum(y[t,i,j,k] for k in B) <= plp.lpSum(x[t1,i,j] for t1 in range(0, t))
+			items = sorted((t,i,deadline) for (t,i,j1), deadline in windows.items() if j1 == j)
+			slots = sorted(set(t for (t,k) in idx.w_j[j]))
+			if not items and not slots:
+				continue
+			prob += plp.lpSum(v[t,i,j] for (t,i,deadline) in items) - plp.lpSum(w[t,j,k] for (t,k) in idx.w_j[j]) == 0
+
+			if cumulative:
+				arrivals = {}
+				for (t,i,deadline) in items:
+					arrivals.setdefault(t, []).append(v[t,i,j])
+				level = 0
+				for t in sorted(set(slots) | set(arrivals)):
+					prob += plp.lpSum(w[t,j,k] for k in idx.w_tj[t,j]) <= level
+					prob += P[t,j] == level + plp.lpSum(arrivals.get(t, [])) - plp.lpSum(w[t,j,k] for k in idx.w_tj[t,j])
+					level = P[t,j]
+			else:
+				released, downloaded = [], []
+				n = 0
+				for t in slots:
+					while n < len(items) and items[n][0] < t:
+						released.append(v[items[n][0],items[n][1],j])
+						n += 1
+					downloaded += [w[t,j,k] for k in idx.w_tj[t,j]]
+					prob += plp.lpSum(downloaded) <= plp.lpSum(released)
+
+			bounded = [(t,i,deadline) for (t,i,deadline) in items if deadline is not None]
+			for deadline in sorted(set(deadline for (t,i,deadline) in bounded)):
+				for release in sorted(set(t for (t,i,d1) in bounded if t < deadline)):
+					due = [v[t,i,j] for (t,i,d1) in bounded if t >= release and d1 <= deadline]
+					prob += plp.lpSum(w[t,j,k] for (t,k) in idx.w_j[j] if release < t <= deadline) >= plp.lpSum(due)
 
 	
+	steps.next("Processing validation")
 	#Processing validation
-	for i in A:
-		for j in S:
-			for t in range(1,p-pt):
-				prob += z[t,i,j] <= plp.lpSum(x[t1,i,j] for t1 in range(0, t))
+	for (t,i,j) in idx.z:
+		if t < 1 or t >= (p-pt):
+			continue
+		prob += z[t,i,j] <= collected_before(i, j, t)
 	
 
 	#Battery constraint
 
+	steps.next("Battery constraint on underflow")
 	##Battery constraint on underflow
 	"""
 	for j in S:
 		for t in H:
 			prob += C[j] - ( (e * plp.lpSum(x[t1,i,j] for i in A for t1 in range(0,t+1))) + (f * plp.lpSum(y[t1,i,j,k] for i in A for k in B for t1 in range(0,t+1))) + (g * plp.lpSum(z[t1,i,j] for i in A for t1 in range(0,t+1))) + (d * plp.lpSum(s[t1,j] for t1 in range(0,t+1))) ) + (c * plp.lpSum((1 - s[t1,j]) for t1 in range(0,t+1))) >= theta[j]
 	"""
+	#Decisions of Sj change its battery only at the instants where Sj has a variable; every other tick
+	#of the horizon is folded into the row of the instant before it (see utility/battery.py)
+	instants = {}
 	for j in S:
-		for t in H:
-			prob += C[j] - ( (e * plp.lpSum(x[t1,i,j] for i in A for t1 in range(0,t+1))) + (f * plp.lpSum(y[t1,i,j,k] for i in A for k in B for t1 in range(0,t+1))) + (pt * g * plp.lpSum(z[t1,i,j] for i in A for t1 in range(0,t+1))) + (d * (t+1)) ) + (c * plp.lpSum((1 - s[t1,j]) for t1 in range(0,t+1))) >= theta[j]
+		instants[j] = [t for t in H if not sparse or t == H[0] or idx.x_tj[t,j] or sent(t, j) or idx.z_tj[t,j]]
+	if cumulative and not lazy:
+		#Battery level of Sj at the end of time instant t
+		E = plp.LpVariable.dicts("E", [(t,j) for j in S for t in instants[j]])
+		steps.count(variables = len(E))
+		for j in S:
+			level = C[j]
+			before = 0
+			drained = 0
+			for t, (now, low, high) in sorted(battery_gaps(instants[j], j, p, c, d, s).items()):
+				prob += E[t,j] == level - ( (e * plp.lpSum(x[t,i,j] for i in idx.x_tj[t,j])) + (f * plp.lpSum(sent(t, j))) + (pt * g * plp.lpSum(z[t,i,j] for i in idx.z_tj[t,j])) ) + (now - before)
+				drained += most_drained(t, j)
+				if C[j] + low - drained < theta[j]:
+					prob += E[t,j] + (low - now) >= theta[j]
+				level = E[t,j]
+				before = now
+	elif not lazy:
+		for j in S:
+			collected, downloaded, processed = [], [], []
+			drained = 0
+			for t, (now, low, high) in sorted(battery_gaps(instants[j], j, p, c, d, s).items()):
+				collected += [x[t,i,j] for i in idx.x_tj[t,j]]
+				downloaded += sent(t, j)
+				processed += [z[t,i,j] for i in idx.z_tj[t,j]]
+				drained += most_drained(t, j)
+				if C[j] + low - drained >= theta[j]:
+					continue
+				prob += C[j] - ( (e * plp.lpSum(collected)) + (f * plp.lpSum(downloaded)) + (pt * g * plp.lpSum(processed)) ) + low >= theta[j]
 
+	steps.next("Battery constraint on overflow")
 	##Battery constraint on overflow
+	#Data only rows: only a violated one is kept (as an expression, so that it makes the model infeasible)
 	for j in S:
-		for t in H:
-			prob += C[j] + (c * plp.lpSum((1 - s[t1,j]) for t1 in range(0,t+1))) <= beta[j]
+		for t, (now, low, high) in sorted(battery_gaps(instants[j], j, p, c, d, s).items()):
+			if C[j] + high > beta[j]:
+				prob += plp.lpSum([C[j], high]) <= beta[j]
 
 
+	steps.next("Objective function")
 	#Objective function
-	prob.setObjective(plp.lpSum(x[t,i,j] for t in H for i in A for j in S))
-	
-	status = prob.solve(plp.PULP_CBC_CMD(msg = False))
-	print("STATUS: ", status)
-	
-	if status == 1:
-		#print("COLLECTIONS DONE: ", prob.objective)
-		print("COLLECTIONS DONE: ")
-		for t in H:
-			for j in S:
-				for i in A:
-					if x[t,i,j].value() == 1:
-						print(t, ": ", j, " - ", i)
+	prob.setObjective(plp.lpSum(x[t,i,j] for (t,i,j) in idx.x))
+	steps.close()
 
-		print("ON SATELLITE PROCESSING DONE: ")
-		for t in H:
-			for j in S:
-				for i in A:
-					if z[t,i,j].value() == 1:
-						print(t, ": ", j, " - ", i)
-						
-		#print("COMMUNICATIONS DONE: ", prob.objective)
-		print("COMMUNICATIONS DONE: ")
+	if aggregated:
+		return prob, x, z, w, idx
+	return prob, x, z, y, idx
+
+
+#Collections (t,i,j), processing starts (t,i,j) and downloads (t,i,j,k) set in the solution,
+#in the order they are printed
+#idx, col: for the aggregated model, whose y holds the download counts w[t,j,k]
+def schedule_of(x, z, y, idx = None, col = None):
+	done = lambda v: v.varValue is not None and v.varValue > 0.5
+	schedule = {"x": sorted((key for key in x if done(x[key])), key = lambda key: (key[0], key[2], key[1])),
+			"z": sorted((key for key in z if done(z[key])), key = lambda key: (key[0], key[2], key[1]))}
+	if idx is None or not idx.aggregated:
+		schedule["y"] = sorted((key for key in y if done(y[key])), key = lambda key: (key[0], key[3], key[2], key[1]))
+		return schedule
+	#Downloaded: the collections and the data held from before H[0] that are not processed
+	processed = set((i,j) for (t,i,j) in schedule["z"])
+	collected = set(schedule["x"]) | set((idx.H[0]-1,i,j) for j in idx.held for i in idx.held[j])
+	counts = {key: round(v.varValue) for key, v in y.items() if v.varValue is not None and v.varValue > 0.5}
+	items = {key: deadline for key, deadline in download_windows(idx, col).items() if key in collected and (key[1],key[2]) not in processed}
+	schedule["y"] = assign_downloads(counts, items)
+	return schedule
+
+
+#Memory bound and battery underflow rows (as in the model without cumulative) that the values of the variables violate,
+#for the lazy model (see solve_ILP_LAS); only the rows of the violations found are built
+#Returns [(family, t, Sj, row)], family "memory" or "battery"
+def violated_rows(x, z, y, idx, S, C, mem, theta, p, pt, c, d, e, f, g, s, init = None, tolerance = 1e-6):
+	held = (init or {}).get("held", {})
+	free = (init or {}).get("free", {})
+	H = idx.H
+	value = lambda v: v.varValue or 0
+	def sent(t, j):
+		if idx.aggregated:
+			return [y[t,j,k] for k in idx.w_tj[t,j]]
+		return [y[t,i,j,k] for (i,k) in idx.y_tj[t,j]]
+
+	rows = []
+	for j in S:
+		instants = [t for t in H if not idx.sparse or t == H[0] or idx.x_tj[t,j] or sent(t, j) or idx.z_tj[t,j]]
+		gaps = battery_gaps(instants, j, p, c, d, s)
+		collected, downloaded, processed, started = [], [], [], []
+		#Values of the collections, downloads, finished processing and processing starts of Sj so far
+		units = drain = 0
+		#Only the first row of every stretch of violated rows is added: the later ones mostly follow from the same excess
+		over = {"memory": False, "battery": False}
 		for t in H:
-			for k in B:
-				for j in S:
-					for i in A:
-						if y[t,i,j,k].value() == 1:
-							print(t, ": ", j, " " , i, " -> ", k)
-	
-		"""
-		MEM = {}
-		print("MEMORY USAGE BY ILP: ")
-		for j in S:
-			first = 0
-			for t in H:
-				count_data = 0
-				for i in A:
-					if x[t,i,j].value() == 1:
-						count_data += 1
-				print("S", j, ", t", t, ": ", count_data, " unit collected")
-				if count_data > 0:
-					if t > 0:
-						MEM[t,j] = MEM[t-1,j] + count_data
-					else:
-						MEM[t,j] = count_data
-				else: 
-					if t > 0:
-						MEM[t,j] = MEM[t-1,j]				
-		max_mem_used = 0	
-		print("\n\nNUMBER OF DATA UNITS IN MEMORY TILL TIME INSTANT t (ignoring the downloads): <Sj, tk: collects till tk - downloads till tk - processed till tk> ")
-		for j in S:
-			for t in H:
-				downloaded = 0
-				processed = 0
-				for k in B:
-					for i in A:
-						for t1 in range(1,t+1):
-							if y[t1,i,j,k].value() == 1.0:
-								downloaded += 1
-				
-				for t1 in range(0,t):
-					for i in A:
-						if z[t1,i,j].value() == 1.0:
-							if (t - t1) >= pt:
-								processed += 1
-				
-				print("S", j, ", t", t,": ", MEM[t,j], "-", downloaded, "-", processed)		
-				if max_mem_used < (MEM[t,j] - downloaded - processed):
-					max_mem_used = MEM[t,j] - downloaded - processed		
-		print("MAXIMUM MEMORY USED: ", max_mem_used)
-		"""			
-							
-	#return status, prob.objective, exc_ilp, mem_ilp
-	print("Objective =", plp.value(prob.objective))
-	return status, prob.objective, 0, 0
+			for i in idx.x_tj[t,j]:
+				collected.append(x[t,i,j])
+				units += value(x[t,i,j])
+				drain += e * value(x[t,i,j])
+			for v in sent(t, j):
+				downloaded.append(v)
+				units -= value(v)
+				drain += f * value(v)
+			for i in idx.z_tj[t,j]:
+				started.append((t,z[t,i,j]))
+				drain += pt * g * value(z[t,i,j])
+			while len(processed) < len(started) and started[len(processed)][0] <= t-pt:
+				processed.append(started[len(processed)][1])
+				units -= value(processed[-1])
+
+			occupied = len(held.get(j, ())) + (1 if t < free.get(j, 0) else 0)
+			violated = units + occupied > mem[j] + tolerance
+			if violated and not over["memory"]:
+				rows.append(("memory", t, j, plp.lpSum(collected) - (plp.lpSum(downloaded) + plp.lpSum(processed)) + occupied <= mem[j]))
+			over["memory"] = violated
+			if t not in gaps:
+				continue
+			violated = C[j] - drain + gaps[t][1] < theta[j] - tolerance
+			if violated and not over["battery"]:
+				rows.append(("battery", t, j, C[j] - ( (e * plp.lpSum(collected)) + (f * plp.lpSum(downloaded)) + (pt * g * plp.lpSum(v for (t1,v) in started)) ) + gaps[t][1] >= theta[j]))
+			over["battery"] = violated
+	return rows
+
+
+#Sets the schedule {"x", "z", "y"} as the initial values of the variables (1 if scheduled, 0 otherwise)
+#aggregated: y holds the download counts w[t,j,k], set to the number of downloads of the schedule
+def set_initial_values(x, z, y, schedule, aggregated = False):
+	collected = set(schedule["x"])
+	processed = set(schedule["z"])
+	for key in x:
+		x[key].setInitialValue(1 if key in collected else 0)
+	for key in z:
+		z[key].setInitialValue(1 if key in processed else 0)
+	counts = {}
+	for (t,i,j,k) in schedule["y"]:
+		key = (t,j,k) if aggregated else (t,i,j,k)
+		counts[key] = counts.get(key, 0) + 1
+	for key in y:
+		y[key].setInitialValue(counts.get(key, 0))
@@ -0,0 +1,212 @@
+#ILP_LAS assembled directly as a sparse matrix, without PuLP expressions
+
+import timeit
+from bisect import bisect_left, bisect_right
+import numpy as np
+from ILP_LAS import print_schedule
+from utility.opportunityIndex import OpportunityIndex
+from utility.battery import battery_gaps, screen_battery, print_screening
+from utility.matrixModel import MatrixModel
+from utility.solverConfig import print_report
+
+
+
+#Same arguments as ILP_LAS, plus
+#solver: "highs" (highspy), "cbc" (CBC binary of PuLP, through an MPS file) or a SolverConfig (see utility/solverConfig.py)
+#mps: optional path the model is written to (fixed MPS, objective negated)
+#
+#The rows are the ones of build_ILP_LAS with sparse = True and cumulative = True, written column by
+#column into COO arrays; build_ILP_LAS stays the reference the matrix model is checked against.
+#Rows that only bound a single variable (memory, battery underflow, fixed collections) are column bounds.
+def ILP_LAS_matrix(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts = None, init = None, solver = "highs", mps = None):
+	#Data-only battery screening, as in solve_ILP_LAS
+	issues = screen_battery(H, S, C, theta, beta, p, c, d, s)
+	if issues:
+		print("STATUS: ", -1)
+		print_screening(issues)
+		print("Objective =", None)
+		return -1, None, 0, 0
+
+	start = timeit.default_timer()
+	m, idx = build_ILP_LAS_matrix(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts, init)
+	print("MATRIX BUILD TIME: ", timeit.default_timer() - start, "s (", len(m.keys), "columns,", len(m.lo), "rows,", len(m.vals), "non-zeros )")
+	if mps is not None:
+		m.write_mps(mps)
+
+	status, objective, values = m.solve(solver)
+	print("STATUS: ", status)
+	if not isinstance(solver, str):
+		print_report(solver.report)
+	if status == 1:
+		print_schedule(matrix_schedule(values, idx))
+	print("Objective =", objective)
+	return status, objective, 0, 0
+
+
+#Returns the MatrixModel, with columns ("x",t,i,j), ("z",t,i,j), ("y",t,i,j,k) and the state
+#columns ("M",t,j), ("X",t,i,j), ("E",t,j), and the OpportunityIndex
+def build_ILP_LAS_matrix(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts = None, init = None):
+	held = (init or {}).get("held", {})
+	free = (init or {}).get("free", {})
+	collected = (init or {}).get("collected", ())
+	missed = (init or {}).get("missed", ())
+	idx = OpportunityIndex(H, S, A, B, col, com, p, pt, True, starts, held, free)
+	H = idx.H
+	m = MatrixModel()
+	column = m.column
+
+	def occupied(j, t):
+		return len(held.get(j, ())) + (1 if t < free.get(j, 0) else 0)
+
+
+	###################################### VARIABLES ###########################################
+	#Areas collected before H[0] and pairs that let an opportunity pass are fixed to 0
+	for (t,i,j) in idx.x:
+		m.add_columns([("x",t,i,j)], upper = 0 if (i in collected or (i,j) in missed) else 1, integer = True, cost = 1)
+	m.add_columns([("z",) + key for key in idx.z], upper = 1, integer = True)
+	m.add_columns([("y",) + key for key in idx.y], upper = 1, integer = True)
+	#Memory level, bounded at the collection instants
+	for j in S:
+		for t in H:
+			m.add_columns([("M",t,j)], lower = -np.inf, upper = mem[j] if idx.x_tj[t,j] else np.inf)
+	m.add_columns([("X",t,i,j) for (i,j), times in idx.x_ij.items() for t in times], lower = -np.inf)
+	#Battery level, bounded below by the data-only drain of the gap after t
+	instants = {}
+	gaps = {}
+	for j in S:
+		instants[j] = [t for t in H if t == H[0] or idx.x_tj[t,j] or idx.y_tj[t,j] or idx.z_tj[t,j]]
+		gaps[j] = battery_gaps(instants[j], j, p, c, d, s)
+		for t in instants[j]:
+			now, low, high = gaps[j][t]
+			m.add_columns([("E",t,j)], lower = theta[j] - (low - now))
+
+	x = lambda t,i,j: column["x",t,i,j]
+	z = lambda t,i,j: column["z",t,i,j]
+	y = lambda t,i,j,k: column["y",t,i,j,k]
+
+
+	###################################### CONSTRAINTS ###########################################
+	#Each satellite collects at most one area in an instant
+	for (t,j), areas in idx.x_tj.items():
+		if len(areas) > 1:
+			m.add_row([x(t,i,j) for i in areas], [1.0] * len(areas), hi = 1)
+
+	#Each area is collected at-most once
+	for i, opportunities in idx.x_i.items():
+		if len(opportunities) > 1:
+			m.add_row([x(t,i,j) for (t,j) in opportunities], [1.0] * len(opportunities), hi = 1)
+
+	#Memory level: M[t,j] - M[t-1,j] - collected + downloaded + processed = data held from before H[0] released at t
+	for j in S:
+		before = 0
+		started = []
+		done = 0
+		for n, t in enumerate(H):
+			started += [(t,i) for i in idx.z_tj[t,j]]
+			processed = []
+			while done < len(started) and started[done][0] <= t-pt:
+				processed.append(z(started[done][0], started[done][1], j))
+				done += 1
+			cols = [column["M",t,j]] + [x(t,i,j) for i in idx.x_tj[t,j]] + [y(t,i,j,k) for (i,k) in idx.y_tj[t,j]] + processed
+			vals = [1.0] + [-1.0] * len(idx.x_tj[t,j]) + [1.0] * (len(idx.y_tj[t,j]) + len(processed))
+			if n > 0:
+				cols.append(column["M",H[n-1],j])
+				vals.append(-1.0)
+			rhs = occupied(j, t) - before
+			m.add_row(cols, vals, lo = rhs, hi = rhs)
+			before = occupied(j, t)
+
+	#Downlink capacity of ground stations
+	for (t,k), downloads in idx.y_tk.items():
+		m.add_row([y(t,i,j,k) for (i,j) in downloads], [1.0] * len(downloads), hi = down[k])
+
+	#Uplink capacity of satellites
+	for (t,j), downloads in idx.y_tj.items():
+		m.add_row([y(t,i,j,k) for (i,k) in downloads], [1.0] * len(downloads), hi = up[j])
+
+	#Process all collected data
+	for (t,i,j) in idx.x:
+		downloads = idx.y_ij[i,j][bisect_right([t1 for (t1,k) in idx.y_ij[i,j]], t):]
+		starts_after = idx.z_ij[i,j][bisect_right(idx.z_ij[i,j], t):]
+		cols = [x(t,i,j)] + [y(t1,i,j,k) for (t1,k) in downloads] + [z(t1,i,j) for t1 in starts_after]
+		m.add_row(cols, [1.0] + [-1.0] * (len(cols) - 1), lo = 0, hi = 0)
+	for j in held:
+		for i in held[j]:
+			cols = [y(t1,i,j,k) for (t1,k) in idx.y_ij[i,j]] + [z(t1,i,j) for t1 in idx.z_ij[i,j]]
+			m.add_row(cols, [1.0] * len(cols), lo = 1, hi = 1)
+
+	#Sequential processing
+	for j in S:
+		for n, t in enumerate(H):
+			if t < 1 or t > (p-pt) or not idx.z_tj[t,j]:
+				continue
+			window = []
+			for t1 in H[n:]:
+				if t1 >= min(t+pt, p):
+					break
+				window += [z(t1,i,j) for i in idx.z_tj[t1,j]]
+			m.add_row(window, [1.0] * len(window), hi = 1)
+
+	#Running count of the collections of each (Ai, Sj) pair
+	for (i,j), times in idx.x_ij.items():
+		for n, t in enumerate(times):
+			cols = [column["X",t,i,j], x(t,i,j)] + ([column["X",times[n-1],i,j]] if n > 0 else [])
+			m.add_row(cols, [1.0, -1.0, -1.0][:len(cols)], lo = 0, hi = 0)
+
+	#Collections of Ai by Sj before t, as (columns, coefficients, constant)
+	def collected_before(i, j, t):
+		times = idx.x_ij[i,j]
+		n = bisect_left(times, t)
+		carried = 1 if i in held.get(j, ()) else 0
+		return ([column["X",times[n-1],i,j]] if n > 0 else []), carried
+
+	#Download validation
+	for (i,j), downloads in idx.y_ij.items():
+		for t in sorted(set(t for (t,k) in downloads)):
+			if t < 1:
+				continue
+			cols, carried = collected_before(i, j, t)
+			now = [y(t,i,j,k) for (t1,k) in downloads if t1 == t]
+			m.add_row(now + cols, [1.0] * len(now) + [-1.0] * len(cols), hi = carried)
+
+	#Processing validation
+	for (t,i,j) in idx.z:
+		if t < 1 or t >= (p-pt):
+			continue
+		cols, carried = collected_before(i, j, t)
+		m.add_row([z(t,i,j)] + cols, [1.0] + [-1.0] * len(cols), hi = carried)
+
+	#Battery level: E[t,j] - E[t-1,j] + drains = data-only change (the initial level C[j] at the first instant)
+	for j in S:
+		before = 0
+		previous = None
+		for t in instants[j]:
+			now, low, high = gaps[j][t]
+			cols = [column["E",t,j]] + [x(t,i,j) for i in idx.x_tj[t,j]] + [y(t,i,j,k) for (i,k) in idx.y_tj[t,j]] + [z(t,i,j) for i in idx.z_tj[t,j]]
+			vals = [1.0] + [e] * len(idx.x_tj[t,j]) + [f] * len(idx.y_tj[t,j]) + [pt * g] * len(idx.z_tj[t,j])
+			rhs = now - before
+			if previous is None:
+				rhs += C[j]
+			else:
+				cols.append(column["E",previous,j])
+				vals.append(-1.0)
+			m.add_row(cols, vals, lo = rhs, hi = rhs)
+			before = now
+			previous = t
+
+	#Battery constraint on overflow (data only, an empty row makes the model infeasible when violated)
+	for j in S:
+		for t in instants[j]:
+			now, low, high = gaps[j][t]
+			if C[j] + high > beta[j]:
+				m.add_row([], [], hi = beta[j] - C[j] - high)
+
+	return m, idx
+
+
+#Schedule {"x", "z", "y"} of the solution values, in the order they are printed
+def matrix_schedule(values, idx):
+	done = lambda key: round(values.get(key, 0)) == 1
+	return {"x": sorted((key for key in idx.x if done(("x",) + key)), key = lambda key: (key[0], key[2], key[1])),
+			"z": sorted((key for key in idx.z if done(("z",) + key)), key = lambda key: (key[0], key[2], key[1])),
+			"y": sorted((key for key in idx.y if done(("y",) + key)), key = lambda key: (key[0], key[3], key[2], key[1]))}
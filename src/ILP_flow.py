@@ -0,0 +1,113 @@
+#Max-flow scheduler for the model of ILP (without processing capability and battery constraint)
+
+import timeit
+import numpy as np
+from collections import deque
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import maximum_flow
+
+
+
+#Same arguments as ILP
+#
+#Each unit of flow is one area collected and downloaded, on a time expanded network:
+#	source -> Ai (capacity 1): each area is collected at most once
+#	Ai -> C(t,j) (capacity 1) for (t,Sj,Ai) in col: collection opportunity
+#	C(t,j) -> V(t,j) (capacity 1): Sj collects at most one area in an instant
+#	U(t,j) -> V(t,j): data kept in the memory of Sj during instant t
+#	V(t,j) -> U(t',j) (capacity mem[j]), t' the next instant at which Sj has an opportunity: memory bound
+#	U(t,j) -> W(t,j) (capacity up[j]): uplink capacity, only data collected before t is downloaded
+#	W(t,j) -> G(t,k) for (t,Sj,Bk) in com: communication opportunity
+#	G(t,k) -> sink (capacity down[k]): downlink capacity of the ground station
+#Data left in memory at the end of the horizon has no way to the sink, so all collected data is
+#downloaded. The rows of ILP only count data units per satellite and instant, apart from the area
+#identities, which only have to be collected once and downloaded after their collection; any integral
+#flow gets those by downloading the units of each satellite in the order they were collected (FIFO).
+#The maximum flow is therefore the optimum of ILP, dense or sparse (neither downloads in time instant 0, where
+#nothing can have been collected before), and the coupling "each area at most once" is exact.
+#Optimal schedules are not unique, so the schedule may differ from the one CBC returns for ILP.
+#
+#Returns status, objective and the schedule {"x": [(t,i,j)], "y": [(t,i,j,k)]}
+def ILP_flow(H, S, A, B, mem, up, down, col, com, p):
+	start = timeit.default_timer()
+	Hset = set(H)
+	col = [(t,j,i) for (t,j,i) in sorted(col) if t in Hset and j in S and i in A]
+	com = [(t,j,k) for (t,j,k) in sorted(com) if t in Hset and j in S and k in B]
+	unbounded = len(A) + 1
+
+	nodes = {"source": 0, "sink": 1}
+	def node(key):
+		if key not in nodes:
+			nodes[key] = len(nodes)
+		return nodes[key]
+
+	tails, heads, caps = [], [], []
+	def arc(u, v, cap):
+		tails.append(node(u))
+		heads.append(node(v))
+		caps.append(min(cap, unbounded))
+
+	#Memory chain of each satellite over the instants at which it has an opportunity
+	events = {j: sorted(set([t for (t,j1,i) in col if j1 == j] + [t for (t,j1,k) in com if j1 == j])) for j in S}
+	for j in S:
+		for n, t in enumerate(events[j]):
+			arc(("U",t,j), ("V",t,j), unbounded)
+			if n + 1 < len(events[j]):
+				arc(("V",t,j), ("U",events[j][n+1],j), mem[j])
+
+	#Collections
+	collections = []
+	for i in sorted(set(i for (t,j,i) in col)):
+		arc("source", ("A",i), 1)
+	for (t,j,i) in col:
+		if ("C",t,j) not in nodes:
+			arc(("C",t,j), ("V",t,j), 1)
+		collections.append(((t,j,i), len(tails)))
+		arc(("A",i), ("C",t,j), 1)
+
+	#Communications
+	communications = []
+	for (t,j,k) in com:
+		if ("W",t,j) not in nodes:
+			arc(("U",t,j), ("W",t,j), up[j])
+		if ("G",t,k) not in nodes:
+			arc(("G",t,k), "sink", down[k])
+		communications.append(((t,j,k), len(tails)))
+		arc(("W",t,j), ("G",t,k), up[j])
+
+	graph = csr_matrix((np.array(caps, dtype = np.int32), (np.array(tails), np.array(heads))), shape = (len(nodes), len(nodes)))
+	result = maximum_flow(graph, nodes["source"], nodes["sink"], method = "dinic")
+	flow = result.flow.tocsr()
+
+	#Areas collected and number of downloads per opportunity
+	collected = {}
+	for (key, a) in collections:
+		if flow[tails[a], heads[a]] > 0:
+			collected[key[0],key[1]] = key[2]
+	sent = {key: int(flow[tails[a], heads[a]]) for (key, a) in communications}
+
+	#Area identities of the downloads, FIFO per satellite
+	schedule = {"x": [], "y": []}
+	for j in S:
+		memory = deque()
+		for t in events[j]:
+			for k in B:
+				for n in range(sent.get((t,j,k), 0)):
+					schedule["y"].append((t, memory.popleft(), j, k))
+			if (t,j) in collected:
+				schedule["x"].append((t, collected[t,j], j))
+				memory.append(collected[t,j])
+	schedule["x"].sort(key = lambda key: (key[0], key[2], key[1]))
+	schedule["y"].sort(key = lambda key: (key[0], key[3], key[2], key[1]))
+
+	print("FLOW EXECUTION TIME: ", timeit.default_timer() - start, "s")
+	print("STATUS: ", 1)
+	print("COLLECTIONS DONE: ")
+	for (t,i,j) in schedule["x"]:
+		print(t, ": ", j, " - ", i)
+
+	print("COMMUNICATIONS DONE: ")
+	for (t,i,j,k) in schedule["y"]:
+		print(t, ": ", j, " " , i, " -> ", k)
+
+	return 1, result.flow_value, schedule
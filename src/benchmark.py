@@ -0,0 +1,166 @@
+#Scaling benchmark of ILP, ILP2 and ILP_LAS on generated instances (see utility/instanceGenerator.py)
+#
+#	python benchmark.py --out results.json
+#	python benchmark.py --grid medium --models ILP_LAS --time-limit 60 --out results.json --compare previous.json
+#
+#Every run (model, instance, formulation) is measured in a Python process of its own, so that the peak RSS
+#is the one of that run only. The solver (CBC) runs in a process of its own and its peak RSS is reported apart;
+#it is forked from the run, so it is never below the RSS the run had when the solve started. HiGHS solves in
+#the process of the run (solver_peak_rss_mb is then null).
+#The JSON holds the commit and the machine the benchmark ran on and one record per run:
+#	model, formulation, n, m, o, p, density, seed, status, objective, variables, constraints,
+#	generate, build, solve, extract (seconds), peak_rss_mb, solver_peak_rss_mb, error (only if the run failed)
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import timeit
+from datetime import datetime, timezone
+from os import path
+from utility.instanceGenerator import generate_instance, model_arguments
+from utility.solverConfig import SolverConfig
+
+
+
+#Instances of each grid (n areas, m satellites, o ground stations, p time instants, collection density)
+GRIDS = {
+	"small": [dict(n=20, m=3, o=2, p=p, density=0.05) for p in (100, 200, 400)],
+	"medium": [dict(n=100, m=m, o=5, p=p, density=0.02) for m in (6, 12) for p in (1000, 2000, 5400)],
+	"large": [dict(n=185, m=24, o=20, p=5400, density=density) for density in (0.005, 0.01, 0.02)],
+}
+MODELS = ("ILP", "ILP2", "ILP_LAS")
+#Formulations: sparse and cumulative arguments of the models
+FORMULATIONS = {"dense": dict(sparse = False), "sparse": dict(sparse = True), "cumulative": dict(sparse = True, cumulative = True)}
+
+
+#Builds, solves and extracts one run in this process; returns its record
+def run_case(case):
+	from ILP import build_ILP
+	from ILP2 import build_ILP2
+	from ILP_LAS import build_ILP_LAS, schedule_of
+	builders = {"ILP": build_ILP, "ILP2": build_ILP2, "ILP_LAS": build_ILP_LAS}
+
+	record = dict(case)
+	start = timeit.default_timer()
+	instance = generate_instance(case["n"], case["m"], case["o"], case["p"], case["density"], case["seed"])
+	record["generate"] = timeit.default_timer() - start
+
+	start = timeit.default_timer()
+	model = builders[case["model"]](**model_arguments(instance, case["model"]), **FORMULATIONS[case["formulation"]])
+	prob, x, y = model[0], model[1], model[-2]
+	z = model[2] if len(model) == 5 else {}
+	record["build"] = timeit.default_timer() - start
+	record["variables"] = prob.numVariables()
+	record["constraints"] = prob.numConstraints()
+
+	start = timeit.default_timer()
+	config = SolverConfig(case["solver"], time_limit = case["time_limit"])
+	record["status"] = config.solve(prob)
+	record["objective"] = config.report["objective"]
+	record["solve"] = timeit.default_timer() - start
+
+	start = timeit.default_timer()
+	schedule = schedule_of(x, z, y)
+	record["extract"] = timeit.default_timer() - start
+	record["collections"] = len(schedule["x"])
+
+	#ru_maxrss is in kilobytes on Linux (bytes on macOS)
+	scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+	record["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+	children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+	record["solver_peak_rss_mb"] = children * scale if children else None
+	return record
+
+
+#Runs every case in a fresh process (python benchmark.py --case ...) and returns the records
+#timeout: seconds after which a run is stopped and recorded with error "timeout"
+def benchmark(cases, timeout = None, verbose = True):
+	records = []
+	for case in cases:
+		command = [sys.executable, path.abspath(__file__), "--case", json.dumps(case)]
+		try:
+			done = subprocess.run(command, capture_output = True, text = True, timeout = timeout, cwd = path.dirname(path.abspath(__file__)))
+			lines = done.stdout.strip().splitlines()
+			record = json.loads(lines[-1]) if done.returncode == 0 and lines else dict(case, error = (done.stderr.strip().splitlines() or ["exit %d" % done.returncode])[-1])
+		except subprocess.TimeoutExpired:
+			record = dict(case, error = "timeout")
+		records.append(record)
+		if verbose:
+			print_record(record)
+	return records
+
+
+def cases_of(grid, models, formulations, seeds, solver, time_limit):
+	return [dict(model = model, formulation = formulation, seed = seed, solver = solver, time_limit = time_limit, **size)
+		for size in GRIDS[grid] for seed in seeds for model in models for formulation in formulations]
+
+
+#Commit of the working tree, None outside of git
+def current_commit():
+	try:
+		commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output = True, text = True, cwd = path.dirname(path.abspath(__file__)))
+		dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output = True, text = True, cwd = path.dirname(path.abspath(__file__)))
+	except OSError:
+		return None
+	if commit.returncode != 0:
+		return None
+	return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def key_of(record):
+	return tuple(record.get(name) for name in ("model", "formulation", "solver", "n", "m", "o", "p", "density", "seed"))
+
+
+def print_record(record):
+	name = "%s %s %s n=%d m=%d o=%d p=%d density=%g seed=%d" % key_of(record)
+	if "error" in record:
+		print(name, ": ERROR ", record["error"])
+		return
+	print(name, ": STATUS ", record["status"], ", OBJECTIVE ", record["objective"], ", ", record["variables"], " variables, ", record["constraints"], " constraints, BUILD ",
+		round(record["build"], 3), "s, SOLVE ", round(record["solve"], 3), "s, EXTRACT ", round(record["extract"], 3), "s, PEAK RSS ", round(record["peak_rss_mb"], 1), "MB" + ("" if record["solver_peak_rss_mb"] is None else " (SOLVER %.1f MB)" % record["solver_peak_rss_mb"]))
+
+
+#Ratios new/old of the times and peak RSS of the runs both results have
+def print_comparison(old, new):
+	previous = {key_of(record): record for record in old["runs"] if "error" not in record}
+	print("COMPARED WITH ", old.get("commit"), ": ")
+	for record in new["runs"]:
+		before = previous.get(key_of(record))
+		if before is None or "error" in record:
+			continue
+		ratios = ["%s x%.2f" % (name, record[name] / before[name]) for name in ("build", "solve", "extract", "peak_rss_mb") if before[name] > 0]
+		changed = " OBJECTIVE %s -> %s" % (before["objective"], record["objective"]) if before["objective"] != record["objective"] else ""
+		print("%s %s %s n=%d m=%d o=%d p=%d density=%g seed=%d" % key_of(record), ": ", ", ".join(ratios) + changed)
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Scaling benchmark of ILP, ILP2 and ILP_LAS")
+	parser.add_argument("--grid", choices = sorted(GRIDS), default = "small")
+	parser.add_argument("--models", nargs = "+", choices = MODELS, default = list(MODELS))
+	parser.add_argument("--formulations", nargs = "+", choices = sorted(FORMULATIONS), default = ["sparse", "cumulative"])
+	parser.add_argument("--seeds", nargs = "+", type = int, default = [0])
+	parser.add_argument("--solver", choices = ["cbc", "highs"], default = "cbc")
+	parser.add_argument("--time-limit", type = float, default = None, help = "time limit of each solve, in seconds")
+	parser.add_argument("--timeout", type = float, default = None, help = "seconds after which a run is stopped")
+	parser.add_argument("--out", default = None, help = "JSON file the results are written to")
+	parser.add_argument("--compare", default = None, help = "JSON results of an earlier run to compare with")
+	parser.add_argument("--case", default = None, help = argparse.SUPPRESS)		#A single run, in the process started by benchmark()
+	args = parser.parse_args()
+
+	if args.case is not None:
+		print(json.dumps(run_case(json.loads(args.case))))
+		sys.exit(0)
+
+	cases = cases_of(args.grid, args.models, args.formulations, args.seeds, args.solver, args.time_limit)
+	results = {"commit": current_commit(), "date": datetime.now(timezone.utc).isoformat(timespec = "seconds"),
+		"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(),
+		"grid": args.grid, "runs": benchmark(cases, args.timeout)}
+	if args.out is not None:
+		with open(args.out, "w") as f:
+			json.dump(results, f, indent = 1)
+	if args.compare is not None:
+		with open(args.compare) as f:
+			print_comparison(json.load(f), results)
@@ -0,0 +1,161 @@
+#Coarse-to-fine solve of ILP_LAS: a plan on buckets of instants first, then the full resolution inside the buckets it uses
+#
+#	python coarseToFine.py --grid small --widths 2 5 10
+#	python coarseToFine.py --grid medium --widths 10 30 --time-limit 60 --out gaps.json
+#
+#The command line solves the benchmark instances (see benchmark.py) at full resolution and coarse-to-fine with
+#every bucket width, and reports the objective gap and the times of both, to pick a speed/quality point.
+
+import argparse
+import json
+import math
+import timeit
+import pulp as plp
+from ILP_LAS import solve_ILP_LAS, build_ILP_LAS, schedule_of
+from utility.eventCompression import compress_horizon
+from utility.eclipseProfile import light_ticks
+from utility.battery import screen_battery
+from utility.solverConfig import SolverConfig
+from utility.scheduleResult import ScheduleResult, print_result
+from utility.instanceGenerator import generate_instance, model_arguments
+from benchmark import GRIDS
+
+
+
+#Same arguments as ILP_LAS, plus
+#width: number of time instants of a bucket
+#monolithic: if True, also solve the whole horizon at full resolution and report the gap
+#solver: optional SolverConfig of every solve (see utility/solverConfig.py)
+#
+#The coarse instance has one instant per bucket [H[0] + b*width, H[0] + (b+1)*width): an opportunity in any
+#instant of the bucket is an opportunity of the bucket, the uplink and downlink capacities and the charge and
+#drain per instant are multiplied by width, the processing time is rounded up to whole buckets (at the same
+#total drain pt*g) and a satellite is in shadow for the fraction of the bucket it spends in shadow. Memory and
+#the battery bounds are capacities and stay as they are. The coarse model is not a bound on the full one either
+#way: a bucket holds one collection, and a download only follows in a later bucket, but the opportunities merged
+#into a bucket no longer set deadlines to the earlier collections of their pair (see "Process all collected
+#data" in ILP_LAS). The coarse plan can then promise more collections than the fine solve makes.
+#
+#The fine solve only lets every satellite collect and download in the buckets where the coarse plan collects or
+#downloads: every other collection and download is fixed to nothing (processing can still start anywhere). Its
+#schedule is feasible at full resolution; the coarse plan only chooses where to look.
+def coarse_to_fine_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, width, monolithic = True, solver = None):
+	result, coarse = solve_coarse_to_fine(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, width, solver)
+	print("COARSE STATUS: ", coarse.status, ", OBJECTIVE: ", coarse.objective, ", BUCKETS OF ", width, " INSTANTS")
+	print_result(result, solver is not None)
+	print("COARSE ", round(result.timings["coarse"], 3), "s, FINE ", round(result.timings["fine"], 3), "s")
+
+	if monolithic:
+		Hc, starts = compress_horizon(H, S, col, com, p, pt, mem)
+		full = solve_ILP_LAS(Hc, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse = True, cumulative = True, starts = starts, solver = solver)
+		if full.status == 1 and result.status == 1:
+			print("FULL RESOLUTION OBJECTIVE =", full.objective, ", COARSE-TO-FINE GAP =", full.objective - result.objective)
+		else:
+			print("FULL RESOLUTION STATUS: ", full.status)
+	return result
+
+
+#Returns the ScheduleResult of the fine solve (timings: coarse, fine) and the one of the coarse solve, in
+#bucket instants; when the coarse solve has no schedule, it is returned twice (with both timings)
+def solve_coarse_to_fine(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, width, solver = None):
+	if width < 1:
+		raise ValueError("a bucket has at least one instant, not %r" % (width,))
+	start = timeit.default_timer()
+	first = min(H)
+	buckets = math.ceil((p - first) / width)
+	bucket = lambda t: (t - first) // width
+
+	colc, comc = {}, {}
+	for (t,j,i), value in col.items():
+		colc.setdefault((bucket(t),j,i), value)
+	for (t,j,k), value in com.items():
+		comc.setdefault((bucket(t),j,k), value)
+	upc = {j: up[j] * width for j in S}
+	downc = {k: down[k] * width for k in B}
+	ptc = math.ceil(pt / width)
+	sc = {(b,j): 1 - light_ticks(s, j, first + b * width, min(first + (b+1) * width, p)).sum() / width for j in S for b in range(buckets)}
+
+	Hc, starts = compress_horizon(list(range(buckets)), S, colc, comc, buckets, ptc, mem)
+	coarse = solve_ILP_LAS(Hc, S, A, B, C, mem, upc, downc, colc, comc, theta, buckets, ptc, c * width, d * width, e, f, pt * g / ptc, sc, beta,
+		sparse = True, cumulative = True, starts = starts, solver = solver)
+	timings = {"coarse": timeit.default_timer() - start}
+	if coarse.status != 1:
+		coarse.timings = dict(coarse.timings, **timings)
+		return coarse, coarse
+
+	#Buckets in which each satellite collects or downloads
+	start = timeit.default_timer()
+	chosen = set((b,j) for (b,i,j) in coarse.schedule()["x"]) | set((b,j) for (b,i,j,k) in coarse.schedule()["y"])
+	#A later collection opportunity of a pair is the deadline of the download or processing of an earlier collection
+	#(see "Process all collected data" in ILP_LAS), so the pairs with a chosen opportunity keep all of theirs, the
+	#others fixed to 0; the pairs without one cannot collect and are left out
+	pairs = set((i,j) for (t,j,i) in col if (bucket(t),j) in chosen)
+	colf = {(t,j,i): value for (t,j,i), value in col.items() if (i,j) in pairs}
+	comf = {(t,j,k): value for (t,j,k), value in com.items() if (bucket(t),j) in chosen}
+	issues = screen_battery(H, S, C, theta, beta, p, c, d, s)
+	if issues:
+		return ScheduleResult(-1, None, timings = timings, screening = issues), coarse
+	#A coarse plan without any collection or download leaves nothing to look at: no collection at full resolution either
+	if not chosen:
+		timings["fine"] = timeit.default_timer() - start
+		return ScheduleResult(1, 0, timings = timings), coarse
+	Hf, starts = compress_horizon(H, S, colf, comf, p, pt, mem)
+	prob, x, z, y, idx = build_ILP_LAS(Hf, S, A, B, C, mem, up, down, colf, comf, theta, p, pt, c, d, e, f, g, s, beta, True, True, starts)
+	for (t,i,j), variable in x.items():
+		if (bucket(t),j) not in chosen:
+			variable.upBound = 0
+	config = solver or SolverConfig()
+	status = config.solve(prob)
+	schedule = schedule_of(x, z, y, idx, colf) if status == 1 else None
+	timings["fine"] = timeit.default_timer() - start
+	return ScheduleResult(status, (plp.value(prob.objective) or 0) if status == 1 else None, schedule, timings, config.report), coarse
+
+
+#Full resolution and coarse-to-fine solves of an instance; returns one record per width:
+#	width, status, objective, coarse_objective (of the coarse plan), full_objective, gap (full - coarse-to-fine),
+#	coarse, fine, full (seconds)
+def compare_widths(instance, widths, solver = None):
+	arguments = model_arguments(instance, "ILP_LAS")
+	start = timeit.default_timer()
+	Hc, starts = compress_horizon(arguments["H"], arguments["S"], arguments["col"], arguments["com"], arguments["p"], arguments["pt"], arguments["mem"])
+	full = solve_ILP_LAS(**dict(arguments, H = Hc), sparse = True, cumulative = True, starts = starts, solver = solver)
+	seconds = timeit.default_timer() - start
+	records = []
+	for width in widths:
+		result, coarse = solve_coarse_to_fine(**arguments, width = width, solver = solver)
+		gap = full.objective - result.objective if full.status == 1 and result.status == 1 else None
+		records.append({"width": width, "status": result.status, "objective": result.objective, "coarse_objective": coarse.objective,
+			"full_objective": full.objective, "gap": gap, "coarse": result.timings.get("coarse"), "fine": result.timings.get("fine"), "full": seconds})
+	return records
+
+
+def print_record(record):
+	name = "n=%d m=%d o=%d p=%d density=%g seed=%d width=%d" % tuple(record[name] for name in ("n", "m", "o", "p", "density", "seed", "width"))
+	if record["gap"] is None:
+		print(name, ": STATUS ", record["status"], ", FULL OBJECTIVE ", record["full_objective"])
+		return
+	print(name, ": OBJECTIVE ", record["objective"], " (COARSE PLAN ", record["coarse_objective"], ") / ", record["full_objective"], ", GAP ", record["gap"], " (%.1f%%)" % (100 * record["gap"] / max(record["full_objective"], 1)),
+		", COARSE ", round(record["coarse"], 3), "s + FINE ", round(record["fine"], 3), "s, FULL ", round(record["full"], 3), "s")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Objective gap and times of coarse-to-fine ILP_LAS against the full resolution")
+	parser.add_argument("--grid", choices = sorted(GRIDS), default = "small")
+	parser.add_argument("--widths", nargs = "+", type = int, default = [2, 5, 10])
+	parser.add_argument("--seeds", nargs = "+", type = int, default = [0])
+	parser.add_argument("--solver", choices = ["cbc", "highs"], default = "cbc")
+	parser.add_argument("--time-limit", type = float, default = None, help = "time limit of each solve, in seconds")
+	parser.add_argument("--out", default = None, help = "JSON file the records are written to")
+	args = parser.parse_args()
+
+	records = []
+	for size in GRIDS[args.grid]:
+		for seed in args.seeds:
+			instance = generate_instance(size["n"], size["m"], size["o"], size["p"], size["density"], seed)
+			for record in compare_widths(instance, args.widths, SolverConfig(args.solver, time_limit = args.time_limit)):
+				record = dict(size, seed = seed, **record)
+				print_record(record)
+				records.append(record)
+	if args.out is not None:
+		with open(args.out, "w") as f:
+			json.dump(records, f, indent = 1)
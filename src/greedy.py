@@ -0,0 +1,144 @@
+#Greedy constructive scheduler for the ILP_LAS model
+
+import timeit
+import numpy as np
+from utility.scheduleResult import print_schedule
+from utility.opportunityIndex import OpportunityIndex
+from utility.downloadAssignment import download_windows
+from utility.battery import battery_gaps
+
+
+
+#Same arguments as ILP_LAS (H may be a compressed horizon, with its starts; init as in ILP_LAS)
+#
+#Scans the instants in order and, at each instant and for each satellite, collects at most one area whose
+#data it can get rid of in time: a download (up[j], down[k] left) or a processing start (pt after the
+#previous one) after the collection and, when the (Ai, Sj) pair has a later collection opportunity, not
+#after it, as "process all collected data" asks. The download or processing start is booked together with
+#the collection, so memory and battery are only checked against decisions already taken. Among the areas
+#that fit, the one with the fewest opportunities left is collected.
+#
+#The schedule is feasible for ILP_LAS (sparse or not, cumulative or not) and is what ILP_LAS starts
+#CBC from with warm_start = True.
+def greedy_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts = None, init = None):
+	start = timeit.default_timer()
+	status, schedule = greedy_schedule(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts, init)
+	print("GREEDY EXECUTION TIME: ", timeit.default_timer() - start, "s")
+	print("STATUS: ", status)
+	if status == 1:
+		print_schedule(schedule)
+	print("Objective =", len(schedule["x"]))
+	return status, len(schedule["x"]), 0, 0
+
+
+#Returns the status (1 schedule found, 0 the data held from before H[0] cannot leave the memory in time,
+#-1 the battery leaves [theta, beta] whatever is scheduled) and the schedule {"x", "z", "y"} in the order
+#print_schedule prints it
+def greedy_schedule(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, starts = None, init = None):
+	held = (init or {}).get("held", {})
+	free = (init or {}).get("free", {})
+	collected = set((init or {}).get("collected", ()))
+	missed = set((init or {}).get("missed", ()))
+	idx = OpportunityIndex(H, S, A, B, col, com, p, pt, True, starts, held, free)
+	H = idx.H
+	windows = download_windows(idx, col)
+	schedule = {"x": [], "z": [], "y": []}
+
+	#Battery margin of Sj at its instants (the ones ILP_LAS writes a battery row at): how much more
+	#energy the decisions taken so far leave to spend up to each instant
+	position = {}
+	margin = {}
+	for j in S:
+		instants = [t for t in H if t == H[0] or idx.x_tj[t,j] or idx.y_tj[t,j] or idx.z_tj[t,j]]
+		gaps = battery_gaps(instants, j, p, c, d, s)
+		if any(C[j] + high > beta[j] for (now, low, high) in gaps.values()):
+			return -1, schedule
+		position[j] = {t: n for n, t in enumerate(instants)}
+		margin[j] = np.array([C[j] + gaps[t][1] - theta[j] for t in instants])
+		if len(margin[j]) and margin[j].min() < 0:
+			return -1, schedule
+
+	#Energy spent at t counts in every battery row from t on
+	def affordable(j, spend):
+		total = 0
+		for (t, amount) in sorted(spend):
+			total += amount
+			if margin[j][position[j][t]:].min() < total - 1e-9:
+				return False
+		return True
+	def consume(j, t, amount):
+		margin[j][position[j][t]:] -= amount
+
+	sent = {}					#(t,j) -> downloads of Sj at t
+	received = {}				#(t,k) -> downloads at Bk at t
+	processing = {j: [] for j in S}			#Processing starts of Sj
+	released = {j: [] for j in S}			#Instant at which each data unit in the memory of Sj leaves it
+
+	#Earliest way for Sj to get rid of the data of Ai collected at t, as (instant it leaves the memory,
+	#0 for a download (t1,i,j,k) or 1 for a processing start (t1,i,j), the key, energy spent); None if there is none
+	def disposal(t, i, j, spent):
+		deadline = windows.get((t,i,j))
+		options = []
+		for (t1,k) in idx.y_ij[i,j]:
+			if t1 <= t or (deadline is not None and t1 > deadline):
+				continue
+			if sent.get((t1,j), 0) < up[j] and received.get((t1,k), 0) < down[k] and affordable(j, spent + [(t1, f)]):
+				options.append((t1, 0, (t1,i,j,k), f))
+				break
+		for t1 in idx.z_ij[i,j]:
+			if t1 <= t or (deadline is not None and t1 > deadline):
+				continue
+			if all(abs(t1 - t2) >= pt for t2 in processing[j]) and affordable(j, spent + [(t1, pt * g)]):
+				options.append((t1 + pt, 1, (t1,i,j), pt * g))
+				break
+		return min(options) if options else None
+
+	def book(j, option):
+		leaves, kind, key, energy = option
+		released[j].append(leaves)
+		consume(j, key[0], energy)
+		if kind == 0:
+			(t1,i,j,k) = key
+			sent[t1,j] = sent.get((t1,j), 0) + 1
+			received[t1,k] = received.get((t1,k), 0) + 1
+			schedule["y"].append(key)
+		else:
+			processing[j].append(key[0])
+			schedule["z"].append(key)
+
+	#Data held from before H[0], closest deadline first
+	for (t,i,j) in sorted((key for key in windows if key[0] == H[0]-1), key = lambda key: (windows[key] is None, windows[key] or 0, key)):
+		option = disposal(t, i, j, [])
+		if option is None:
+			return 0, schedule
+		book(j, option)
+
+	#Collection opportunities of each area still to come
+	remaining = {i: len(opportunities) for i, opportunities in idx.x_i.items()}
+	for t in H:
+		for j in S:
+			candidates = []
+			occupied = sum(1 for leaves in released[j] if leaves > t) + (1 if t < free.get(j, 0) else 0)
+			if idx.x_tj[t,j] and occupied > mem[j]:
+				return 0, schedule
+			for i in idx.x_tj[t,j]:
+				if i in collected or (i,j) in missed or idx.x_ij[i,j][0] != t:
+					continue
+				if occupied + 1 > mem[j] or not affordable(j, [(t, e)]):
+					continue
+				option = disposal(t, i, j, [(t, e)])
+				if option is not None:
+					candidates.append((remaining[i], option[0], i, option))
+			if candidates:
+				(left, leaves, i, option) = min(candidates)
+				collected.add(i)
+				consume(j, t, e)
+				book(j, option)
+				schedule["x"].append((t,i,j))
+			for i in idx.x_tj[t,j]:
+				remaining[i] -= 1
+
+	schedule["x"].sort(key = lambda key: (key[0], key[2], key[1]))
+	schedule["z"].sort(key = lambda key: (key[0], key[2], key[1]))
+	schedule["y"].sort(key = lambda key: (key[0], key[3], key[2], key[1]))
+	return 1, schedule
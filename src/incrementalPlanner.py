@@ -0,0 +1,247 @@
+#Incremental re-planning of ILP_LAS: the model is kept between solves and a change rebuilds only the rows it touches
+
+import timeit
+import pulp as plp
+from bisect import bisect_left
+from ILP_LAS import build_ILP_LAS, schedule_of, set_initial_values
+from utility.instrumentation import instrumented, phase
+from utility.solverConfig import SolverConfig
+from utility.scheduleResult import ScheduleResult
+from utility.battery import screen_battery
+
+
+
+#Same arguments as ILP_LAS (the model is the sparse one), plus
+#warm_start: if True, every solve after the first starts from the previous schedule
+#
+#	planner = IncrementalPlanner(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta)
+#	result = planner.solve()		#ScheduleResult (see utility/scheduleResult.py)
+#	planner.freeze(t)				#the decisions before t are executed
+#	planner.update(col_added = {(t,j,i): 0.25}, com_removed = [(t,j,k)], s = {(t,j): 1}, mem = {j: 2})
+#	result = planner.solve()
+#
+#The model is kept as one block of rows per satellite, built by build_ILP_LAS on that satellite alone, and the
+#rows that couple satellites: an area is collected at most once, and the downlink capacity of a ground station
+#in an instant (only kept when two satellites or more share them). A change rebuilds the blocks of the
+#satellites it touches and the coupling rows of their areas and ground stations; the other blocks, with their
+#variables, are reused as they are. The problem handed to the solver is put together from the kept rows
+#(nothing is rebuilt for it), so the solver itself still reads the whole model.
+#
+#The decisions before the frozen instant keep their value in the schedule they were frozen from, in every
+#later solve, and a change cannot touch an instant before it. A satellite whose battery data fails the
+#screening (see utility/battery.py) has no block until a change fixes it; the solves return status -1 and
+#the issues meanwhile.
+class IncrementalPlanner:
+	def __init__(self, H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, cumulative = False, aggregated = False, solver = None, warm_start = True):
+		self.H = sorted(H)
+		self.S, self.A, self.B = list(S), list(A), list(B)
+		self.C, self.mem, self.s = dict(C), dict(mem), dict(s)
+		self.up, self.down, self.theta, self.beta = up, down, theta, beta
+		self.p, self.pt, self.c, self.d, self.e, self.f, self.g = p, pt, c, d, e, f, g
+		self.cumulative = cumulative
+		self.aggregated = aggregated
+		self.solver = solver or SolverConfig()
+		self.warm_start = warm_start
+
+		#Opportunities of each satellite
+		self.col = {j: {} for j in self.S}
+		self.com = {j: {} for j in self.S}
+		for (t,j,i), value in col.items():
+			if j in self.col:
+				self.col[j][t,j,i] = value
+		for (t,j,k), value in com.items():
+			if j in self.com:
+				self.com[j][t,j,k] = value
+
+		self.now = self.H[0]			#Decisions before now are executed
+		self.schedule = None			#Schedule of the last successful solve
+		self.blocks = {}				#{Sj: block}, see rebuild
+		self.issues = {}				#{Sj: screening issues}
+		self.areas = {}					#{Ai: {Sj: collection variables}}
+		self.stations = {}				#{(t, Bk): {Sj: download variables}}
+		self.coupling = {}				#{Ai or (t, Bk): row}
+		self.prob = None				#Problem of the last solve, None after a change of the rows
+		self.timings = {}
+
+		start = timeit.default_timer()
+		for j in self.S:
+			self.rebuild(j)
+		self.timings["build"] = timeit.default_timer() - start
+
+
+	#Applies a change of the instance and rebuilds the rows it touches; returns the satellites rebuilt
+	#col_added, com_added: {(t,Sj,Ai): value}, {(t,Sj,Bk): value}; col_removed, com_removed: their keys
+	#s: {(t,Sj): 1 in shadow, 0 in light}; mem, C: {Sj: value} (C is the battery level at H[0])
+	@instrumented("IncrementalPlanner.update")
+	def update(self, col_added = None, col_removed = None, com_added = None, com_removed = None, s = None, mem = None, C = None):
+		start = timeit.default_timer()
+		for keys in (col_added, col_removed, com_added, com_removed, s):
+			for key in keys or ():
+				if key[1] not in self.col:
+					raise ValueError("unknown satellite %r in %r" % (key[1], key))
+				if key[0] < self.now:
+					raise ValueError("%r is before the frozen instant %d" % (key, self.now))
+		for values in (mem, C):
+			for j in values or ():
+				if j not in self.col:
+					raise ValueError("unknown satellite %r" % (j,))
+
+		touched = set()
+		for opportunities, added, removed in [(self.col, col_added, col_removed), (self.com, com_added, com_removed)]:
+			for key in removed or ():
+				opportunities[key[1]].pop(key, None)
+				touched.add(key[1])
+			for key, value in (added or {}).items():
+				opportunities[key[1]][key] = value
+				touched.add(key[1])
+		for key, value in (s or {}).items():
+			self.s[key] = value
+			touched.add(key[1])
+		for j, value in (mem or {}).items():
+			self.mem[j] = value
+			touched.add(j)
+		for j, value in (C or {}).items():
+			self.C[j] = value
+			touched.add(j)
+
+		for j in self.S:
+			if j in touched:
+				self.rebuild(j)
+		self.timings["update"] = self.timings.get("update", 0) + timeit.default_timer() - start
+		return [j for j in self.S if j in touched]
+
+
+	#The decisions before now are executed: from now on they keep their value in the current schedule
+	def freeze(self, now):
+		if now < self.now:
+			raise ValueError("the decisions before %d are already executed" % self.now)
+		if now > self.now and self.schedule is None:
+			raise ValueError("there is no schedule to freeze")
+		decided = self.decided()
+		for j in self.S:
+			if j in self.blocks:
+				self.fix(self.blocks[j], decided, self.now, now)
+		self.now = now
+
+
+	#Solves the current model and returns a ScheduleResult; its timings hold the updates since the last solve
+	@instrumented("IncrementalPlanner")
+	def solve(self):
+		timings, self.timings = self.timings, {}
+		if self.issues:
+			issues = sorted((issue for j in self.issues for issue in self.issues[j]), key = lambda issue: (issue[1], self.S.index(issue[2])))
+			return ScheduleResult(-1, None, timings = timings, screening = issues)
+
+		start = timeit.default_timer()
+		with phase("assemble"):
+			if self.prob is None:
+				self.prob = self.assemble()
+			warm = self.warm_start and self.schedule is not None
+			if warm:
+				for j in self.S:
+					block = self.blocks[j]
+					set_initial_values(block["x"], block["z"], block["y"], self.schedule, self.aggregated)
+		timings["assemble"] = timeit.default_timer() - start
+
+		start = timeit.default_timer()
+		with phase("solve"):
+			status = self.solver.solve(self.prob, warm_start = warm)
+		timings["solve"] = timeit.default_timer() - start
+
+		start = timeit.default_timer()
+		schedule = None
+		with phase("extract"):
+			if status == 1:
+				schedule = {"x": [], "z": [], "y": []}
+				for j in self.S:
+					block = self.blocks[j]
+					for name, keys in schedule_of(block["x"], block["z"], block["y"], block["idx"], self.col[j]).items():
+						schedule[name] += keys
+				schedule["x"].sort(key = lambda key: (key[0], key[2], key[1]))
+				schedule["z"].sort(key = lambda key: (key[0], key[2], key[1]))
+				schedule["y"].sort(key = lambda key: (key[0], key[3], key[2], key[1]))
+				self.schedule = schedule
+		timings["extract"] = timeit.default_timer() - start
+		return ScheduleResult(status, plp.value(self.prob.objective) if status == 1 else None, schedule, timings, self.solver.report)
+
+
+	#Builds the block of Sj alone (after the screening of its battery rows), fixes its executed decisions
+	#and refreshes the coupling rows of its areas and ground stations
+	#block: {"x", "z", "y": variables (y holds w in the aggregated model), "idx", "rows",
+	#        "areas": {Ai: variables}, "stations": {(t, Bk): variables}, "timeline": [(t, name, key)] sorted, "times"}
+	def rebuild(self, j):
+		old = self.blocks.pop(j, None)
+		self.issues.pop(j, None)
+		self.prob = None
+		issues = screen_battery(self.H, [j], self.C, self.theta, self.beta, self.p, self.c, self.d, self.s)
+		block = None
+		if issues:
+			self.issues[j] = issues
+		else:
+			prob, x, z, y, idx = build_ILP_LAS(self.H, [j], self.A, self.B, self.C, self.mem, self.up, self.down, self.col[j], self.com[j], self.theta,
+				self.p, self.pt, self.c, self.d, self.e, self.f, self.g, self.s, self.beta, True, self.cumulative, None, None, self.aggregated)
+			rows = list(prob.constraints.values())
+			for n, row in enumerate(rows):
+				row.name = "S%s_%d" % (j, n)
+			block = {"x": x, "z": z, "y": y, "idx": idx, "rows": rows, "areas": {}, "stations": {}}
+			for (t,i,j1), variable in x.items():
+				block["areas"].setdefault(i, []).append(variable)
+			for key, variable in y.items():
+				block["stations"].setdefault((key[0], key[-1]), []).append(variable)
+			block["timeline"] = sorted((key[0], name, key) for name in ("x", "z", "y") for key in block[name])
+			block["times"] = [t for (t, name, key) in block["timeline"]]
+			self.blocks[j] = block
+			if self.now > self.H[0]:
+				self.fix(block, self.decided(), self.H[0], self.now)
+
+		before = old or {"areas": {}, "stations": {}}
+		after = block or {"areas": {}, "stations": {}}
+		for i in set(before["areas"]) | set(after["areas"]):
+			self.couple(self.areas, i, j, after["areas"].get(i), 1, "A_%s" % (i,))
+		for (t,k) in set(before["stations"]) | set(after["stations"]):
+			self.couple(self.stations, (t,k), j, after["stations"].get((t,k)), self.down[k], "B_%s_%s" % (k, t))
+
+
+	#Sets the variables of Sj in the coupling row of key and rebuilds the row (bound: right-hand side)
+	def couple(self, groups, key, j, variables, bound, name):
+		group = groups.setdefault(key, {})
+		if variables:
+			group[j] = variables
+		else:
+			group.pop(j, None)
+		self.coupling.pop(key, None)
+		if len(group) < 2:
+			return
+		row = plp.lpSum(variable for satellite in self.S if satellite in group for variable in group[satellite]) <= bound
+		row.name = name
+		self.coupling[key] = row
+
+
+	#Collections and processing starts of the current schedule, and its number of downloads per variable
+	def decided(self):
+		schedule = self.schedule or {"x": [], "z": [], "y": []}
+		counts = {}
+		for (t,i,j,k) in schedule["y"]:
+			key = (t,j,k) if self.aggregated else (t,i,j,k)
+			counts[key] = counts.get(key, 0) + 1
+		return {"x": set(schedule["x"]), "z": set(schedule["z"]), "y": counts}
+
+
+	#Fixes the decisions of a block in the instants [start, end) to their value in decided
+	def fix(self, block, decided, start, end):
+		for (t, name, key) in block["timeline"][bisect_left(block["times"], start):bisect_left(block["times"], end)]:
+			value = decided["y"].get(key, 0) if name == "y" else (1 if key in decided[name] else 0)
+			block[name][key].lowBound = value
+			block[name][key].upBound = value
+
+
+	#Problem of the kept rows, in the order of S, then the coupling rows
+	def assemble(self):
+		prob = plp.LpProblem('LEO_K', plp.LpMaximize)
+		for j in self.S:
+			for row in self.blocks[j]["rows"]:
+				prob.addConstraint(row)
+		for row in self.coupling.values():
+			prob.addConstraint(row)
+		prob.setObjective(plp.lpSum(variable for j in self.S for variable in self.blocks[j]["x"].values()))
+		return prob
@@ -0,0 +1,134 @@
+#Lagrangian decomposition of ILP_LAS by satellite
+
+import pulp as plp
+from concurrent.futures import ProcessPoolExecutor
+from ILP_LAS import build_ILP_LAS, schedule_of, print_schedule
+from utility.eventCompression import compress_horizon
+
+
+
+#Same arguments as ILP_LAS, plus
+#iterations: number of subgradient iterations
+#workers: number of processes solving the satellite subproblems (None: one per core)
+#step: initial step factor of the subgradient update, halved when the dual bound stops improving
+#repair: the restricted model is solved every repair iterations
+#
+#The satellites only interact through "each area is collected at most once" and the downlink capacity
+#down[k] of the ground stations. Both are relaxed with multipliers
+#	lam[i]   >= 0 for the areas that more than one satellite can collect
+#	mu[t,k]  >= 0 for the communication instants of Bk shared by more than one satellite
+#and the problem splits into one ILP_LAS per satellite (its own collections still at most once, its own
+#downloads still at most down[k]), solved in parallel on the compressed, sparse model. The sum of the
+#subproblem objectives plus the multiplier terms is an upper bound (dual bound) on the optimum.
+#
+#Repair: every repair iterations, ILP_LAS is solved on all satellites with only the (Ai, Sj) pairs some
+#subproblem has collected so far. Every opportunity of a kept pair stays in the model, so its schedule is
+#a feasible schedule of the full problem and gives the lower bound of the step size.
+#
+#Callers using more than one worker have to run it under if __name__ == "__main__" (multiprocessing).
+def lagrangian_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, iterations = 30, workers = None, step = 2.0, repair = 5):
+	#Coupling constraints that are relaxed
+	collectors = {}
+	for (t,j,i) in col:
+		collectors.setdefault(i, set()).add(j)
+	senders = {}
+	for (t,j,k) in com:
+		senders.setdefault((t,k), set()).add(j)
+	lam = {i: 0.0 for i in collectors if len(collectors[i]) > 1}
+	mu = {(t,k): 0.0 for (t,k) in senders if len(senders[t,k]) > 1}
+
+	#Subproblem of each satellite, without the multipliers
+	tasks = {}
+	for j in S:
+		colj = {key: v for key, v in col.items() if key[1] == j}
+		comj = {key: v for key, v in com.items() if key[1] == j}
+		sj = {(t,j1): v for (t,j1), v in s.items() if j1 == j}
+		tasks[j] = (H, [j], A, B, C, mem, up, down, colj, comj, theta, p, pt, c, d, e, f, g, sj, beta)
+
+	dual = None
+	best = None				#(objective, schedule) of the best repaired schedule
+	pairs = set()
+	since = 0				#Iterations since the dual bound last improved
+	status = 1
+	with ProcessPoolExecutor(max_workers = workers) as pool:
+		for n in range(iterations):
+			results = list(pool.map(solve_satellite, [(tasks[j], lam, mu) for j in S]))
+			for (j, sub_status, value, chosen, sent) in results:
+				if sub_status != 1:
+					print("SATELLITE ", j, ": STATUS: ", sub_status)
+					return sub_status, 0, dual, None
+
+			bound = sum(value for (j, sub_status, value, chosen, sent) in results) + sum(lam.values()) + sum(mu[t,k] * down[k] for (t,k) in mu)
+			if dual is None or bound < dual - 1e-6:
+				dual = bound
+				since = 0
+			else:
+				since += 1
+				if since >= 3:
+					step = step / 2
+					since = 0
+
+			#Subgradients of the relaxed rows (slack of each row in the subproblem solutions)
+			collections = {i: 0 for i in lam}
+			downloads = {key: 0 for key in mu}
+			for (j, sub_status, value, chosen, sent) in results:
+				for (t,i,j1) in chosen:
+					pairs.add((i,j1))
+					if i in collections:
+						collections[i] += 1
+				for (t,i,j1,k) in sent:
+					if (t,k) in downloads:
+						downloads[t,k] += 1
+
+			gradient = [1 - collections[i] for i in lam] + [down[k] - downloads[t,k] for (t,k) in mu]
+			norm = sum(v * v for v in gradient)
+
+			#The multipliers cannot move without a gradient (e.g. one satellite, or no shared area or ground station),
+			#so the loop stops there and the pairs of the last subproblems are repaired first
+			if (n + 1) % repair == 0 or n == iterations - 1 or norm == 0:
+				repaired = repair_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, pairs)
+				if repaired is not None and (best is None or repaired[0] > best[0]):
+					best = repaired
+			print("ITERATION ", n, ": DUAL BOUND =", round(bound, 4), ", BEST =", best[0] if best else None)
+
+			if norm == 0 or (best is not None and dual - best[0] < 1 - 1e-6):
+				break		#Every relaxed row is tight in the subproblem solutions, or the integer optimum is proven
+			size = step * (bound - (best[0] if best else 0)) / norm
+			for i in lam:
+				lam[i] = max(0.0, lam[i] - size * (1 - collections[i]))
+			for (t,k) in mu:
+				mu[t,k] = max(0.0, mu[t,k] - size * (down[k] - downloads[t,k]))
+
+	if best is None:
+		print("STATUS: ", -1)
+		return -1, 0, dual, None
+	objective, schedule = best
+	print_schedule(schedule)
+	print("Objective =", objective, ", DUAL BOUND =", round(dual, 4), ", GAP =", round(dual - objective, 4))
+	return status, objective, dual, schedule
+
+
+#Solves the subproblem of one satellite with the objective priced by the multipliers
+#Returns (Sj, status, objective, collections, downloads)
+def solve_satellite(task):
+	(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta), lam, mu = task
+	Hc, starts = compress_horizon(H, S, col, com, p, pt, mem)
+	prob, x, z, y, idx = build_ILP_LAS(Hc, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, True, False, starts)
+	prob.setObjective(plp.lpSum((1 - lam.get(i, 0)) * x[t,i,j] for (t,i,j) in idx.x) - plp.lpSum(mu.get((t,k), 0) * y[t,i,j,k] for (t,i,j,k) in idx.y))
+	status = prob.solve(plp.PULP_CBC_CMD(msg = False, threads = 1))
+	if status != 1:
+		return S[0], status, None, [], []
+	schedule = schedule_of(x, z, y)
+	return S[0], status, plp.value(prob.objective) or 0, schedule["x"], schedule["y"]
+
+
+#ILP_LAS restricted to the collection opportunities of the given (Ai, Sj) pairs
+#Returns (objective, schedule), or None if the restricted model has no solution
+def repair_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, pairs):
+	colr = {(t,j,i): v for (t,j,i), v in col.items() if (i,j) in pairs}
+	Hc, starts = compress_horizon(H, S, colr, com, p, pt, mem)
+	prob, x, z, y, idx = build_ILP_LAS(Hc, S, A, B, C, mem, up, down, colr, com, theta, p, pt, c, d, e, f, g, s, beta, True, False, starts)
+	if prob.solve(plp.PULP_CBC_CMD(msg = False)) != 1:
+		return None
+	schedule = schedule_of(x, z, y)
+	return len(schedule["x"]), schedule
@@ -1,6 +1,9 @@
 from ILP_LAS import ILP_LAS
 from ILP2 import ILP2
 from ILP import ILP
+from ILP_flow import ILP_flow
+from greedy import greedy_ILP_LAS
+from utility.eclipseProfile import window_profile
 
 #Example 1
 n = 9	#Number of regions
@@ -37,9 +40,11 @@ for k in B:
 #Initial battery capacity of satellites
 C = {}
 theta = {}
+beta = {}
 for j in S:
 	C[j] = 4
 	theta[j] = 3
+	beta[j] = 20
 #"""
 c = 0.4     #charging per unit time 		
 d = 0.3     #constant discharging per unit time
@@ -76,28 +81,39 @@ com = { (4,0,0): 1,
 
 pt = 3
 
-s = {}
-for t in H:
-	if t < 4:
-		s[t,0] = 0
-	else:
-		s[t,0] = 1
-
-for t in H:
-	if t < 4:
-		s[t,1] = 0
-	else:
-		s[t,1] = 1
+#Shadow windows [start, end) of the satellites: both in light until t = 4
+s = window_profile(S, p, {0: [(4, p)], 1: [(4, p)]})
 
 
 print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT AND PROCESSING CAPABILITY")
 ILP(H, S, A, B, mem, up, down, col, com, p)
 
 
+print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT AND PROCESSING CAPABILITY (MAX-FLOW)")
+ILP_flow(H, S, A, B, mem, up, down, col, com, p)
+
+
 print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT")
 ILP2(H, S, A, B, mem, up, down, col, com, p, pt)
 
 
 print("\n\nSCHEDULE FOLLOWING BATTERY CONSTRAINT AND PROCESSING CAPABILITY")
-ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s)
+ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta)
+
+
+print("\n\nSCHEDULE FOLLOWING BATTERY CONSTRAINT AND PROCESSING CAPABILITY (GREEDY)")
+greedy_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta)
+
+
+#Same models with memory, battery and collected data carried as state from one instant to the next
+print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT (CUMULATIVE STATE FORMULATION)")
+ILP2(H, S, A, B, mem, up, down, col, com, p, pt, cumulative = True)
+
+
+print("\n\nSCHEDULE FOLLOWING BATTERY CONSTRAINT AND PROCESSING CAPABILITY (CUMULATIVE STATE FORMULATION)")
+ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, cumulative = True)
+
 
+#Same model with download counts per satellite, ground station and instant instead of per-area download variables
+print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT (AGGREGATED DOWNLOADS)")
+ILP2(H, S, A, B, mem, up, down, col, com, p, pt, sparse = True, aggregated = True)
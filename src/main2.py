@@ -2,7 +2,11 @@ from ILP_LAS import ILP_LAS
 from ILP2 import ILP2
 from ILP import ILP
 from os import path
-from utility.dictionaryGene import process_satellite_data
+from utility.opportunityCache import load_satellite_data
+from utility.eventCompression import compress_horizon
+from utility.accessGenerator import walker_constellation
+from utility.eclipseProfile import orbit_profile
+from ILP_LAS_matrix import ILP_LAS_matrix
 
 #Example 1
 n = 185	#Number of regions
@@ -48,8 +52,9 @@ for j in S:
 	beta[j] = 20
 
 #"""
-c = 0.4 #CHARGING		
-d = 0.3 #DISCHARGING
+#The instants of the export are seconds: charging and discharging are per second, over orbits of about 95 minutes
+c = 0.003 #CHARGING		
+d = 0.001 #DISCHARGING
 e = 0.25 #COLLECTION
 f = 0.25 #COMMUNICATION
 g = 0.4  #COMPUTATION
@@ -97,25 +102,16 @@ base_dir = path.dirname(path.abspath(__file__))
 # Join it with the relative path to the CSV (assuming it's in 'utility')
 csv_path = path.join(base_dir, 'utility', 'time_sat_reg_1.csv')
 
-# Now pass csv_path to your function
-col,com = process_satellite_data(csv_path)
+# Now pass csv_path to your function (parsed once, then read from the cache; bypass = True to re-parse)
+col,com = load_satellite_data(csv_path)
 # print("Collection Opportunities:", col)
 # print("Communication Opportunities:", com)
 
 pt = 1
 
-s = {}
-for t in H:
-	if t < 4:
-		s[t,0] = 0 #LIGHT FOR S0
-	else:
-		s[t,0] = 1 #SHADOW FOR S0
-
-for t in H:
-	if t < 5:
-		s[t,1] = 0 #LIGHT FOR S1
-	else:
-		s[t,1] = 1 #SHADOW FOR S1
+#Shadow of the satellites on the orbits of a Walker 53:24/6/1 constellation at 550 km, one instant per second (see
+#utility/eclipseProfile.py); the export has no orbital elements, so these orbits only approximate the ones behind it
+s = orbit_profile(walker_constellation(m, 6, altitude = 550, inclination = 53), S, p)
 
 '''
 print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT AND PROCESSING CAPABILITY")
@@ -126,4 +122,11 @@ print("\n\nSCHEDULE WITHOUT BATTERY CONSTRAINT")
 ILP2(H, S, A, B, mem, up, down, col, com, p, pt)
 '''
 print("\n\nSCHEDULE FOLLOWING BATTERY CONSTRAINT AND PROCESSING CAPABILITY")
-ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta)
\ No newline at end of file
+#Only the instants with an opportunity (and the processing starts that can matter) are kept
+H_events, starts = compress_horizon(H, S, col, com, p, pt, mem)
+print("TIME INSTANTS: ", len(H), " -> ", len(H_events))
+ILP_LAS(H_events, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, sparse = True, cumulative = True, starts = starts)
+
+
+print("\n\nSCHEDULE FOLLOWING BATTERY CONSTRAINT AND PROCESSING CAPABILITY (MATRIX MODEL, FULL HORIZON)")
+ILP_LAS_matrix(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta)
\ No newline at end of file
@@ -0,0 +1,95 @@
+#Rolling-horizon solve of ILP_LAS for long horizons
+
+import pulp as plp
+from ILP_LAS import build_ILP_LAS, schedule_of, print_schedule
+from utility.eventCompression import compress_horizon
+from utility.eclipseProfile import light_ticks
+
+
+
+#Same arguments as ILP_LAS, plus
+#window: number of time instants of H planned together
+#overlap: number of instants at the end of a window that are planned again by the next window
+#monolithic: if True, also solve the whole horizon at once and report both objectives
+#
+#The windows [start, start+window) are solved in sequence on the compressed, sparse, cumulative model.
+#Only the decisions before start+window-overlap are kept; the next window starts there with the
+#state left by the kept decisions:
+#	data units still in memory of each satellite (to be downloaded or processed later)
+#	processing still running on each satellite
+#	battery level of each satellite
+#	areas already collected and opportunities let pass (they stay in the model but cannot be used)
+#Everything collected in a window has to be downloaded or processed inside it, so a longer window
+#gives better plans at a higher memory and time cost. A window does not see the battery drain after
+#its end, so the kept decisions can leave a later window infeasible; the status of that window is
+#returned with the plan kept so far.
+def rolling_ILP_LAS(H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, window, overlap, monolithic = True):
+	H = sorted(H)
+	overlap = min(overlap, window - 1)		#Every window has to keep at least one instant
+	level = dict(C)					#Battery level at the start of the window
+	held = {j: [] for j in S}		#Areas in memory at the start of the window
+	free = {j: 0 for j in S}		#Instant at which the running processing ends
+	collected = set()
+	missed = set()
+	schedule = {"x": [], "z": [], "y": []}
+
+	start = H[0]
+	while True:
+		end = min(start + window, p)
+		last = end >= p or end > H[-1]
+		keep = end if last else end - overlap
+
+		Hw = [t for t in H if start <= t < end]
+		colw = {(t,j,i): v for (t,j,i), v in col.items() if start <= t < end}
+		comw = {(t,j,k): v for (t,j,k), v in com.items() if start <= t < end}
+		init = {"held": held, "free": free, "collected": collected, "missed": missed}
+
+		Hc, starts = compress_horizon(Hw, S, colw, comw, end, pt, mem, held)
+		prob, x, z, y, idx = build_ILP_LAS(Hc, S, A, B, level, mem, up, down, colw, comw, theta, end, pt, c, d, e, f, g, s, beta, True, True, starts, init)
+		status = prob.solve(plp.PULP_CBC_CMD(msg = False))
+		print("WINDOW [", start, ",", end, "): STATUS: ", status, ", KEPT TILL ", keep)
+		if status != 1:
+			return status, len(schedule["x"]), schedule
+
+		#Keep the decisions before keep and carry the state they leave
+		window_schedule = schedule_of(x, z, y)
+		for (t,i,j) in window_schedule["x"]:
+			if t < keep:
+				schedule["x"].append((t,i,j))
+				collected = collected | {i}
+				held[j] = held[j] + [i]
+				level[j] -= e
+		for (t,i,j) in window_schedule["z"]:
+			if t < keep:
+				schedule["z"].append((t,i,j))
+				held[j] = [a for a in held[j] if a != i]
+				free[j] = max(free[j], t + pt)
+				level[j] -= pt * g
+		for (t,i,j,k) in window_schedule["y"]:
+			if t < keep:
+				schedule["y"].append((t,i,j,k))
+				held[j] = [a for a in held[j] if a != i]
+				level[j] -= f
+		for j in S:
+			level[j] += (c * float(light_ticks(s, j, start, keep).sum())) - (d * (keep - start))
+		missed = missed | set((i,j) for (t,j,i) in colw if t < keep and (t,i,j) not in schedule["x"])
+
+		if last:
+			break
+		start = keep
+
+	objective = len(schedule["x"])
+	print_schedule(schedule)
+	print("ROLLING HORIZON OBJECTIVE =", objective)
+
+	if monolithic:
+		Hc, starts = compress_horizon(H, S, col, com, p, pt, mem)
+		prob, x, z, y, idx = build_ILP_LAS(Hc, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, True, True, starts)
+		full_status = prob.solve(plp.PULP_CBC_CMD(msg = False))
+		if full_status == 1:
+			full = round(plp.value(prob.objective))
+			print("MONOLITHIC OBJECTIVE =", full, ", ROLLING HORIZON GAP =", full - objective)
+		else:
+			print("MONOLITHIC STATUS: ", full_status)
+
+	return status, objective, schedule
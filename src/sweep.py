@@ -0,0 +1,192 @@
+#Parameter sweep of ILP_LAS and ILP2 over energy and capacity what-if variants of the main2.py instance
+#
+#	python sweep.py --grid '{"mem": [2, 3, 4], "c": [0.3, 0.4], "pt": [1, 2]}' --out sweep.csv
+#	python sweep.py --grid grid.json --models ILP_LAS --processes 8 --time-limit 60 --out sweep.csv
+#
+#The grid maps parameters to the values they take; every combination of them (a grid point) is solved
+#with every model. The access-window export is parsed once, into the opportunity cache (see
+#utility/opportunityCache.py): the workers of the process pool open its tables memory-mapped, so the
+#opportunities are shared through the page cache and never pickled, and every worker builds the
+#dictionaries once for all the points it solves.
+#
+#The results table (CSV) gets one row per point as soon as it is solved, so an interrupted sweep loses
+#only the points in progress; run again with the same --out (and any grid), it skips the points already
+#in the table. A point is identified by the model and the values of the parameters it depends on, swept
+#or not (ILP2 has no battery: its points only differ in mem, up, down and pt).
+#Columns: point (the key of the row), model, the parameters (of the model), status, objective, collections,
+#build, solve (seconds), error (only if the run failed)
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import tempfile
+import timeit
+from multiprocessing import Pool
+from os import path
+from utility.opportunityCache import DEFAULT_CACHE_DIR, load_satellite_data, cache_key, read_entry, write_entry
+from utility.dictionaryGene import opportunity_dicts
+from utility.instanceGenerator import eclipse_profile
+from utility.eventCompression import compress_horizon
+from utility.solverConfig import SolverConfig
+
+
+
+#Instance of main2.py (185 areas, 24 satellites, 20 ground stations, 5400 instants); the battery follows
+#the orbit model of utility/instanceGenerator.py (every satellite in shadow for the fraction eclipse of
+#each orbit, phases spread over the orbit), as in main2.py
+BASE = {"n": 185, "m": 24, "o": 20, "p": 5400, "orbit": 96, "eclipse": 0.35,
+	"mem": 3, "up": 2, "down": 2, "pt": 1, "C": 8.0, "theta": 3, "beta": None,
+	"c": 0.4, "d": 0.1, "e": 0.25, "f": 0.25, "g": 0.4}
+#Parameters a grid can sweep (mem, up, C, theta and beta are the same for every satellite, down for every
+#ground station; beta None is C + c*p + 1, above any charge)
+PARAMETERS = ("mem", "up", "down", "pt", "C", "theta", "beta", "c", "d", "e", "f", "g")
+MODELS = ("ILP_LAS", "ILP2")
+#Parameters each model depends on: the points that only differ in others are solved once
+USES = {"ILP_LAS": PARAMETERS, "ILP2": ("mem", "up", "down", "pt")}
+COLUMNS = ("point", "model") + PARAMETERS + ("status", "objective", "collections", "build", "solve", "error")
+
+
+#Grid points: one {parameter: value} per combination of the grid values, for every model
+def points_of(grid, models):
+	unknown = [name for name in grid if name not in PARAMETERS]
+	if unknown:
+		raise ValueError("unknown parameters %s, a grid sweeps %s" % (unknown, ", ".join(PARAMETERS)))
+	names = list(grid)
+	return [dict(zip(names, values), model = model) for values in itertools.product(*(grid[name] for name in names)) for model in models]
+
+
+#Key of a point in the results table
+def key_of(point, base):
+	values = dict(base, **point)
+	return json.dumps(dict({name: values[name] for name in USES[point["model"]]}, model = point["model"]), sort_keys = True)
+
+
+#Directory of the memory-mapped opportunity tables of the export (the cache entry, or a temporary copy
+#when the cache cannot be written)
+def share_tables(csv_path, cache_dir = None):
+	collection, communication, rows = load_satellite_data(csv_path, cache_dir, arrays = True)
+	entry = path.join(cache_dir or DEFAULT_CACHE_DIR, cache_key(csv_path))
+	if read_entry(entry) is None:
+		entry = path.join(tempfile.mkdtemp(prefix = "sweep"), "tables")
+		write_entry(entry, rows)
+	return entry
+
+
+#State of a worker, set once by init_worker
+worker = {}
+
+
+def init_worker(entry, base, solver, time_limit):
+	rows = read_entry(entry)
+	worker["col"], worker["com"] = opportunity_dicts(rows)
+	S = list(range(base["m"]))
+	worker["s"] = eclipse_profile(S, base["p"], base["orbit"], base["eclipse"], [j * base["orbit"] // len(S) for j in S])
+	worker["base"] = base
+	worker["solver"] = solver
+	worker["time_limit"] = time_limit
+
+
+#Solves one grid point in the worker; returns its row
+def run_point(point):
+	from ILP_LAS import solve_ILP_LAS
+	from ILP2 import build_ILP2
+
+	values = dict(worker["base"], **point)
+	row = dict({name: values[name] for name in USES[point["model"]]}, point = key_of(point, worker["base"]), model = point["model"])
+	H, S, A, B = list(range(values["p"])), list(range(values["m"])), list(range(values["n"])), list(range(values["o"]))
+	p, pt, c = values["p"], values["pt"], values["c"]
+	mem = {j: values["mem"] for j in S}
+	up = {j: values["up"] for j in S}
+	down = {k: values["down"] for k in B}
+	C = {j: values["C"] for j in S}
+	theta = {j: values["theta"] for j in S}
+	beta = {j: values["C"] + c * p + 1 if values["beta"] is None else values["beta"] for j in S}
+	col, com = worker["col"], worker["com"]
+	config = SolverConfig(worker["solver"], time_limit = worker["time_limit"])
+	try:
+		H_events, starts = compress_horizon(H, S, col, com, p, pt, mem)
+		if point["model"] == "ILP_LAS":
+			result = solve_ILP_LAS(H_events, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, values["d"], values["e"], values["f"], values["g"], worker["s"], beta,
+				sparse = True, cumulative = True, starts = starts, solver = config)
+			row.update(status = result.status, objective = result.objective, collections = len(result.collections),
+				build = result.timings.get("build"), solve = result.timings.get("solve"))
+		else:
+			start = timeit.default_timer()
+			prob, x, z, y, idx = build_ILP2(H_events, S, A, B, mem, up, down, col, com, p, pt, True, True, starts)
+			row["build"] = timeit.default_timer() - start
+			start = timeit.default_timer()
+			row["status"] = config.solve(prob)
+			row["solve"] = timeit.default_timer() - start
+			row["objective"] = config.report["objective"]
+			row["collections"] = sum(1 for v in x.values() if v.varValue is not None and v.varValue > 0.5)
+	except Exception as error:
+		row["error"] = "%s: %s" % (type(error).__name__, error)
+	return row
+
+
+#Keys of the points already in the results table
+def done_points(out):
+	if not path.isfile(out):
+		return set()
+	with open(out, newline = "") as f:
+		return set(row["point"] for row in csv.DictReader(f))
+
+
+#Solves the points not yet in the results table in a pool of processes, appending their rows to it
+def sweep(csv_path, grid, models, out, processes = None, solver = "cbc", time_limit = None, base = None, cache_dir = None, verbose = True):
+	base = dict(BASE, **(base or {}))
+	points = {}
+	for point in points_of(grid, models):
+		points.setdefault(key_of(point, base), point)
+	done = done_points(out)
+	todo = [point for key, point in points.items() if key not in done]
+	if verbose:
+		print("GRID POINTS: ", len(points), ", DONE: ", len(points) - len(todo), ", TO SOLVE: ", len(todo))
+	if not todo:
+		return 0
+
+	entry = share_tables(csv_path, cache_dir)
+	new = not path.isfile(out) or path.getsize(out) == 0
+	with open(out, "a", newline = "") as f, Pool(processes, init_worker, (entry, base, solver, time_limit)) as pool:
+		writer = csv.DictWriter(f, COLUMNS)
+		if new:
+			writer.writeheader()
+		for row in pool.imap_unordered(run_point, todo):
+			writer.writerow(row)
+			f.flush()
+			if verbose:
+				print_row(row, list(grid))
+	return len(todo)
+
+
+#names: parameters of the grid, printed with the model
+def print_row(row, names):
+	name = "%s %s" % (row["model"], " ".join("%s=%s" % (name, row[name]) for name in names if name in USES[row["model"]]))
+	if row.get("error"):
+		print(name, ": ERROR ", row["error"])
+		return
+	print(name, ": STATUS ", row["status"], ", OBJECTIVE ", row["objective"], ", BUILD ", round(row["build"], 3), "s, SOLVE ", round(row["solve"], 3), "s")
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description = "Parameter sweep of ILP_LAS and ILP2")
+	parser.add_argument("--grid", required = True, help = "JSON grid {parameter: [values]}, or a JSON file holding it")
+	parser.add_argument("--csv", default = path.join(path.dirname(path.abspath(__file__)), "utility", "time_sat_reg_1.csv"), help = "access-window export")
+	parser.add_argument("--models", nargs = "+", choices = MODELS, default = list(MODELS))
+	parser.add_argument("--out", default = "sweep.csv", help = "CSV results table, resumed if it exists")
+	parser.add_argument("--processes", type = int, default = None, help = "worker processes, one per CPU by default")
+	parser.add_argument("--solver", choices = ["cbc", "highs"], default = "cbc")
+	parser.add_argument("--time-limit", type = float, default = None, help = "time limit of each solve, in seconds")
+	args = parser.parse_args()
+
+	if path.isfile(args.grid):
+		with open(args.grid) as f:
+			grid = json.load(f)
+	else:
+		grid = json.loads(args.grid)
+	try:
+		sweep(args.csv, grid, args.models, args.out, args.processes, args.solver, args.time_limit)
+	except ValueError as error:
+		sys.exit(str(error))
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# Access windows of a constellation, computed from its orbital elements
+# instead of read from an export:
+#
+#   elements = walker_constellation(24, 6, altitude=550, inclination=53)
+#   rows = access_windows(elements, sites(185, seed=0), sites(20, seed=1), 5400)
+#   collection, communication = opportunity_dicts(rows)     # utility/dictionaryGene.py
+#   write_access_csv("access.csv", rows)                    # read by process_satellite_data
+#
+# Satellites follow two-body (Keplerian) orbits around a spherical Earth that
+# turns under them; a satellite has a collection opportunity of an area in an
+# instant when it is at least collection_elevation degrees above the horizon of
+# the area (near its zenith, where it can image it), and a communication
+# opportunity with a ground station when it is at least communication_elevation
+# degrees above the horizon of the station.
+#
+# elements : {"a": semi-major axis (km), "e": eccentricity, "i": inclination,
+#             "raan": right ascension of the ascending node, "argp": argument
+#             of perigee, "M": mean anomaly at t = 0}, one array entry per
+#             satellite, angles in degrees (e = 0 is a circular orbit)
+# sites    : (n, 2) array of (latitude, longitude) in degrees
+#
+# The rows are the int64 (n, 3) arrays (time, satcode, id) of
+# process_satellite_data(..., arrays=True), in increasing time, satellite and
+# id: time is the instant (t = seconds / step), satcode the index of the
+# satellite in elements (or satcodes[index]) and id the index of the area or
+# ground station.
+
+MU = 398600.4418            # Gravitational parameter of the Earth (km^3/s^2)
+RADIUS = 6378.137           # Radius of the Earth (km)
+ROTATION = 7.2921159e-5     # Rotation rate of the Earth (rad/s)
+
+
+# Elements of a Walker delta constellation i:m/planes/phasing: planes equally
+# spaced in right ascension, m/planes satellites equally spaced in each, the
+# satellites of plane k shifted by k*phasing*360/m degrees
+def walker_constellation(m, planes, altitude=550.0, inclination=53.0, phasing=1):
+    if m % planes:
+        raise ValueError("%d satellites cannot be spread over %d planes" % (m, planes))
+    per_plane = m // planes
+    plane, slot = np.divmod(np.arange(m), per_plane)
+    return {"a": np.full(m, RADIUS + altitude), "e": np.zeros(m), "i": np.full(m, float(inclination)),
+            "raan": plane * 360.0 / planes, "argp": np.zeros(m),
+            "M": (slot * 360.0 / per_plane + plane * phasing * 360.0 / m) % 360.0}
+
+
+# n sites drawn uniformly on the sphere between the latitudes (-latitude,
+# latitude); the same n and seed always give the same sites
+def sites(n, seed=0, latitude=60.0):
+    rng = np.random.default_rng(seed)
+    bound = np.sin(np.radians(latitude))
+    return np.column_stack((np.degrees(np.arcsin(rng.uniform(-bound, bound, n))), rng.uniform(-180.0, 180.0, n)))
+
+
+# Earth-centred inertial positions (km) of the satellites at the given seconds:
+# array of shape (len(seconds), m, 3)
+def satellite_positions(elements, seconds):
+    a, e = np.asarray(elements["a"], dtype=float), np.asarray(elements["e"], dtype=float)
+    i, raan, argp, M0 = (np.radians(np.asarray(elements[name], dtype=float)) for name in ("i", "raan", "argp", "M"))
+    seconds = np.asarray(seconds, dtype=float)[:, None]
+
+    # Kepler's equation M = E - e sin E, by Newton's method from E = M
+    M = M0 + np.sqrt(MU / a ** 3) * seconds
+    E = M.copy()
+    for _ in range(8 if np.any(e > 0) else 0):
+        E -= (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+    # Position in the orbital plane (x towards the perigee)
+    x = a * (np.cos(E) - e)
+    y = a * np.sqrt(1 - e ** 2) * np.sin(E)
+
+    # Rotation of the orbital plane by argp, i and raan
+    cw, sw, ci, si, cr, sr = np.cos(argp), np.sin(argp), np.cos(i), np.sin(i), np.cos(raan), np.sin(raan)
+    u = x * cw - y * sw
+    v = x * sw + y * cw
+    return np.stack((u * cr - v * ci * sr, u * sr + v * ci * cr, v * si), axis=-1)
+
+
+# Unit vectors (Earth-fixed) of the sites, array of shape (n, 3)
+def site_vectors(coordinates):
+    coordinates = np.radians(np.asarray(coordinates, dtype=float).reshape(-1, 2))
+    latitude, longitude = coordinates[:, 0], coordinates[:, 1]
+    return np.column_stack((np.cos(latitude) * np.cos(longitude), np.cos(latitude) * np.sin(longitude), np.sin(latitude)))
+
+
+# Collection and communication opportunities of the p instants 0, step, 2*step, ...
+# (seconds): {"collection": rows, "communication": rows}
+#
+# areas, stations : (latitude, longitude) of the areas and of the ground stations
+# batch           : bound on the satellite x site x instant elevations held at
+#                   once; the instants are processed in batches that keep to it
+def access_windows(elements, areas, stations, p, step=1.0, collection_elevation=60.0, communication_elevation=10.0,
+                   satcodes=None, batch=2**20):
+    rows = {}
+    for name, coordinates, elevation in [("collection", areas, collection_elevation), ("communication", stations, communication_elevation)]:
+        rows[name] = visible_rows(elements, site_vectors(coordinates), p, step, elevation, batch)
+    if satcodes is not None:
+        satcodes = np.asarray(satcodes, dtype=np.int64)
+        for name in rows:
+            rows[name][:, 1] = satcodes[rows[name][:, 1]]
+    return rows
+
+
+# Rows (t, satellite, site) of the instants in which the satellite is at least
+# elevation degrees above the horizon of the site. For a site at unit vector n
+# and a satellite at r (Earth-fixed), the sine of the elevation is
+# (n.r - R) / |r - R n|, with |r - R n|^2 = |r|^2 + R^2 - 2 R n.r: the only
+# product of satellites and sites is the matrix of the n.r.
+def visible_rows(elements, vectors, p, step, elevation, batch):
+    m, n = len(np.asarray(elements["a"])), len(vectors)
+    if m == 0 or n == 0 or p == 0:
+        return np.empty((0, 3), dtype=np.int64)
+    size = max(1, batch // (m * n))
+    sine = np.sin(np.radians(elevation))
+    blocks = []
+    for first in range(0, p, size):
+        t = np.arange(first, min(first + size, p))
+        seconds = t * step
+        r = earth_fixed(satellite_positions(elements, seconds), seconds)
+        dot = (r.reshape(-1, 3) @ vectors.T).reshape(len(t), m, n)
+        square = np.einsum("tmk,tmk->tm", r, r)[:, :, None]
+        # (dot - R) / sqrt(square + R^2 - 2 R dot) >= sine, without the division and root
+        above = dot - RADIUS
+        visible = above * np.abs(above) >= sine * abs(sine) * (square + RADIUS ** 2 - 2 * RADIUS * dot)
+        when, satellite, site = np.nonzero(visible)
+        blocks.append(np.column_stack((t[when], satellite, site)).astype(np.int64))
+    return np.concatenate(blocks)
+
+
+# Positions (t, m, 3) at the given seconds turned from the inertial frame to
+# the Earth-fixed frame (both aligned at t = 0)
+def earth_fixed(positions, seconds):
+    angle = ROTATION * np.asarray(seconds, dtype=float)[:, None]
+    c, s = np.cos(angle), np.sin(angle)
+    x, y = positions[..., 0], positions[..., 1]
+    return np.stack((c * x + s * y, c * y - s * x, positions[..., 2]), axis=-1)
+
+
+# Writes the rows as an access-window export (time, satcode, "A--<id>" area or
+# "G--<id>" ground station), in the order of the instants
+def write_access_csv(file_path, rows):
+    frames = [pd.DataFrame({"time": rows[name][:, 0], "satcode": rows[name][:, 1],
+                            "region_or_station": np.char.add(prefix, rows[name][:, 2].astype(str))})
+              for name, prefix in [("collection", "A--"), ("communication", "G--")]]
+    table = pd.concat(frames, ignore_index=True)
+    table.sort_values("time", kind="stable").to_csv(file_path, index=False)
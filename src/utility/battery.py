@@ -0,0 +1,68 @@
+import numpy as np
+from utility.eclipseProfile import cumulative_light, light_ticks
+
+# Data-only part of the battery constraints of ILP_LAS for satellite Sj.
+#
+# Ignoring collections, communications and processing, the battery of Sj at the
+# end of tick u has changed by c*(ticks in light in [T[0],u]) - d*(u-T[0]+1)
+# since the start T[0] of the horizon. No decision of Sj changes between two
+# consecutive instants of T (a sorted subset of the horizon), so every tick u of
+# the gap [t, next instant) is covered by the single row written at t:
+#	now  : data part at t itself (state formulation)
+#	low  : minimum of the data part over the gap (underflow rows)
+#	high : maximum of the charge c*(ticks in light in [T[0],u]) over the gap (overflow rows)
+# The last gap runs up to the end of the horizon p. With T = [0, ..., p-1] every
+# gap is a single tick and the terms are the per-tick ones of the original model.
+# The ticks in light are read from the prefix sums of s (see utility/eclipseProfile.py).
+def battery_gaps(T, j, p, c, d, s):
+    if not T:
+        return {}
+    # Ticks in light in [T[0], u] and data part at the end of u, for every tick u of [T[0], p)
+    light = cumulative_light(s, j, T[0], p)
+    level = (c * light) - (d * np.arange(1, p - T[0] + 1))
+    first = np.asarray(T) - T[0]
+    last = np.append(first[1:], p - T[0]) - 1
+    low = np.minimum.reduceat(level, first)
+    return dict(zip(T, zip(level[first].tolist(), low.tolist(), (c * light[last]).tolist())))
+
+
+# Pre-model screening of the data-only part of the battery constraints of ILP_LAS.
+#
+# Decisions only drain the battery, so if the level of Sj without any
+# collection, communication or processing, C[j] + c*(ticks in light) -
+# d*(ticks), falls under theta[j] at some tick of [H[0], p), no schedule
+# exists. The overflow rows C[j] + c*(ticks in light) <= beta[j] have no
+# variable at all. Both are evaluated with NumPy for every satellite and tick,
+# without building a model, after checking that s has every (t, Sj) key.
+#
+# Returns the issues as (check, t, Sj, detail), one per satellite and check at
+# the first tick it fails, in the format of utility/scheduleValidator.py; an
+# empty list means the data does not make the model infeasible.
+def screen_battery(H, S, C, theta, beta, p, c, d, s):
+    start = min(H)
+    T = np.arange(start, p)
+    issues = []
+    for j in S:
+        light = light_ticks(s, j, start, p, missing=np.nan)
+        missing = np.isnan(light)
+        if missing.any():
+            issues.append(("missing eclipse data", int(T[missing][0]), j, "s[t,%s] missing for %d of %d ticks" % (j, missing.sum(), len(T))))
+            continue
+
+        charge = C[j] + c * np.cumsum(light)
+        level = charge - d * (T - start + 1)
+        for (check, value, bound, fails, text) in [("battery underflow", level, theta[j], level < theta[j] - 1e-9, "%.6g < %.6g with no action"),
+                                                   ("battery overflow", charge, beta[j], charge > beta[j] + 1e-9, "%.6g > %.6g")]:
+            if fails.any():
+                n = int(np.argmax(fails))
+                worst = int(np.argmin(value)) if check == "battery underflow" else int(np.argmax(value))
+                issues.append((check, int(T[n]), j, (text % (value[n], bound)) + ", %d ticks, worst %.6g at %d" % (fails.sum(), value[worst], T[worst])))
+    order = {j: n for n, j in enumerate(S)}
+    issues.sort(key=lambda v: (v[1], order[v[2]], v[0]))
+    return issues
+
+
+def print_screening(issues):
+    print("SCREENING: ", len(issues), " data-only violations")
+    for (check, t, j, detail) in issues:
+        print(t, ": ", j, " - ", check, " (", detail, ")")
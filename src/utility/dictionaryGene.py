@@ -1,38 +1,90 @@
+import numpy as np
 import pandas as pd
-import re
+from utility.instrumentation import instrumented, phase, count
 
-def process_satellite_data(file_path):
+# Version of the parsed output, part of the key of the cached tables (see
+# utility/opportunityCache.py): change it whenever the parsing changes
+PARSER_VERSION = 1
+
+# Column types of the access-window exports (time, satellite code, "A--<id>" area or "G--<id>" ground station)
+DTYPES = {"time": "float64", "satcode": "int64", "region_or_station": "category"}
+
+
+# Collection and communication opportunities of an access-window export.
+#
+# chunksize : None reads the whole file at once; otherwise the file is read
+#             chunksize rows at a time, so that only one chunk of text is in
+#             memory besides the parsed opportunities
+# arrays    : if True, also returns the opportunities as int64 arrays of
+#             shape (n, 3), one row (time, satcode, id) per key of the
+#             dictionaries and in the same order:
+#             {"collection": ..., "communication": ...}
+#
+# Times are rounded to the nearest integer (half to even, as round()).
+# Returns collection {(t, Sj, Ai): 0.25} and communication {(t, Sj, Bk): 1}.
+@instrumented("process_satellite_data")
+def process_satellite_data(file_path, chunksize=None, arrays=False):
     # Load the csv file
     try:
-        df = pd.read_csv(file_path)
+        if chunksize is None:
+            chunks = [pd.read_csv(file_path, dtype=DTYPES)]
+        else:
+            chunks = pd.read_csv(file_path, dtype=DTYPES, chunksize=chunksize)
+        collections, communications = [], []
+        with phase("read csv") as record:
+            for chunk in chunks:
+                rows_collection, rows_communication = parse_opportunities(chunk)
+                collections.append(rows_collection)
+                communications.append(rows_communication)
+            count(record, chunks=len(collections))
     except FileNotFoundError:
         print("File not found.")
-        return None, None
-
-    collection = {}
-    communication = {}
-
-    for index, row in df.iterrows():
-        # OPTIONAL: Round time to nearest integer and convert to int for cleaner keys
-        # If you prefer the exact float value, use: time_val = row['time']
-        time_val = int(round(row['time']))
-        
-        satcode_val = row['satcode']
-        region_str = str(row['region_or_station']).strip()
-        
-        # Regex to find the number at the end
-        match = re.search(r'(\d+)$', region_str)
-        
-        if match:
-            region_id = int(match.group(1))
-            key_tuple = (time_val, satcode_val, region_id)
-            
-            if region_str.startswith('A'):
-                collection[key_tuple] = 0.25
-            elif region_str.startswith('G'):
-                communication[key_tuple] = 1
+        return (None, None, None) if arrays else (None, None)
+
+    with phase("unique rows") as record:
+        rows = {"collection": unique_rows(collections), "communication": unique_rows(communications)}
+        count(record, collection=len(rows["collection"]), communication=len(rows["communication"]))
+    with phase("dictionaries"):
+        collection, communication = opportunity_dicts(rows)
+    if arrays:
+        return collection, communication, rows
+    return collection, communication
+
 
+# Dictionaries of the (n, 3) rows {"collection": ..., "communication": ...}
+def opportunity_dicts(rows):
+    collection = dict.fromkeys(zip(*rows["collection"].T.tolist()), 0.25)
+    communication = dict.fromkeys(zip(*rows["communication"].T.tolist()), 1)
     return collection, communication
 
+
+# Rows (time, satcode, id) of the collection and of the communication
+# opportunities of one DataFrame. The names are parsed once per category
+# (there are only as many as areas and ground stations) and spread to the
+# rows through the category codes.
+def parse_opportunities(df):
+    time_val = np.rint(df['time'].to_numpy(dtype=np.float64)).astype(np.int64)
+    satcode_val = df['satcode'].to_numpy(dtype=np.int64)
+    region = df['region_or_station'].astype('category')
+
+    # Number at the end of the name, and its kind (0 area, 1 ground station, -1 other)
+    names = pd.Series(region.cat.categories.astype(str)).str.strip()
+    number = names.str.extract(r'(\d+)$', expand=False)
+    region_id = pd.to_numeric(number).fillna(-1).to_numpy(dtype=np.int64)
+    kind = np.select([names.str.startswith('A').to_numpy(dtype=bool), names.str.startswith('G').to_numpy(dtype=bool)], [0, 1], -1)
+    kind[number.isna().to_numpy()] = -1
+
+    codes = region.cat.codes.to_numpy()
+    row_kind = np.where(codes >= 0, kind[codes], -1)
+    row_id = region_id[codes]
+    rows = np.column_stack((time_val, satcode_val, row_id))
+    return rows[row_kind == 0], rows[row_kind == 1]
+
+
+# Concatenates row blocks and keeps the first occurrence of every row, in order
+def unique_rows(blocks):
+    rows = np.concatenate(blocks) if blocks else np.empty((0, 3), dtype=np.int64)
+    return rows[~pd.DataFrame(rows).duplicated().to_numpy()]
+
 # --- Example Run ---
-# collection, communication = process_satellite_data('time_sat_reg_1.csv')
\ No newline at end of file
+# collection, communication = process_satellite_data('time_sat_reg_1.csv')
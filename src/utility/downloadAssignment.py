@@ -0,0 +1,58 @@
+import heapq
+from collections import defaultdict
+
+
+# Download windows of the aggregated models (ILP / ILP2 / ILP_LAS with
+# aggregated = True), which only count the downloads w[t,j,k] of each satellite.
+#
+# Every collection (t,i,j) is an item that can be downloaded from t+1 on. In
+# ILP2 and ILP_LAS, "process all collected data" also asks the data of a pair
+# (Ai, Sj) to leave the memory before the next collection opportunity of the
+# pair (no download after it), which gives the item a deadline. Data held from
+# before H[0] is an item (H[0]-1, i, j).
+#
+# Returns {(t,i,j): deadline or None}.
+def download_windows(idx, col, deadlines=True):
+    windows = {}
+    opportunities = {}
+    for (i, j), times in idx.x_ij.items():
+        opportunities[i, j] = [t for t in times if (t, j, i) in col]
+        for n, t in enumerate(opportunities[i, j]):
+            windows[t, i, j] = opportunities[i, j][n+1] if deadlines and n+1 < len(opportunities[i, j]) else None
+    for j, areas in idx.held.items():
+        for i in areas:
+            times = opportunities.get((i, j), [])
+            windows[idx.H[0]-1, i, j] = times[0] if deadlines and times else None
+    return windows
+
+
+# Assigns the downloaded items to the download slots, earliest deadline first.
+#
+# counts = {(t,j,k): number of downloads}
+# items  = {(t,i,j): deadline or None} of the items that are downloaded
+# The counts of a feasible aggregated model meet every release and deadline
+# (the model has the interval rows of Hall's condition), and then the earliest
+# deadline first order does too.
+#
+# Returns [(t,i,j,k)] in the printing order of the models.
+def assign_downloads(counts, items):
+    released = defaultdict(list)
+    for (t, i, j), deadline in items.items():
+        released[j].append((t, i, deadline))
+
+    downloads = []
+    for j in released:
+        pending = sorted(released[j])
+        slots = sorted((t, k, n) for (t, j1, k), n in counts.items() if j1 == j and n > 0)
+        ready = []
+        next_item = 0
+        for (t, k, n) in slots:
+            while next_item < len(pending) and pending[next_item][0] < t:
+                t1, i, deadline = pending[next_item]
+                heapq.heappush(ready, (deadline if deadline is not None else float("inf"), t1, i))
+                next_item += 1
+            for m in range(n):
+                deadline, t1, i = heapq.heappop(ready)
+                downloads.append((t, i, j, k))
+
+    return sorted(downloads, key=lambda key: (key[0], key[3], key[2], key[1]))
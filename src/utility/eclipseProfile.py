@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from utility.accessGenerator import RADIUS, satellite_positions
+
+# Light and shadow of the satellites over the horizon, as one boolean array
+# instead of a {(t, Sj): 0 or 1} dictionary:
+#
+#   s = orbit_profile(elements, S, p)                # same orbits as access_windows (utility/accessGenerator.py)
+#   s = window_profile(S, p, {0: [(4, p)]})          # shadow windows [start, end) of each satellite
+#   s = read_eclipse_csv("eclipses.csv", S, p)       # the same windows, from a file
+#   ILP_LAS(..., s, ...)
+#
+# The profile is a read-only mapping s[t, Sj] (1 in shadow, 0 in light), so it
+# goes wherever the dictionary did. It also keeps the prefix sums of the ticks
+# in light of every satellite, so that the charging of any stretch of ticks is
+# a lookup: the battery terms of ILP_LAS (utility/battery.py), the screening
+# and the validator read them through light_ticks and cumulative_light, which
+# also take a plain dictionary.
+
+
+class EclipseProfile(Mapping):
+    # shadow : boolean array of shape (p, len(S)), shadow[t, n] True when S[n] is in shadow at tick t
+    def __init__(self, shadow, S):
+        self.shadow = np.asarray(shadow, dtype=bool)
+        self.S = list(S)
+        if self.shadow.ndim != 2 or self.shadow.shape[1] != len(self.S):
+            raise ValueError("the shadow array has shape %s, not (p, %d)" % (self.shadow.shape, len(self.S)))
+        self.p = self.shadow.shape[0]
+        self.column = {j: n for n, j in enumerate(self.S)}
+        # light_before[t, n]: ticks in light of S[n] in [0, t)
+        self.light_before = np.zeros((self.p + 1, len(self.S)), dtype=np.int64)
+        np.cumsum(~self.shadow, axis=0, out=self.light_before[1:])
+
+    def __getitem__(self, key):
+        t, j = key
+        if j not in self.column or not 0 <= t < self.p:
+            raise KeyError(key)
+        return int(self.shadow[t, self.column[j]])
+
+    def __iter__(self):
+        return ((t, j) for j in self.S for t in range(self.p))
+
+    def __len__(self):
+        return self.p * len(self.S)
+
+    # Ticks in light of Sj in [start, end)
+    def charging(self, j, start, end):
+        n = self.column[j]
+        return int(self.light_before[end, n] - self.light_before[start, n])
+
+    # Covers the ticks [start, end) of Sj
+    def covers(self, j, start, end):
+        return j in self.column and 0 <= start and end <= self.p
+
+
+# Ticks in light (1 - s[t,Sj]) of Sj in [start, end), as a float array; a tick
+# missing from s raises KeyError, or is missing (e.g. np.nan) when given
+def light_ticks(s, j, start, end, missing=None):
+    if isinstance(s, EclipseProfile) and s.covers(j, start, end):
+        return (~s.shadow[start:end, s.column[j]]).astype(float)
+    if missing is None:
+        return np.array([1 - s[t, j] for t in range(start, end)], dtype=float)
+    return np.array([1 - s.get((t, j), 1 - missing) for t in range(start, end)], dtype=float)
+
+
+# Ticks in light of Sj in [start, u] for every tick u of [start, end): the
+# prefix sums of light_ticks, looked up in an EclipseProfile
+def cumulative_light(s, j, start, end):
+    if isinstance(s, EclipseProfile) and s.covers(j, start, end):
+        n = s.column[j]
+        return s.light_before[start + 1:end + 1, n] - s.light_before[start, n]
+    return np.cumsum(light_ticks(s, j, start, end))
+
+
+# Shadow of satellites on the orbits of elements (see utility/accessGenerator.py)
+# at the p instants 0, step, 2*step, ... (seconds), behind a cylinder of the
+# radius of the Earth pointing away from the Sun. sun: right ascension and
+# declination of the Sun (degrees), fixed over the horizon (the equinox by default)
+def orbit_profile(elements, S, p, step=1.0, sun=(0.0, 0.0), batch=2**20):
+    ra, dec = np.radians(sun)
+    direction = np.array([np.cos(dec) * np.cos(ra), np.cos(dec) * np.sin(ra), np.sin(dec)])
+    shadow = np.zeros((p, len(S)), dtype=bool)
+    size = max(1, batch // max(1, len(S)))
+    for first in range(0, p, size):
+        r = satellite_positions(elements, np.arange(first, min(first + size, p)) * step)
+        along = r @ direction
+        shadow[first:first + len(r)] = (along < 0) & (np.einsum("tmk,tmk->tm", r, r) - along ** 2 < RADIUS ** 2)
+    return EclipseProfile(shadow, S)
+
+
+# Profile of the shadow windows {Sj: [(start, end)]} (ticks [start, end) in
+# shadow); the satellites without windows are always in light
+def window_profile(S, p, windows):
+    column = {j: n for n, j in enumerate(S)}
+    shadow = np.zeros((p, len(column)), dtype=bool)
+    for j, spans in windows.items():
+        if j not in column:
+            raise ValueError("shadow windows of unknown satellite %r" % (j,))
+        for start, end in spans:
+            shadow[max(start, 0):min(end, p), column[j]] = True
+    return EclipseProfile(shadow, S)
+
+
+# Profile of a dictionary {(t, Sj): 1 in shadow, 0 in light}; the missing ticks are in light
+def dict_profile(s, S, p):
+    column = {j: n for n, j in enumerate(S)}
+    shadow = np.zeros((p, len(column)), dtype=bool)
+    for (t, j), value in s.items():
+        if j in column and 0 <= t < p:
+            shadow[t, column[j]] = bool(value)
+    return EclipseProfile(shadow, S)
+
+
+# Shadow windows of an eclipse file (satcode, start, end: ticks [start, end)
+# in shadow), as written by write_eclipse_csv
+def read_eclipse_csv(file_path, S, p):
+    table = pd.read_csv(file_path, dtype={"satcode": "int64", "start": "int64", "end": "int64"})
+    satellites = set(S)
+    windows = {}
+    for j, start, end in table[["satcode", "start", "end"]].itertuples(index=False):
+        if j in satellites:
+            windows.setdefault(j, []).append((start, end))
+    return window_profile(S, p, windows)
+
+
+def write_eclipse_csv(file_path, profile):
+    rows = []
+    for n, j in enumerate(profile.S):
+        # Edges of the shadow windows: +1 where one starts, -1 where one ends
+        edges = np.diff(np.concatenate(([0], profile.shadow[:, n].astype(np.int8), [0])))
+        rows += [(j, start, end) for start, end in zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist())]
+    pd.DataFrame(rows, columns=["satcode", "start", "end"]).to_csv(file_path, index=False)
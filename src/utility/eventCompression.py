@@ -0,0 +1,60 @@
+# Event-compressed time axis for ILP / ILP2 / ILP_LAS.
+#
+# Collections happen only at the instants of col and downloads only at the
+# instants of com; every other instant of H is idle apart from the fixed per-tick
+# charge/discharge, which ILP_LAS folds into the row of the previous kept instant
+# (see utility/battery.py). Returns the kept instants and, for the models with
+# processing, the instants at which each satellite may start processing:
+#
+#	H2, starts = compress_horizon(H, S, col, com, p, pt, mem)
+#	ILP_LAS(H2, S, A, B, C, mem, ..., beta, sparse = True, starts = starts)
+#
+# Processing starts: a processing started at t frees memory at t+pt and drains
+# the battery at t. Pushing it to the latest start that still finishes before the
+# next collection instant of the satellite (or, when it is packed against later
+# processing, pt earlier than the next start) keeps every memory row unchanged,
+# never lowers the battery and keeps the processing sequential. The processings
+# packed before a collection instant all hold data that is in memory at the
+# previous collection instant, so there are at most mem[j] of them. The starts
+# kept are therefore u - q*pt, 1 <= q <= mem[j], where u is a collection instant
+# of Sj, a collection instant plus pt-1 (the processing of an area has to start
+# before a later collection opportunity of the same area) or the end of the
+# horizon p. The compressed problem has the same optimum as the full axis.
+#
+# held = {j: areas} data already in memory at the first instant (rolling horizon),
+# which can be processed from the first instant on.
+#
+# pt = None (model ILP) keeps only the opportunity instants and returns no starts.
+def compress_horizon(H, S, col, com, p, pt=None, mem=None, held=None):
+    Hset = set(H)
+    keep = {min(H)}
+    collections = {j: [] for j in S}
+    for (t, j, i) in col:
+        if t in Hset and j in collections:
+            keep.add(t)
+            collections[j].append(t)
+    for (t, j, k) in com:
+        if t in Hset and j in collections:
+            keep.add(t)
+
+    if pt is None:
+        return sorted(keep), None
+
+    starts = {}
+    for j in S:
+        times = sorted(set(collections[j]))
+        carried = len((held or {}).get(j, ()))
+        starts[j] = set()
+        if not times and not carried:
+            continue
+        earliest = times[0] if not carried else min(H) - 1
+        deadlines = set(times) | set(t + pt - 1 for t in times) | {p}
+        packed = min(mem[j], len(times) + carried)
+        for u in deadlines:
+            for q in range(1, packed + 1):
+                t = u - (q * pt)
+                if earliest < t <= (p-pt) and t >= 1 and t in Hset:
+                    starts[j].add(t)
+        keep |= starts[j]
+
+    return sorted(keep), starts
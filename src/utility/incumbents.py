@@ -0,0 +1,36 @@
+import json
+
+# Incumbents of an anytime solve (see solve_ILP_LAS, argument incumbents).
+# The target is either
+#
+#   a function, called with every record, or
+#   a path, to which every record is appended as one line of JSON, written and
+#   closed at once so that the latest schedule can be read during the solve
+#
+# Record: {"source": "greedy" or "solver", "seconds": since the start of the
+# solve, "objective": collections, "bound": best bound known then (None if
+# unknown), "schedule": {"x": [(t,i,j)], "z": [(t,i,j)], "y": [(t,i,j,k)]}}
+# Every record has a higher objective than the ones before it.
+def incumbent_sink(target):
+    if callable(target):
+        return target
+
+    def append(record):
+        with open(target, "a") as f:
+            f.write(json.dumps(record) + "\n")
+    return append
+
+
+# Last record of an incumbents file, None if there is none yet
+def latest_incumbent(file_path):
+    try:
+        with open(file_path) as f:
+            lines = [line for line in f if line.strip()]
+    except FileNotFoundError:
+        return None
+    if not lines:
+        return None
+    try:
+        return json.loads(lines[-1])
+    except ValueError:
+        return json.loads(lines[-2]) if len(lines) > 1 else None     # The last line is still being written
@@ -0,0 +1,63 @@
+import numpy as np
+from utility.eclipseProfile import EclipseProfile
+
+# Seeded synthetic constellation instances, in the shapes ILP / ILP2 / ILP_LAS
+# consume (see benchmark.py):
+#
+#   instance = generate_instance(n, m, o, p, density, seed)
+#   ILP_LAS(**instance)
+#
+# n areas, m satellites, o ground stations, p time instants
+# density     : probability that a satellite has a collection opportunity (of
+#               one area drawn uniformly) in a time instant
+# com_density : same for a communication opportunity (of one ground station);
+#               density / 4 by default
+# orbit       : orbital period in time instants; every satellite is in shadow
+#               for the fraction eclipse of each orbit, at its own phase
+# seed        : the same arguments and seed always give the same instance
+#
+# With the default orbit, a satellite that never acts stays above theta over
+# the whole horizon (it gains c*(1-eclipse) - d per tick on average); beta is
+# set above the largest charge C + c*(ticks in light), as the overflow rows of
+# ILP_LAS do not count the drain.
+def generate_instance(n, m, o, p, density=0.05, seed=0, com_density=None, orbit=96, eclipse=0.35, pt=2):
+    rng = np.random.default_rng(seed)
+    com_density = density / 4 if com_density is None else com_density
+    H, S, A, B = list(range(p)), list(range(m)), list(range(n)), list(range(o))
+
+    col = opportunities(rng, p, m, n, density, 0.25)
+    com = opportunities(rng, p, m, o, com_density, 1)
+
+    s = eclipse_profile(S, p, orbit, eclipse, rng.integers(0, orbit, size=m))
+
+    c, d = 0.4, 0.1
+    C = {j: 8.0 for j in S}
+    return {"H": H, "S": S, "A": A, "B": B, "C": C,
+            "mem": {j: 3 for j in S}, "up": {j: 2 for j in S}, "down": {k: 2 for k in B},
+            "col": col, "com": com, "theta": {j: 3 for j in S}, "p": p, "pt": pt,
+            "c": c, "d": d, "e": 0.25, "f": 0.25, "g": 0.4, "s": s,
+            "beta": {j: C[j] + c * p + 1 for j in S}}
+
+
+# EclipseProfile s[t, Sj] (1 in shadow, 0 in light, see utility/eclipseProfile.py):
+# Sj is in shadow for the fraction eclipse of each orbit, starting phase[j]
+# instants before t = 0
+def eclipse_profile(S, p, orbit, eclipse, phase):
+    shadow = ((np.arange(p)[:, None] + np.asarray(phase)[None, :]) % orbit) < round(eclipse * orbit)
+    return EclipseProfile(shadow, S)
+
+
+# {(t, Sj, target): value} with at most one target per satellite and instant,
+# in increasing t (the key order of process_satellite_data)
+def opportunities(rng, p, m, targets, density, value):
+    t, j = np.nonzero(rng.random((p, m)) < density)
+    target = rng.integers(0, targets, size=len(t))
+    return dict.fromkeys(zip(t.tolist(), j.tolist(), target.tolist()), value)
+
+
+# Arguments of the model "ILP", "ILP2" or "ILP_LAS" taken from an instance
+def model_arguments(instance, model):
+    names = {"ILP": ["H", "S", "A", "B", "mem", "up", "down", "col", "com", "p"],
+             "ILP2": ["H", "S", "A", "B", "mem", "up", "down", "col", "com", "p", "pt"],
+             "ILP_LAS": ["H", "S", "A", "B", "C", "mem", "up", "down", "col", "com", "theta", "p", "pt", "c", "d", "e", "f", "g", "s", "beta"]}
+    return {name: instance[name] for name in names[model]}
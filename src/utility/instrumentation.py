@@ -0,0 +1,248 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+from contextlib import contextmanager
+from itertools import islice
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Phase-level instrumentation of the pipeline (CSV ingestion, variables, each
+# constraint family, solve, extraction), switched by environment variables and
+# free when they are not set:
+#
+#   LEO_INSTRUMENT=1        record the wall time and counts of every phase
+#   LEO_INSTRUMENT=memory   also the tracemalloc peak of every phase (slower)
+#   LEO_INSTRUMENT_OUT=path append the report of every run to path, one JSON
+#                           object per line; without it the report is printed
+#   LEO_PROFILE=cprofile    profile every run with cProfile into LEO_PROFILE_DIR
+#   LEO_PROFILE=pyinstrument  (. by default); pyinstrument writes an HTML report
+#                           and falls back to cProfile when it is not installed
+#
+# A run is one call of an entry point decorated with instrumented (ILP, ILP2,
+# solve_ILP_LAS, load_satellite_data, ...); the phases of the functions it
+# calls are recorded in it, and the runs they start are phases of it. Its
+# report is
+#
+#   {"run": name, "started": unix time, "seconds": wall time, "profile": path or None,
+#    "phases": [{"phase": "build/Memory bound", "seconds": ..., "constraints": ...,
+#                "terms": ..., "variables": ..., "peak_mb": ..., "allocated_mb": ...}, ...]}
+#
+# with phases in the order they end, nested phases named by their path.
+# constraints and terms (non-zeros) are the rows a phase added to the problem
+# it is given; variables are the counts the phase reports itself; peak_mb and
+# allocated_mb (traced peak during the phase, traced memory it left behind) are
+# only there with LEO_INSTRUMENT=memory.
+
+
+class Run:
+    def __init__(self, name, memory=False):
+        self.name = name
+        self.memory = memory
+        self.phases = []
+        self.open = []          # Names and running peaks of the phases in progress
+        self.started = time.time()
+        self.seconds = None
+        self.profile = None
+
+    @contextmanager
+    def phase(self, name, prob=None):
+        record = {"phase": "/".join([p["name"] for p in self.open] + [name])}
+        state = {"name": name, "peak": 0}
+        if self.memory:
+            self.fold_peak()
+            tracemalloc.reset_peak()
+            traced = tracemalloc.get_traced_memory()[0]
+        rows = len(prob.constraints) if prob is not None else 0
+        self.open.append(state)
+        start = timeit.default_timer()
+        try:
+            yield record
+        finally:
+            record["seconds"] = timeit.default_timer() - start
+            self.open.pop()
+            if prob is not None:
+                added = list(islice(prob.constraints.values(), rows, None))
+                record["constraints"] = len(added)
+                record["terms"] = sum(len(constraint) for constraint in added)
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                state["peak"] = max(state["peak"], peak)
+                for outer in self.open:
+                    outer["peak"] = max(outer["peak"], state["peak"])
+                record["peak_mb"] = state["peak"] / 2**20
+                record["allocated_mb"] = (current - traced) / 2**20
+            self.phases.append(record)
+
+    # The peak since the last reset belongs to every phase in progress
+    def fold_peak(self):
+        peak = tracemalloc.get_traced_memory()[1]
+        for state in self.open:
+            state["peak"] = max(state["peak"], peak)
+
+    def report(self):
+        return {"run": self.name, "started": self.started, "seconds": self.seconds, "profile": self.profile, "phases": self.phases}
+
+
+_runs = []
+
+
+def enabled():
+    return os.environ.get("LEO_INSTRUMENT", "") not in ("", "0")
+
+
+# Records the phases of the block under the run name; inside another run, the
+# block is a phase of that run instead
+@contextmanager
+def run(name):
+    if _runs:
+        with phase(name):
+            yield
+        return
+    profiler = os.environ.get("LEO_PROFILE", "")
+    if not enabled() and not profiler:
+        yield
+        return
+
+    current = Run(name, os.environ.get("LEO_INSTRUMENT", "") == "memory")
+    tracing = current.memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profile = start_profile(profiler)
+    _runs.append(current)
+    start = timeit.default_timer()
+    try:
+        yield
+    finally:
+        current.seconds = timeit.default_timer() - start
+        _runs.pop()
+        current.profile = stop_profile(profile, name)
+        if tracing:
+            tracemalloc.stop()
+        if enabled():
+            emit(current.report())
+        elif current.profile:
+            print("PROFILE: ", current.profile, file=sys.stderr)
+
+
+def instrumented(name):
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with run(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Records the block as a phase of the current run (nothing outside of a run)
+# prob: the PuLP problem the block adds constraints to, to count them
+# Yields the record (None outside of a run), to which the block can add its own counts
+@contextmanager
+def phase(name, prob=None):
+    if not _runs:
+        yield None
+        return
+    with _runs[-1].phase(name, prob) as record:
+        yield record
+
+
+# Adds counts to the record of a phase (None outside of a run)
+def count(record, **counts):
+    if record is not None:
+        record.update(counts)
+
+
+# Consecutive phases of a function, each running up to the start of the next:
+#
+#   steps = Sections("build", prob)     # or Sections() for phases at the current level
+#   steps.next("Variables")
+#   ...
+#   steps.next("Memory bound")
+#   ...
+#   steps.close()
+class Sections:
+    def __init__(self, name=None, prob=None):
+        self.prob = prob
+        self.outer = None
+        self.inner = None
+        self.record = None
+        if name is not None and _runs:
+            self.outer = phase(name)
+            self.outer.__enter__()
+
+    def next(self, name):
+        self.end()
+        if _runs:
+            self.inner = phase(name, self.prob)
+            self.record = self.inner.__enter__()
+
+    # Counts of the current phase, e.g. variables = ...
+    def count(self, **counts):
+        if self.record is not None:
+            self.record.update(counts)
+
+    def end(self):
+        if self.inner is not None:
+            self.inner.__exit__(None, None, None)
+        self.inner = self.record = None
+
+    def close(self):
+        self.end()
+        if self.outer is not None:
+            self.outer.__exit__(None, None, None)
+            self.outer = None
+
+
+def start_profile(profiler):
+    if profiler == "cprofile" or (profiler and pyinstrument is None):
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+    if profiler:
+        profile = pyinstrument.Profiler()
+        profile.start()
+        return profile
+    return None
+
+
+# Writes the profile next to the others and returns its path
+def stop_profile(profile, name):
+    if profile is None:
+        return None
+    directory = os.environ.get("LEO_PROFILE_DIR", ".")
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, "%s-%d-%d" % (name, os.getpid(), time.time_ns()))
+    if isinstance(profile, cProfile.Profile):
+        profile.disable()
+        profile.dump_stats(stem + ".prof")
+        return stem + ".prof"
+    profile.stop()
+    with open(stem + ".html", "w") as f:
+        f.write(profile.output_html())
+    return stem + ".html"
+
+
+def emit(report):
+    out = os.environ.get("LEO_INSTRUMENT_OUT")
+    if out:
+        with open(out, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    else:
+        print_instrumentation(report, sys.stderr)
+
+
+def print_instrumentation(report, file=None):
+    print("INSTRUMENTATION: ", report["run"], " ", round(report["seconds"], 6), "s", file=file)
+    for record in report["phases"]:
+        counts = ", ".join("%s %s" % (name, round(value, 3) if isinstance(value, float) else value) for name, value in record.items() if name not in ("phase", "seconds"))
+        print(record["phase"], ": ", round(record["seconds"], 6), "s", (" (" + counts + ")") if counts else "", file=file)
+    if report["profile"]:
+        print("PROFILE: ", report["profile"], file=file)
@@ -0,0 +1,236 @@
+import os
+import subprocess
+import tempfile
+import timeit
+import numpy as np
+import pulp as plp
+from scipy.sparse import coo_matrix
+from scipy.optimize import milp, LinearConstraint, Bounds
+from utility.solverConfig import SolverConfig, cbc_bound
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+# MILP kept as arrays (objective, COO triplets of the constraint matrix, row and
+# column bounds) instead of PuLP expressions, for the matrix builders of the
+# models (see ILP_LAS_matrix.py). Columns are addressed by the keys the builder
+# gives them, e.g. ("x", t, i, j); rows are lo <= sum(val * col) <= hi.
+#
+#	m = MatrixModel()
+#	m.add_columns([("x", 0, 1, 0)], upper=1, integer=True, cost=1)
+#	m.add_row([m.column["x", 0, 1, 0]], [1.0], hi=1)
+#	status, objective, values = m.solve("highs")
+#
+# The objective is maximised. Status codes are the ones of PuLP
+# (1 optimal, 0 not solved, -1 infeasible, -2 unbounded).
+class MatrixModel:
+    def __init__(self):
+        self.column = {}
+        self.keys = []
+        self.cost = []
+        self.lower = []
+        self.upper = []
+        self.integer = []
+
+        self.rows = []
+        self.cols = []
+        self.vals = []
+        self.lo = []
+        self.hi = []
+
+    def add_columns(self, keys, lower=0, upper=np.inf, integer=False, cost=0):
+        for key in keys:
+            self.column[key] = len(self.keys)
+            self.keys.append(key)
+            self.cost.append(cost)
+            self.lower.append(lower)
+            self.upper.append(upper)
+            self.integer.append(integer)
+
+    def add_row(self, cols, vals, lo=-np.inf, hi=np.inf):
+        row = len(self.lo)
+        self.rows.extend([row] * len(cols))
+        self.cols.extend(cols)
+        self.vals.extend(vals)
+        self.lo.append(lo)
+        self.hi.append(hi)
+
+    def matrix(self):
+        return coo_matrix((np.array(self.vals, dtype=float), (np.array(self.rows, dtype=np.int64), np.array(self.cols, dtype=np.int64))),
+                          shape=(len(self.lo), len(self.keys))).tocsr()
+
+    # solver: "highs" (highspy, or scipy.optimize.milp without it), "cbc" (the CBC binary shipped with
+    # PuLP, through an MPS file) or a SolverConfig, whose report is filled as for the PuLP models
+    # (scipy.optimize.milp ignores threads, the absolute gap and the log)
+    # Returns (status, objective, {key: value})
+    def solve(self, solver="highs"):
+        config = SolverConfig(solver) if isinstance(solver, str) else solver
+        start = timeit.default_timer()
+        if config.solver == "cbc":
+            status, objective, values, bound = self._solve_cbc(config)
+        elif highspy is not None:
+            status, objective, values, bound = self._solve_highspy(config)
+        else:
+            status, objective, values, bound = self._solve_milp(config)
+        gap = None
+        if objective is not None and bound is not None:
+            gap = abs(bound - objective) / max(abs(objective), 1e-9)
+        config.report = dict(config.settings(), status=status, objective=objective, bound=bound, gap=gap,
+                             time=timeit.default_timer() - start)
+        return status, objective, values
+
+    def _solve_highspy(self, config):
+        A = self.matrix().tocsc()
+        lp = highspy.HighsLp()
+        lp.num_col_ = len(self.keys)
+        lp.num_row_ = len(self.lo)
+        lp.sense_ = highspy.ObjSense.kMaximize
+        lp.col_cost_ = np.array(self.cost, dtype=float)
+        lp.col_lower_ = np.array(self.lower, dtype=float)
+        lp.col_upper_ = np.array(self.upper, dtype=float)
+        lp.row_lower_ = np.array(self.lo, dtype=float)
+        lp.row_upper_ = np.array(self.hi, dtype=float)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger if integer else highspy.HighsVarType.kContinuous for integer in self.integer]
+
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", config.log_path is not None)
+        if config.log_path is not None:
+            h.setOptionValue("log_to_console", False)
+            h.setOptionValue("log_file", config.log_path)
+        for option, value in [("threads", config.threads), ("time_limit", config.time_limit),
+                              ("mip_rel_gap", config.gap_rel), ("mip_abs_gap", config.gap_abs)]:
+            if value is not None:
+                h.setOptionValue(option, value)
+        h.passModel(lp)
+        h.run()
+
+        model_status = h.getModelStatus()
+        info = h.getInfo()
+        solved = info.primal_solution_status == 2
+        if model_status == highspy.HighsModelStatus.kOptimal:
+            status = 1
+        elif model_status == highspy.HighsModelStatus.kInfeasible:
+            status = -1
+        elif model_status == highspy.HighsModelStatus.kUnbounded:
+            status = -2
+        else:
+            status = 1 if solved else 0
+        bound = info.mip_dual_bound if any(self.integer) else info.objective_function_value
+        bound = None if abs(bound) == np.inf else bound
+        if not solved:
+            return status, None, {}, bound
+        return status, info.objective_function_value, dict(zip(self.keys, h.getSolution().col_value)), bound
+
+    def _solve_milp(self, config):
+        options = {"time_limit": config.time_limit, "mip_rel_gap": config.gap_rel}
+        result = milp(-np.array(self.cost, dtype=float),
+                      constraints=LinearConstraint(self.matrix(), np.array(self.lo, dtype=float), np.array(self.hi, dtype=float)),
+                      bounds=Bounds(np.array(self.lower, dtype=float), np.array(self.upper, dtype=float)),
+                      integrality=np.array(self.integer, dtype=int),
+                      options={key: value for key, value in options.items() if value is not None})
+        bound = getattr(result, "mip_dual_bound", None)
+        bound = None if bound is None or abs(bound) == np.inf else -bound
+        if result.x is None:
+            return {1: 0, 2: -1, 3: -2}.get(result.status, -3), None, {}, bound
+        return {0: 1, 1: 1}.get(result.status, -3), -result.fun, dict(zip(self.keys, result.x)), bound
+
+    # Fixed MPS as PuLP writes it, objective negated (minimisation), columns C<n>, rows R<n>
+    def write_mps(self, path):
+        A = self.matrix().tocsc()
+        lines = ["NAME          LEO_K", "ROWS", " N  OBJ"]
+        sense = []
+        for r, (lo, hi) in enumerate(zip(self.lo, self.hi)):
+            if lo == hi:
+                sense.append("E")
+            elif lo == -np.inf:
+                sense.append("L")
+            else:
+                sense.append("G")
+            lines.append(" %s  R%07d" % (sense[r], r))
+
+        lines.append("COLUMNS")
+        marker = False
+        for n in range(len(self.keys)):
+            if self.integer[n] != marker:
+                lines.append("    MARK      'MARKER'                 %s" % ("'INTORG'" if self.integer[n] else "'INTEND'"))
+                marker = self.integer[n]
+            entries = ["OBJ       % .12e" % -self.cost[n]] if self.cost[n] else []
+            entries += ["R%07d  % .12e" % (r, v) for r, v in zip(A.indices[A.indptr[n]:A.indptr[n+1]], A.data[A.indptr[n]:A.indptr[n+1]])]
+            if not entries:
+                entries = ["OBJ       % .12e" % 0]
+            lines += ["    C%07d  %s" % (n, entry) for entry in entries]
+        if marker:
+            lines.append("    MARK      'MARKER'                 'INTEND'")
+
+        lines.append("RHS")
+        ranges = []
+        for r, (lo, hi) in enumerate(zip(self.lo, self.hi)):
+            rhs = hi if sense[r] == "L" else lo
+            if rhs:
+                lines.append("    RHS       R%07d  % .12e" % (r, rhs))
+            if sense[r] == "G" and hi != np.inf:
+                ranges.append("    RNG       R%07d  % .12e" % (r, hi - lo))
+        if ranges:
+            lines += ["RANGES"] + ranges
+
+        lines.append("BOUNDS")
+        for n, (lower, upper) in enumerate(zip(self.lower, self.upper)):
+            if lower == -np.inf and upper == np.inf:
+                lines.append(" FR BND       C%07d" % n)
+                continue
+            if lower == -np.inf:
+                lines.append(" MI BND       C%07d" % n)
+            elif lower != 0:
+                lines.append(" LO BND       C%07d  % .12e" % (n, lower))
+            if upper != np.inf:
+                lines.append(" UP BND       C%07d  % .12e" % (n, upper))
+            elif self.integer[n]:
+                lines.append(" PL BND       C%07d" % n)
+        lines.append("ENDATA")
+
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def _solve_cbc(self, config):
+        options = []
+        for option, value in [("threads", config.threads), ("sec", config.time_limit),
+                              ("ratio", config.gap_rel), ("allow", config.gap_abs)]:
+            if value is not None:
+                options += [option, str(value)]
+        with tempfile.TemporaryDirectory() as tmp:
+            model = os.path.join(tmp, "model.mps")
+            solution = os.path.join(tmp, "model.sol")
+            log_path = config.log_path or os.path.join(tmp, "model.log")
+            self.write_mps(model)
+            with open(log_path, "w") as log:
+                subprocess.run([plp.PULP_CBC_CMD().path, model] + options + ["solve", "solution", solution],
+                               stdout=log, stderr=subprocess.STDOUT)
+            with open(log_path) as log:
+                bound = cbc_bound(log.read())
+            bound = None if bound is None else -bound        #Bound of the negated objective
+            if not os.path.exists(solution):
+                return -3, None, {}, bound
+            with open(solution) as f:
+                header = f.readline()
+                values = np.zeros(len(self.keys))
+                for line in f:
+                    fields = line.replace("**", "").split()
+                    if len(fields) >= 3 and fields[1].startswith("C"):
+                        values[int(fields[1][1:])] = float(fields[2])
+        if "infeasible" in header.lower():
+            return -1, None, {}, bound
+        if "unbounded" in header.lower():
+            return -2, None, {}, bound
+        if not header.startswith("Optimal") and "objective value" not in header:
+            return 0, None, {}, bound
+        objective = float(np.dot(self.cost, values))
+        if header.startswith("Optimal"):
+            bound = objective
+        return 1, objective, dict(zip(self.keys, values)), bound
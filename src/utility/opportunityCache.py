@@ -0,0 +1,106 @@
+import hashlib
+import os
+import shutil
+import numpy as np
+from utility.instrumentation import instrumented, phase
+from utility.dictionaryGene import PARSER_VERSION, process_satellite_data, opportunity_dicts
+
+# Cache of the parsed access-window exports, a directory per parsed file:
+#
+#   <cache_dir>/<sha256 of the file>-v<PARSER_VERSION>/collection.npy
+#                                                     /communication.npy
+#
+# The tables are the (n, 3) int64 rows of process_satellite_data(arrays=True)
+# and are opened memory-mapped, so a hit reads no text and copies nothing
+# until the dictionaries are built. The key only depends on the content of
+# the file and on the parser version, so a renamed or copied export still
+# hits, and a changed parser never reads stale tables.
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "leo_opportunities")
+DEFAULT_MAX_BYTES = 1 << 30
+TABLES = ("collection", "communication")
+
+
+# Same results as process_satellite_data, through the cache.
+#
+# cache_dir : directory of the cache (DEFAULT_CACHE_DIR by default)
+# max_bytes : size the cache is kept under; the least recently used entries
+#             are removed first when a new one is stored
+# bypass    : if True, the file is parsed and the cache is neither read nor written
+# chunksize, arrays : as in process_satellite_data (with arrays = True the
+#             arrays are the read-only memory maps of the cache)
+@instrumented("load_satellite_data")
+def load_satellite_data(file_path, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, bypass=False, chunksize=None, arrays=False):
+    if bypass or not os.path.isfile(file_path):
+        return process_satellite_data(file_path, chunksize, arrays)
+
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    entry = os.path.join(cache_dir, cache_key(file_path))
+    with phase("cache read"):
+        rows = read_entry(entry)
+    if rows is None:
+        collection, communication, rows = process_satellite_data(file_path, chunksize, arrays=True)
+        try:
+            with phase("cache write"):
+                write_entry(entry, rows)
+                evict(cache_dir, max_bytes, keep=entry)
+        except OSError:
+            pass        # The cache is only an accelerator: a read-only or full disk still returns the data
+    else:
+        with phase("dictionaries"):
+            collection, communication = opportunity_dicts(rows)
+
+    if arrays:
+        return collection, communication, rows
+    return collection, communication
+
+
+def cache_key(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return "%s-v%d" % (digest.hexdigest(), PARSER_VERSION)
+
+
+# Memory-mapped tables of an entry, None if it is not in the cache
+def read_entry(entry):
+    try:
+        rows = {name: np.load(os.path.join(entry, name + ".npy"), mmap_mode="r") for name in TABLES}
+    except (OSError, ValueError):
+        return None
+    os.utime(entry)     # Recently used
+    return rows
+
+
+# The tables are written next to the entry and renamed into place, so that
+# processes sharing the cache never read a half-written entry
+def write_entry(entry, rows):
+    os.makedirs(os.path.dirname(entry), exist_ok=True)
+    partial = "%s.%d.partial" % (entry, os.getpid())
+    os.makedirs(partial, exist_ok=True)
+    for name in TABLES:
+        np.save(os.path.join(partial, name + ".npy"), np.ascontiguousarray(rows[name], dtype=np.int64))
+    try:
+        os.rename(partial, entry)
+    except OSError:
+        shutil.rmtree(partial, ignore_errors=True)      # Stored by another process in the meantime
+
+
+# Removes the least recently used entries until the cache holds at most max_bytes
+def evict(cache_dir, max_bytes, keep=None):
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if not os.path.isdir(path) or name.endswith(".partial"):
+            continue
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        entries.append((os.path.getmtime(path), size, path))
+
+    total = sum(size for (used, size, path) in entries)
+    for (used, size, path) in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+
+# Index of the decision variables of ILP / ILP2 / ILP_LAS and of the groups
+# the constraint blocks sum over.
+#
+# sparse = False: keys are the full products H x A x S (x B), as in the
+#                 original models; invalid tuples are fixed to 0 by the caller.
+# sparse = True:  keys only where the variable can be non-zero
+#                 x[t,i,j]   : (t,j,i) in col
+#                 y[t,i,j,k] : (t,j,k) in com and Sj has a collection
+#                              opportunity of Ai strictly before t
+#                 z[t,i,j]   : 1 <= t <= p-pt, (t,j,i) not in col and Sj has a
+#                              collection opportunity of Ai strictly before t
+#
+# pt = None builds an index without processing variables (model ILP).
+# starts = {j: instants} optionally restricts the instants at which Sj may start
+# processing in the sparse index (see utility/eventCompression.py).
+# held = {j: areas} data collected by Sj before H[0] and still in memory; it can be
+# downloaded or processed from H[0] on (sparse index, see rollingHorizon.py).
+# free = {j: instant} no processing of Sj may start before it (sparse index).
+# aggregated = True builds download counts w[t,j,k] (keys of y without the area,
+# see utility/downloadAssignment.py) instead of the y keys.
+class OpportunityIndex:
+    def __init__(self, H, S, A, B, col, com, p, pt=None, sparse=True, starts=None, held=None, free=None, aggregated=False):
+        self.H = sorted(H)
+        self.sparse = sparse
+        self.aggregated = aggregated
+        self.held = held or {}
+        self.free = free or {}
+
+        self.x = []
+        self.z = []
+        self.y = []
+        self.w = []
+
+        #Groups used by the constraint blocks
+        self.x_tj = defaultdict(list)   #(t,j) -> [i]
+        self.x_i = defaultdict(list)    #i -> [(t,j)]
+        self.x_ij = defaultdict(list)   #(i,j) -> [t] (increasing)
+        self.z_tj = defaultdict(list)   #(t,j) -> [i]
+        self.z_ij = defaultdict(list)   #(i,j) -> [t] (increasing)
+        self.y_tj = defaultdict(list)   #(t,j) -> [(i,k)]
+        self.y_tk = defaultdict(list)   #(t,k) -> [(i,j)]
+        self.y_ij = defaultdict(list)   #(i,j) -> [(t,k)] (increasing in t)
+        self.w_tj = defaultdict(list)   #(t,j) -> [k]
+        self.w_tk = defaultdict(list)   #(t,k) -> [j]
+        self.w_j = defaultdict(list)    #j -> [(t,k)] (increasing in t)
+
+        if sparse:
+            self._sparse(S, A, B, col, com, p, pt, starts)
+        else:
+            self._dense(S, A, B, p, pt)
+
+    def _dense(self, S, A, B, p, pt):
+        for t in self.H:
+            for i in A:
+                for j in S:
+                    self._add_x(t, i, j)
+                    if pt is not None:
+                        self._add_z(t, i, j)
+                    for k in B:
+                        if not self.aggregated:
+                            self._add_y(t, i, j, k)
+            if self.aggregated:
+                for j in S:
+                    for k in B:
+                        self._add_w(t, j, k)
+
+    def _sparse(self, S, A, B, col, com, p, pt, starts):
+        Hset = set(self.H)
+        Sset = set(S)
+        Aset = set(A)
+        Bset = set(B)
+
+        collections = sorted((t, j, i) for (t, j, i) in col if t in Hset and j in Sset and i in Aset)
+        first = {}
+        for (t, j, i) in collections:
+            self._add_x(t, i, j)
+            first.setdefault((i, j), t)
+        for j, areas in self.held.items():
+            for i in areas:
+                first[i, j] = self.H[0] - 1
+
+        #Areas of each satellite ordered by their first collection opportunity
+        firsts = defaultdict(list)
+        for (i, j), t in sorted(first.items(), key=lambda kv: (kv[1], kv[0])):
+            firsts[j].append((t, i))
+        first_times = {j: [t for (t, i) in v] for j, v in firsts.items()}
+
+        def collected_before(j, t):
+            return [i for (t0, i) in firsts[j][:bisect_left(first_times[j], t)]]
+
+        for (t, j, k) in sorted(key for key in com if key[0] in Hset and key[1] in Sset and key[2] in Bset):
+            if j not in firsts or j not in Sset:
+                continue
+            if self.aggregated:
+                if collected_before(j, t):
+                    self._add_w(t, j, k)
+                continue
+            for i in collected_before(j, t):
+                self._add_y(t, i, j, k)
+
+        if pt is None:
+            return
+        for t in self.H:
+            if t < 1 or t > (p-pt):
+                continue
+            for j in firsts:
+                if t < self.free.get(j, 0) or (starts is not None and t not in starts.get(j, ())):
+                    continue
+                for i in collected_before(j, t):
+                    if (t, j, i) not in col:
+                        self._add_z(t, i, j)
+
+    def _add_x(self, t, i, j):
+        self.x.append((t, i, j))
+        self.x_tj[t, j].append(i)
+        self.x_i[i].append((t, j))
+        self.x_ij[i, j].append(t)
+
+    def _add_z(self, t, i, j):
+        self.z.append((t, i, j))
+        self.z_tj[t, j].append(i)
+        self.z_ij[i, j].append(t)
+
+    def _add_y(self, t, i, j, k):
+        self.y.append((t, i, j, k))
+        self.y_tj[t, j].append((i, k))
+        self.y_tk[t, k].append((i, j))
+        self.y_ij[i, j].append((t, k))
+
+    def _add_w(self, t, j, k):
+        self.w.append((t, j, k))
+        self.w_tj[t, j].append(k)
+        self.w_tk[t, k].append(j)
+        self.w_j[j].append((t, k))
@@ -0,0 +1,76 @@
+from bisect import bisect_right
+
+
+# Presolve of ILP / ILP2 / ILP_LAS: the elements that cannot take part in any
+# schedule are removed before the models generate a single constraint.
+#
+#   collection opportunity (t,Sj,Ai): nothing could take the data off Sj after
+#       t, i.e. no communication opportunity of Sj after t and (with processing,
+#       pt not None) no instant of H in (t, p-pt] to start processing it (one
+#       at the last such instant is kept, as it rules out processing there)
+#   communication opportunity (t,Sj,Bk): Sj has no remaining collection
+#       opportunity, nor data held from before H[0], strictly before t
+#   area, satellite, ground station: left without any opportunity (a satellite
+#       holding data from before H[0] is kept)
+#   time instant: no remaining opportunity at it and, with processing, no
+#       processing start possible at it (before the first remaining collection,
+#       or after p-pt); H[0] is kept, as the battery is counted from it
+#
+# The variables of these elements can only be 0 in the models, so the reduced
+# problem has the same optimal schedules. The kept elements keep their labels:
+# a schedule of the reduced problem is already in the original indices, the
+# removed elements simply have no collection, download or processing in it.
+#
+# held = {Sj: areas} as in the init of ILP_LAS (see rollingHorizon.py)
+#
+# Returns the reduced instance {"H", "S", "A", "B", "col", "com"} and the removed
+# elements {"H", "S", "A", "B", "col", "com"} (lists, in the original order).
+# S, A and B of the reduced instance can be empty (H never is, it keeps H[0]):
+# the dense and sparse models are then built over them with nothing to
+# schedule, and their constraints never use an index outside its own loop.
+def reduce_instance(H, S, A, B, col, com, p, pt=None, held=None):
+    held = {j: areas for j, areas in (held or {}).items() if areas}
+    H = sorted(H)
+    Hset, Sset, Aset, Bset = set(H), set(S), set(A), set(B)
+    collections = [(t, j, i) for (t, j, i) in col if t in Hset and j in Sset and i in Aset]
+    communications = [(t, j, k) for (t, j, k) in com if t in Hset and j in Sset and k in Bset]
+
+    #Last communication opportunity of each satellite, and last instant at which processing can start
+    last_com = {}
+    for (t, j, k) in communications:
+        last_com[j] = max(t, last_com.get(j, t))
+    last_start = H[bisect_right(H, p - pt) - 1] if pt is not None and bisect_right(H, p - pt) > 0 else None
+
+    def disposable(t, j):
+        return last_com.get(j, t) > t or (last_start is not None and last_start >= max(t, 1))
+
+    kept_col = [(t, j, i) for (t, j, i) in collections if disposable(t, j)]
+    first = {j: H[0] - 1 for j in held}
+    for (t, j, i) in kept_col:
+        first[j] = min(t, first.get(j, t))
+    kept_com = [(t, j, k) for (t, j, k) in communications if j in first and first[j] < t]
+
+    areas = set(i for (t, j, i) in kept_col) | set(i for j in held for i in held[j])
+    satellites = set(j for (t, j, i) in kept_col) | set(held)
+    stations = set(k for (t, j, k) in kept_com)
+    busy = set(t for (t, j, i) in kept_col) | set(t for (t, j, k) in kept_com)
+    earliest = min(first.values()) if first else None
+    def useful(t):
+        if t == H[0] or t in busy:
+            return True
+        return pt is not None and earliest is not None and earliest < t <= p - pt and t >= 1
+
+    reduced = {"H": [t for t in H if useful(t)], "S": [j for j in S if j in satellites], "A": [i for i in A if i in areas],
+               "B": [k for k in B if k in stations], "col": {key: col[key] for key in kept_col}, "com": {key: com[key] for key in kept_com}}
+    kept = {name: set(reduced[name]) for name in reduced}
+    removed = {name: [v for v in values if v not in kept[name]] for name, values in [("H", H), ("S", S), ("A", A), ("B", B), ("col", list(col)), ("com", list(com))]}
+    return reduced, removed
+
+
+def print_presolve(reduced, removed):
+    print("PRESOLVE: ")
+    for name, text in [("H", "time instants"), ("S", "satellites"), ("A", "areas"), ("B", "ground stations"), ("col", "collection opportunities"), ("com", "communication opportunities")]:
+        print(text, ": ", len(reduced[name]) + len(removed[name]), " -> ", len(reduced[name]))
+    for name, text in [("S", "REMOVED SATELLITES: "), ("B", "REMOVED GROUND STATIONS: ")]:
+        if removed[name]:
+            print(text, removed[name])
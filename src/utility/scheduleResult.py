@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from utility.solverConfig import print_report
+from utility.battery import print_screening
+from utility.presolve import print_presolve
+
+# Record types of the schedule, fields in the order of the variable keys
+COLLECTION = np.dtype([("t", np.int64), ("i", np.int64), ("j", np.int64)])      # x[t,i,j], also z[t,i,j]
+DOWNLOAD = np.dtype([("t", np.int64), ("i", np.int64), ("j", np.int64), ("k", np.int64)])      # y[t,i,j,k]
+
+
+# Result of a solve, without any printing (see print_result for the text output).
+#
+# status     : PuLP status (1 when a schedule is available)
+# objective  : value of the objective (number of collections), None if there is none
+# collections, processing : record arrays (t, i, j) of the collections and processing starts
+# downloads  : record array (t, i, j, k) of the downloads
+# timings    : {phase: seconds}, e.g. build, greedy, solve, extract
+# report     : SolverConfig report of the solve (utility/solverConfig.py)
+# source     : "solver", or "greedy" when the schedule is the greedy fallback (see greedy.py), or
+#              "incumbent" when it is the best incumbent of an anytime solve (see solve_ILP_LAS) and
+#              the last solve ended without a schedule as good
+# greedy     : (status, collections) of the greedy schedule used as warm start, None without one
+# screening  : issues of the pre-model battery screening (utility/battery.py) when it stopped the
+#              solve before the model was built (status -1), None otherwise
+# presolve   : (reduced, removed) instance of the presolve (utility/presolve.py), None without it;
+#              the records are in the original indices either way
+# lazy       : (rounds, rows) of the lazy model, the solves after the first and the memory and battery
+#              rows they added, None without it
+#
+# Records are sorted in the printing order: by instant, then satellite (then ground station), then area.
+class ScheduleResult:
+    def __init__(self, status, objective, schedule=None, timings=None, report=None, source="solver", greedy=None, screening=None, presolve=None, lazy=None):
+        schedule = schedule or {}
+        self.status = status
+        self.objective = objective
+        self.collections = np.rec.array(np.array(schedule.get("x", []), dtype=COLLECTION).reshape(-1))
+        self.processing = np.rec.array(np.array(schedule.get("z", []), dtype=COLLECTION).reshape(-1))
+        self.downloads = np.rec.array(np.array(schedule.get("y", []), dtype=DOWNLOAD).reshape(-1))
+        self.timings = timings or {}
+        self.report = report
+        self.source = source
+        self.greedy = greedy
+        self.screening = screening
+        self.presolve = presolve
+        self.lazy = lazy
+
+    # Schedule {"x", "z", "y"} as lists of key tuples
+    def schedule(self):
+        return {"x": [tuple(r) for r in self.collections.tolist()],
+                "z": [tuple(r) for r in self.processing.tolist()],
+                "y": [tuple(r) for r in self.downloads.tolist()]}
+
+    # DataFrames {"x", "z", "y"} of the records
+    def frames(self):
+        return {"x": pd.DataFrame(self.collections), "z": pd.DataFrame(self.processing), "y": pd.DataFrame(self.downloads)}
+
+
+# Text output of ILP_LAS for a result
+# report: if True, the solver report is printed after the status
+def print_result(result, report=True):
+    if result.presolve is not None:
+        print_presolve(*result.presolve)
+    if result.greedy is not None:
+        print("GREEDY STATUS: ", result.greedy[0], ", COLLECTIONS: ", result.greedy[1])
+    print("STATUS: ", result.report["status"] if result.source != "solver" else result.status)
+    if result.screening is not None:
+        print_screening(result.screening)
+    if report and result.report is not None:
+        print_report(result.report)
+    if result.lazy is not None:
+        print("LAZY ROUNDS: ", result.lazy[0], ", ROWS ADDED: ", result.lazy[1])
+    if result.source == "greedy":
+        print("NO SOLUTION FROM THE SOLVER, GREEDY SCHEDULE: ")
+    if result.source == "incumbent":
+        print("NO BETTER SOLUTION FROM THE LAST SOLVE, BEST INCUMBENT: ")
+    if result.status == 1:
+        print_schedule(result.schedule())
+    print("Objective =", result.objective)
+
+
+def print_schedule(schedule):
+    #print("COLLECTIONS DONE: ", prob.objective)
+    print("COLLECTIONS DONE: ")
+    for (t, i, j) in schedule["x"]:
+        print(t, ": ", j, " - ", i)
+
+    print("ON SATELLITE PROCESSING DONE: ")
+    for (t, i, j) in schedule["z"]:
+        print(t, ": ", j, " - ", i)
+
+    #print("COMMUNICATIONS DONE: ", prob.objective)
+    print("COMMUNICATIONS DONE: ")
+    for (t, i, j, k) in schedule["y"]:
+        print(t, ": ", j, " ", i, " -> ", k)
@@ -0,0 +1,183 @@
+from collections import Counter
+import numpy as np
+import pandas as pd
+from utility.scheduleResult import ScheduleResult
+from utility.eclipseProfile import cumulative_light
+
+
+# Validator of ILP_LAS schedules, independent of the model (and of PuLP):
+#
+#	violations = validate_schedule(schedule, H, S, A, B, C, mem, ..., beta)
+#	print_violations(violations)
+#
+# schedule is a ScheduleResult or a dictionary {"x": [(t,i,j)], "z": [(t,i,j)],
+# "y": [(t,i,j,k)]} (greedy, rolling horizon, Lagrangian repair, ...). The
+# other arguments are the ones of ILP_LAS, init included. Memory and battery are
+# checked at every tick from H[0] to p-1, as the original (dense) model does.
+#
+# Returns the violated constraints as (constraint, t, Sj, detail), sorted by
+# instant and satellite; an empty list means the schedule is feasible.
+
+
+# Memory and battery of every satellite at the end of each tick H[0], ..., p-1
+#
+# Returns {"T": ticks, "memory": array (len(S), len(T)), "battery": array
+# (len(S), len(T)), "charge": array (len(S), len(T))}, rows in the order of S.
+# "charge" is the data-only part C[j] + c*(ticks in light), which the overflow
+# rows bound by beta[j].
+def simulate_schedule(schedule, H, S, C, p, pt, c, d, e, f, g, s, init=None):
+    result = schedule if isinstance(schedule, ScheduleResult) else ScheduleResult(1, None, schedule)
+    held = (init or {}).get("held", {})
+    free = (init or {}).get("free", {})
+    start = min(H)
+    T = np.arange(start, p)
+    satellites = pd.Index(S)
+
+    #Events per satellite and tick
+    def per_tick(t, j):
+        row = satellites.get_indexer(j)
+        keep = (row >= 0) & (t >= start) & (t < p)
+        counts = np.zeros((len(S), len(T)))
+        np.add.at(counts, (row[keep], t[keep] - start), 1)
+        return counts
+
+    x, z, y = result.collections, result.processing, result.downloads
+    collected = per_tick(x.t, x.j)
+    started = per_tick(z.t, z.j)
+    processed = per_tick(z.t + pt, z.j)
+    downloaded = per_tick(y.t, y.j)
+
+    carried = np.array([[len(held.get(j, ()))] for j in S])
+    running = T[None, :] < np.array([[free.get(j, 0)] for j in S])
+    memory = carried + running + np.cumsum(collected - downloaded - processed, axis=1)
+
+    light = np.array([cumulative_light(s, j, start, p) for j in S], dtype=float).reshape(len(S), len(T))
+    charge = np.array([[C[j]] for j in S]) + c * light
+    drain = d * (T - start + 1) + np.cumsum(e * collected + f * downloaded + pt * g * started, axis=1)
+    return {"T": T, "memory": memory, "battery": charge - drain, "charge": charge}
+
+
+def validate_schedule(schedule, H, S, A, B, C, mem, up, down, col, com, theta, p, pt, c, d, e, f, g, s, beta, init=None):
+    result = schedule if isinstance(schedule, ScheduleResult) else ScheduleResult(1, None, schedule)
+    held = (init or {}).get("held", {})
+    free = (init or {}).get("free", {})
+    done = set((init or {}).get("collected", ()))
+    missed = set((init or {}).get("missed", ()))
+    plan = result.schedule()
+    start = min(H)
+    Hset = set(H)
+    violations = []
+
+    #Opportunities
+    for (t,i,j) in plan["x"]:
+        if (t,j,i) not in col or t not in Hset:
+            violations.append(("collection opportunity", t, j, "A%s" % (i,)))
+        elif i in done or (i,j) in missed:
+            violations.append(("collected before H[0]", t, j, "A%s" % (i,)))
+    for (t,i,j,k) in plan["y"]:
+        if (t,j,k) not in com or t < 1 or t not in Hset:
+            violations.append(("communication opportunity", t, j, "A%s -> B%s" % (i, k)))
+    for (t,i,j) in plan["z"]:
+        if t < 1 or t > p-pt or (t,j,i) in col or t not in Hset or t < free.get(j, 0):
+            violations.append(("processing start", t, j, "A%s" % (i,)))
+
+    #Each satellite collects at most one area in an instant, each area is collected at most once
+    for (t,j), n in Counter((t,j) for (t,i,j) in plan["x"]).items():
+        if n > 1:
+            violations.append(("one collection per instant", t, j, "%d collections" % n))
+    for i, n in Counter(i for (t,i,j) in plan["x"]).items():
+        if n > 1:
+            t, j = [(t,j) for (t,i1,j) in plan["x"] if i1 == i][1]
+            violations.append(("area collected once", t, j, "A%s collected %d times" % (i, n)))
+
+    #Downlink and uplink capacities
+    for (t,k), n in Counter((t,k) for (t,i,j,k) in plan["y"]).items():
+        if n > down[k]:
+            for j in sorted(set(j for (t1,i,j,k1) in plan["y"] if (t1,k1) == (t,k))):
+                violations.append(("downlink capacity", t, j, "B%s: %d > %s" % (k, n, down[k])))
+    for (t,j), n in Counter((t,j) for (t,i,j,k) in plan["y"]).items():
+        if n > up[j]:
+            violations.append(("uplink capacity", t, j, "%d > %s" % (n, up[j])))
+
+    #Sequential processing
+    starts = {}
+    for (t,i,j) in plan["z"]:
+        starts.setdefault(j, []).append(t)
+    for j, times in starts.items():
+        times = np.sort(times)
+        for n in np.nonzero(np.diff(times) < pt)[0]:
+            violations.append(("sequential processing", int(times[n+1]), j, "started %d after %d" % (times[n+1], times[n])))
+
+    #Download and processing validation: after a collection of the pair (or data held from before H[0])
+    first = {}
+    for (t,i,j) in plan["x"]:
+        first[i,j] = min(t, first.get((i,j), t))
+    for j, areas in held.items():
+        for i in areas:
+            first[i,j] = start - 1
+    for (t,i,j,k) in plan["y"]:
+        if first.get((i,j), p) >= t:
+            violations.append(("download validation", t, j, "A%s not collected before" % (i,)))
+    for (t,i,j) in plan["z"]:
+        if t < p-pt and first.get((i,j), p) >= t:
+            violations.append(("processing validation", t, j, "A%s not collected before" % (i,)))
+
+    violations += process_all(plan, H, S, A, col, held, p)
+
+    #Memory and battery at every tick
+    trajectories = simulate_schedule(result, H, S, C, p, pt, c, d, e, f, g, s, init)
+    T = trajectories["T"]
+    bounds = [("memory", trajectories["memory"], np.array([[mem[j]] for j in S]), 1, "%d > %d"),
+              ("battery underflow", trajectories["battery"], np.array([[theta[j]] for j in S]), -1, "%.6g < %.6g"),
+              ("battery overflow", trajectories["charge"], np.array([[beta[j]] for j in S]), 1, "%.6g > %.6g")]
+    for (name, level, bound, sign, text) in bounds:
+        rows, ticks = np.nonzero(sign * (level - bound) > 1e-9)
+        for n, u in zip(rows.tolist(), ticks.tolist()):
+            violations.append((name, int(T[u]), S[n], text % (level[n, u], bound[n, 0])))
+
+    violations.sort(key=lambda v: (v[1], str(v[2]), v[0]))
+    return violations
+
+
+# "Process all collected data" of ILP_LAS: at every collection opportunity
+# (t,Sj,Ai) of the horizon, x[t,i,j] equals the downloads and processing starts
+# of the pair after t (so data is collected at the first opportunity of the pair
+# and leaves the memory by the next one); data held from before H[0] leaves it once.
+def process_all(plan, H, S, A, col, held, p):
+    start = min(H)
+    width = p - start + 2           # Instants start-1, ..., p-1 of a pair are the keys code*width + 0, ..., code*width + width-2
+    Hset, Sset, Aset = set(H), set(S), set(A)
+    opportunities = [(t, i, j) for (t, j, i) in col if t in Hset and j in Sset and i in Aset]
+    disposals = [(t, i, j) for (t, i, j, k) in plan["y"]] + plan["z"]
+    carried = [(start - 1, i, j) for j in held for i in held[j]]
+
+    code = {}
+    def encode(keys):
+        return np.array([code.setdefault((i, j), len(code)) for (t, i, j) in keys], dtype=np.int64), np.array([t - start + 1 for (t, i, j) in keys], dtype=np.int64)
+
+    disposal_codes, disposal_times = encode(disposals)
+    disposal_keys = np.sort(disposal_codes * width + disposal_times)
+    #Downloads and processing starts of each pair strictly after the instant
+    def after(keys):
+        codes, times = encode(keys)
+        return np.searchsorted(disposal_keys, codes * width + width) - np.searchsorted(disposal_keys, codes * width + times + 1)
+
+    violations = []
+    collected = set(plan["x"])
+    left = np.array([1 if key in collected else 0 for key in opportunities], dtype=np.int64)
+    right = after(opportunities)
+    for n in np.nonzero(left != right)[0]:
+        (t, i, j) = opportunities[n]
+        violations.append(("process all", t, j, "A%s: %d collected, %d downloaded/processed after" % (i, left[n], right[n])))
+    #Held data: every download or processing start of the pair counts
+    right = after([(start - 2, i, j) for (t, i, j) in carried])
+    for n in np.nonzero(right != 1)[0]:
+        (t, i, j) = carried[n]
+        violations.append(("process all", start, j, "A%s held: %d downloaded/processed" % (i, right[n])))
+    return violations
+
+
+def print_violations(violations):
+    print("VIOLATIONS: ", len(violations))
+    for (constraint, t, j, detail) in violations:
+        print(t, ": ", j, " - ", constraint, " (", detail, ")")
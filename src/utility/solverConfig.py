@@ -0,0 +1,132 @@
+import os
+import re
+import tempfile
+import pulp as plp
+
+
+# Solver settings shared by ILP, ILP2 and ILP_LAS (argument solver).
+#
+# solver     : "cbc" (CBC shipped with PuLP) or "highs" (highspy)
+# threads    : number of threads, None for the solver default
+# time_limit : wall-clock seconds, None for no limit
+# gap_rel    : relative MIP gap at which the search stops, None for the solver default
+# gap_abs    : absolute MIP gap at which the search stops, None for the solver default
+# log_path   : file the solver log is written to, None for no log
+#
+#	config = SolverConfig("highs", threads = 8, time_limit = 60, gap_rel = 0.01)
+#	ILP_LAS(H, S, ..., beta, solver = config)
+#	config.report   #settings, status, objective, best bound and gap of the last solve
+#
+# A solve stopped by the time limit or the gaps with a feasible schedule has
+# status 1 (as PuLP reports it); bound and gap tell how far the schedule can be
+# from the optimum.
+class SolverConfig:
+    def __init__(self, solver="cbc", threads=None, time_limit=None, gap_rel=None, gap_abs=None, log_path=None):
+        if solver not in ("cbc", "highs"):
+            raise ValueError("solver must be 'cbc' or 'highs', not %r" % (solver,))
+        self.solver = solver
+        self.threads = threads
+        self.time_limit = time_limit
+        self.gap_rel = gap_rel
+        self.gap_abs = gap_abs
+        self.log_path = log_path
+        self.report = None
+
+    def settings(self):
+        return {"solver": self.solver, "threads": self.threads, "time_limit": self.time_limit,
+                "gap_rel": self.gap_rel, "gap_abs": self.gap_abs, "log_path": self.log_path}
+
+    # Solves prob and returns the PuLP status; the report is kept in self.report
+    # warm_start: CBC starts from the initial values set on the variables (setInitialValue);
+    # the HiGHS interface of PuLP takes no starting solution and ignores it
+    # incumbent: function called as incumbent(objective, bound, values, seconds) with every improving
+    # solution HiGHS finds during the solve (values: {variable: value}); CBC runs as a separate program
+    # that reports nothing before it ends, so it is never called with CBC
+    def solve(self, prob, warm_start=False, incumbent=None):
+        if self.solver == "highs":
+            status, bound = self._solve_highs(prob, incumbent)
+        else:
+            status, bound = self._solve_cbc(prob, warm_start)
+
+        objective = plp.value(prob.objective) if prob.sol_status in (plp.LpSolutionOptimal, plp.LpSolutionIntegerFeasible) else None
+        if bound is None and prob.sol_status == plp.LpSolutionOptimal:
+            bound = objective
+        gap = None
+        if objective is not None and bound is not None:
+            gap = abs(bound - objective) / max(abs(objective), 1e-9)
+        self.report = dict(self.settings(), status=status, objective=objective, bound=bound, gap=gap,
+                           time=prob.solutionTime)
+        return status
+
+    def _solve_cbc(self, prob, warm_start=False):
+        log_path = self.log_path
+        if log_path is None:
+            handle, log_path = tempfile.mkstemp(suffix=".log")
+            os.close(handle)
+        #The CBC shipped with PuLP rejects a start, or crashes after reading it, when its preprocessing is on,
+        #and takes the cost of the start with the wrong sign when maximising (-max): a maximisation is then
+        #solved as the minimisation of the negated objective
+        options = ["preprocess off"] if warm_start else []
+        flip = warm_start and prob.sense == plp.LpMaximize
+        objective = prob.objective
+        if flip:
+            prob.sense = plp.LpMinimize
+            prob.objective = -objective
+        try:
+            status = prob.solve(plp.PULP_CBC_CMD(msg=False, threads=self.threads, timeLimit=self.time_limit,
+                                                 gapRel=self.gap_rel, gapAbs=self.gap_abs, logPath=log_path,
+                                                 warmStart=warm_start, options=options))
+            with open(log_path) as f:
+                bound = cbc_bound(f.read())
+        finally:
+            if flip:
+                prob.sense = plp.LpMaximize
+                prob.objective = objective
+            if self.log_path is None:
+                os.remove(log_path)
+        if flip and bound is not None:
+            bound = -bound
+        return status, bound
+
+    def _solve_highs(self, prob, incumbent=None):
+        options = {"log_file": self.log_path, "log_to_console": False} if self.log_path else {}
+        if incumbent is not None:
+            options.update(callbackTuple=(improving_solution(prob, incumbent), None),
+                           callbacksToActivate=[plp.HiGHS.hscb.HighsCallbackType.kCallbackMipImprovingSolution])
+        status = prob.solve(plp.HiGHS(msg=self.log_path is not None, threads=self.threads, timeLimit=self.time_limit,
+                                      gapRel=self.gap_rel, gapAbs=self.gap_abs, **options))
+        #PuLP passes a maximisation to HiGHS with the objective negated
+        info = prob.solverModel.getInfo()
+        bound = info.mip_dual_bound if prob.isMIP() else info.objective_function_value
+        if bound is None or abs(bound) == float("inf"):
+            return status, None
+        return status, -bound if prob.sense == plp.LpMaximize else bound
+
+
+# HiGHS callback handing the improving solutions to incumbent (see SolverConfig.solve); the columns are
+# the variables of prob, at their index, with the objective negated when maximising
+def improving_solution(prob, incumbent):
+    sign = -1 if prob.sense == plp.LpMaximize else 1
+    variables = []
+
+    def callback(kind, message, out, into, data):
+        if not variables:
+            variables.extend(prob.variables())
+        bound = out.mip_dual_bound
+        solution = out.mip_solution     # A copy on every access
+        incumbent(sign * out.objective_function_value, None if abs(bound) == float("inf") else sign * bound,
+                  {v: solution[v.index] for v in variables}, out.running_time)
+    return callback
+
+
+# Best bound in a CBC log ("Upper bound:" when maximising, "Lower bound:" when
+# minimising), None if the log has none (e.g. proven optimal)
+def cbc_bound(log):
+    found = re.findall(r"^(?:Upper|Lower) bound:\s*(\S+)", log, re.MULTILINE)
+    return float(found[-1]) if found else None
+
+
+def print_report(report):
+    print("SOLVER: ", report["solver"], ", THREADS: ", report["threads"], ", TIME LIMIT: ", report["time_limit"],
+          ", GAP (REL/ABS): ", report["gap_rel"], "/", report["gap_abs"], ", LOG: ", report["log_path"])
+    print("SOLVE TIME: ", report["time"], "s, BEST BOUND: ", report["bound"], ", GAP: ", report["gap"])